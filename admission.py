@@ -0,0 +1,169 @@
+#!/usr/bin/env python
+"""
+Модуль ограничения входящих обновлений.
+У каждого пользователя своя корзина токенов: обновление принимается, если
+в корзине есть токен, иначе отбрасывается до обработчиков игры и отправки
+сообщений. В режиме coalesce сохраняется только последнее лишнее нажатие
+кнопки и последнее лишнее сообщение пользователя (по отдельности, чтобы
+сообщение не вытесняло нажатие); они возвращаются в очередь Application,
+когда появится токен. Отложенные обновления хранятся в колесе таймеров
+(timer_wheel.py): новое лишнее обновление заменяет предыдущее за O(1).
+
+Отброшенное или замененное нажатие кнопки получает пустой ответ на
+CallbackQuery, иначе часики на кнопке крутятся до тайм-аута клиента.
+"""
+import asyncio
+import logging
+import time
+
+from telegram.error import TelegramError
+from telegram.ext import ApplicationHandlerStop
+
+from timer_wheel import TimerWheel
+
+logger = logging.getLogger (__name__)
+
+# Что делать с обновлением сверх лимита
+POLICIES = ('drop', 'coalesce')
+
+
+class AdmissionController:
+    """Корзины токенов по пользователям"""
+
+    def __init__ (self, rate: float = 1.0, burst: int = 5, policy: str = 'coalesce', tick: float = 0.25,
+                  on_defer=None, on_discard=None):
+        """
+        Args:
+            rate: Сколько обновлений в секунду пользователь может присылать постоянно
+            burst: Сколько обновлений подряд принимается без ожидания
+            policy: 'drop' - лишние обновления отбрасываются,
+                'coalesce' - последнее лишнее обновление обрабатывается, когда появится токен
+            tick: Период проверки отложенных обновлений, секунд
+            on_defer: Функция (update), вызываемая, когда обновление отложено
+            on_discard: Функция (update), вызываемая, когда отложенное обновление заменено новым
+        """
+        if policy not in POLICIES:
+            raise ValueError (f"Неизвестная политика {policy!r}, ожидается одна из {POLICIES}")
+        self.rate = rate
+        self.burst = burst
+        self.policy = policy
+        self.tick = tick
+        self.buckets = {}  # пользователь -> [токены, время последнего пополнения]
+        self.pending = TimerWheel (tick=tick)  # (пользователь, вид обновления) -> последнее отложенное
+        self.on_defer = on_defer
+        self.on_discard = on_discard
+
+        # Счетчики
+        self.admitted = 0
+        self.rejected = 0
+        self.coalesced = 0  # отложенные обновления, замененные более новыми
+        self.replayed = 0
+
+    def admit (self, key, now: float = None):
+        """
+        Забирает токен из корзины пользователя
+
+        Args:
+            key: Пользователь
+            now: Текущее время (по умолчанию time.monotonic ())
+
+        Returns:
+            float: 0, если обновление принято, иначе сколько секунд ждать следующего токена
+        """
+        now = time.monotonic () if now is None else now
+        bucket = self.buckets.get (key)
+        if bucket is None:
+            self.buckets[key] = [self.burst - 1, now]
+            return 0.0
+
+        tokens = min (self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+        bucket[1] = now
+        if tokens >= 1:
+            bucket[0] = tokens - 1
+            return 0.0
+        bucket[0] = tokens
+        return (1 - tokens) / self.rate
+
+    async def check (self, update, context):
+        """
+        Обработчик TypeHandler в группе -1: останавливает обработку обновлений сверх лимита
+
+        Raises:
+            ApplicationHandlerStop: Обновление не принято
+        """
+        user = update.effective_user
+        key = user.id if user is not None else getattr (update.effective_chat, 'id', None)
+        if key is None:
+            return
+
+        wait = self.admit (key)
+        if not wait:
+            self.admitted += 1
+            return
+
+        self.rejected += 1
+        if self.policy != 'coalesce':
+            await self._answer (update)
+            raise ApplicationHandlerStop
+
+        pending_key = (key, 'callback' if update.callback_query is not None else 'message')
+        replaced = self.pending.get (pending_key)
+        self.pending.schedule (pending_key, wait, update)
+        if self.on_defer is not None:
+            self.on_defer (update)
+        if replaced is not None:
+            self.coalesced += 1
+            if self.on_discard is not None:
+                self.on_discard (replaced)
+            await self._answer (replaced)
+        raise ApplicationHandlerStop
+
+    async def _answer (self, update):
+        """Подтверждает нажатие кнопки, которое не будет обработано"""
+        if update.callback_query is None:
+            return
+        try:
+            await update.callback_query.answer ()
+        except TelegramError as e:
+            logger.debug ("Не удалось ответить на отброшенное нажатие: %s", e)
+
+    async def run (self, application):
+        """
+        Фоновая задача: возвращает отложенные обновления в очередь и удаляет полные корзины
+
+        Args:
+            application: Экземпляр telegram.ext.Application
+        """
+        sweep_every = max (1, int (self.burst / self.rate / self.tick))
+        ticks = 0
+        while True:
+            await asyncio.sleep (self.tick)
+            for _, update in self.pending.advance ():
+                await application.update_queue.put (update)
+                self.replayed += 1
+
+            ticks += 1
+            if ticks % sweep_every == 0:
+                self.sweep ()
+
+    def sweep (self, now: float = None):
+        """Удаляет корзины, которые уже пополнились (они не отличаются от отсутствующих)"""
+        now = time.monotonic () if now is None else now
+        full = [
+            key for key, (tokens, stamp) in self.buckets.items ()
+            if tokens + (now - stamp) * self.rate >= self.burst
+            and (key, 'callback') not in self.pending and (key, 'message') not in self.pending
+        ]
+        for key in full:
+            del self.buckets[key]
+
+    def get_stats (self):
+        """Возвращает счетчики приема обновлений"""
+        return {
+            'admitted': self.admitted,
+            'rejected': self.rejected,
+            'coalesced': self.coalesced,
+            'replayed': self.replayed,
+            'pending': len (self.pending),
+            'users': len (self.buckets),
+        }
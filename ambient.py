@@ -0,0 +1,169 @@
+#!/usr/bin/env python
+"""
+Модуль фоновых событий для бездействующих игроков.
+Если игрок долго не делает ход, ему приходит шепот призрака или реплика
+доктора Валентина. Задержка и тип события зависят от полосы страха:
+чем страшнее игроку, тем раньше и тем враждебнее событие. Таймеры всех
+игроков хранятся в одном колесе (timer_wheel.py), ход игрока отменяет
+его таймер, а сработавшие события отправляются пачками раз в тик с
+ограничением количества отправок.
+"""
+import asyncio
+import functools
+import logging
+import random
+from collections import deque
+
+from fear import BAND_CRITICAL, BAND_HIGH, BAND_LOW, BAND_MEDIUM
+from timer_wheel import TimerWheel
+
+logger = logging.getLogger (__name__)
+
+# Диапазон задержки события по полосе страха, секунд
+AMBIENT_DELAYS = {
+    BAND_LOW: (300.0, 900.0),
+    BAND_MEDIUM: (180.0, 600.0),
+    BAND_HIGH: (90.0, 300.0),
+    BAND_CRITICAL: (45.0, 150.0),
+}
+
+# Возможные события по полосе страха: (персонаж, настроение)
+AMBIENT_EVENTS = {
+    BAND_LOW: (('ghost', 'helping'), ('ghost', 'family')),
+    BAND_MEDIUM: (('ghost', 'family'), ('ghost', 'cryptic'), ('doctor', 'default')),
+    BAND_HIGH: (('ghost', 'cryptic'), ('doctor', 'manipulative')),
+    BAND_CRITICAL: (('doctor', 'threatening'), ('doctor', 'manipulative'), ('ghost', 'family')),
+}
+
+
+class AmbientScheduler:
+    """Таймеры фоновых событий и их пакетная отправка"""
+
+    def __init__ (self, styles, tick: float = 1.0, per_tick: int = 25, rng=None):
+        """
+        Args:
+            styles: Стили оформления сообщений (MessageStyles)
+            tick: Период проверки таймеров, секунд
+            per_tick: Сколько событий отправлять за тик (остальные ждут следующего)
+            rng: Генератор случайных чисел (по умолчанию random.Random ())
+        """
+        self.styles = styles
+        self.tick = tick
+        self.per_tick = per_tick
+        self.rng = rng or random.Random ()
+        self.wheel = TimerWheel (tick=tick)
+        self.backlog = deque ()
+
+        # Счетчики
+        self.delivered = 0
+        self.stale = 0
+        self.failed = 0
+        self.peak_backlog = 0
+
+    def schedule (self, chat_id, session):
+        """
+        Ставит (или переставляет) таймер события для чата
+
+        Args:
+            chat_id: Идентификатор чата
+            session: Игровая сессия (engine.GameSession)
+        """
+        low, high = AMBIENT_DELAYS[session.game.player.fear.band]
+        self.wheel.schedule (chat_id, self.rng.uniform (low, high), session)
+
+    def cancel (self, chat_id):
+        """Отменяет таймер события чата"""
+        self.wheel.cancel (chat_id)
+
+    def watch (self, callback, session):
+        """
+        Оборачивает обработчик: действие игрока отменяет таймер, после хода таймер ставится заново
+
+        Args:
+            callback: Асинхронный обработчик (update, context)
+            session: Функция context -> текущая сессия игрока или None
+
+        Returns:
+            callable: Обернутый обработчик
+        """
+
+        @functools.wraps (callback)
+        async def wrapper (update, context):
+            chat = update.effective_chat
+            if chat is None:
+                return await callback (update, context)
+
+            self.cancel (chat.id)
+            try:
+                return await callback (update, context)
+            finally:
+                current = session (context)
+                if current is not None and not current.finished:
+                    self.schedule (chat.id, current)
+
+        return wrapper
+
+    def compose (self, session):
+        """
+        Текст события по текущей полосе страха игрока
+
+        Args:
+            session: Игровая сессия
+
+        Returns:
+            str: Оформленное сообщение
+        """
+        game = session.game
+        speaker, mood = self.rng.choice (AMBIENT_EVENTS[game.player.fear.band])
+        if speaker == 'doctor':
+            text = game.doctor.get_response (mood, self.rng.randrange (len (game.doctor.responses[mood])))
+            return self.styles.format_scene_message (game.doctor.name, text)
+        ghost = self.rng.choice ((game.wife_ghost, game.child_ghost))
+        text = ghost.get_whisper (mood, self.rng.randrange (len (ghost.whispers[mood])))
+        return self.styles.italic (self.styles.format_scene_message ("Призрак", text))
+
+    async def run (self, bot):
+        """
+        Фоновая задача: раз в тик собирает сработавшие таймеры и отправляет события
+
+        Args:
+            bot: Объект Bot для отправки сообщений
+        """
+        while True:
+            await asyncio.sleep (self.tick)
+            self.backlog.extend (self.wheel.advance ())
+            self.peak_backlog = max (self.peak_backlog, len (self.backlog))
+            if self.backlog:
+                await self.deliver (bot)
+
+    async def deliver (self, bot):
+        """Отправляет не больше per_tick событий из очереди"""
+        batch = []
+        while self.backlog and len (batch) < self.per_tick:
+            chat_id, session = self.backlog.popleft ()
+            # Игрок мог закончить игру или сделать ход, пока событие ждало в очереди
+            if session.finished or chat_id in self.wheel:
+                self.stale += 1
+                continue
+            batch.append (self._send (bot, chat_id, self.compose (session)))
+        await asyncio.gather (*batch)
+
+    async def _send (self, bot, chat_id, text):
+        """Отправка одного события"""
+        try:
+            await bot.send_message (chat_id=chat_id, text=text, parse_mode='HTML')
+            self.delivered += 1
+        except Exception as e:
+            self.failed += 1
+            logger.warning ("Не удалось отправить фоновое событие в чат %s: %s", chat_id, e)
+
+    def get_stats (self):
+        """Возвращает счетчики фоновых событий"""
+        return {
+            **self.wheel.get_stats (),
+            'backlog': len (self.backlog),
+            'peak_backlog': self.peak_backlog,
+            'delivered': self.delivered,
+            'stale': self.stale,
+            'failed': self.failed,
+        }
@@ -0,0 +1,345 @@
+#!/usr/bin/env python
+"""
+Модуль офлайн-анализа журнала выборов (см. events.py) на NumPy.
+События загружаются в столбцы массивов: сцены и варианты кодируются
+целыми числами, страх хранится как int8. Матрицы переходов, распределения
+страха и воронка концовок считаются векторно, без циклов по событиям.
+Прохождение - пара (чат, первый ход игры): в одном чате может быть
+несколько игр, и воронка и влияние находок считаются по прохождениям.
+
+Запуск:
+    python analysis.py events/
+    python analysis.py --benchmark 1000000
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from scene_graph import SCENE_TRANSITIONS
+
+# Коды сцен: индекс в кортеже
+SCENES = tuple (SCENE_TRANSITIONS)
+SCENE_CODES = {scene: code for code, scene in enumerate (SCENES)}
+
+# Ширина корзины гистограммы страха
+FEAR_BUCKET = 10
+FEAR_BUCKETS = 100 // FEAR_BUCKET + 1
+
+
+def _require_numpy ():
+    """Проверяет, что NumPy установлен"""
+    if np is None:
+        raise ImportError ("Для анализа нужен NumPy: pip install numpy")
+
+
+class EventColumns:
+    """Журнал событий в виде столбцов NumPy"""
+
+    def __init__ (self, chat, game, ts, scene, option, next_scene, fear_before, fear_after, photos):
+        self.chat = chat
+        self.game = game  # первый ход прохождения (см. GameSession.first_turn)
+        self.ts = ts
+        self.scene = scene
+        self.option = option
+        self.next_scene = next_scene
+        self.fear_before = fear_before
+        self.fear_after = fear_after
+        self.photos = photos
+
+    def __len__ (self):
+        return len (self.scene)
+
+    @classmethod
+    def from_records (cls, records):
+        """
+        Строит столбцы из списка словарей событий
+
+        Args:
+            records: Итерируемые события (словари из JSON Lines)
+
+        Returns:
+            EventColumns: Столбцы, отсортированные по (чат, прохождение, время)
+        """
+        _require_numpy ()
+        unknown = len (SCENES)  # код для сцен, которых нет в графе
+        rows = [
+            (
+                record.get ('chat', 0),
+                record.get ('game', 0),  # в журналах до появления поля - одно прохождение на чат
+                record.get ('ts', 0.0),
+                SCENE_CODES.get (record.get ('scene'), unknown),
+                -1 if record.get ('option') is None else record['option'],  # None - ход текстом
+                SCENE_CODES.get (record.get ('next_scene'), unknown),
+                record.get ('fear_before', 0),
+                record.get ('fear_after', 0),
+                record.get ('photos', 0),
+            )
+            for record in records
+        ]
+        table = np.array (rows, dtype=np.float64).reshape (-1, 9)
+
+        columns = cls (
+            chat=table[:, 0].astype (np.int64),
+            game=table[:, 1].astype (np.int64),
+            ts=table[:, 2],
+            scene=table[:, 3].astype (np.int16),
+            option=table[:, 4].astype (np.int8),
+            next_scene=table[:, 5].astype (np.int16),
+            fear_before=table[:, 6].astype (np.int8),
+            fear_after=table[:, 7].astype (np.int8),
+            photos=table[:, 8].astype (np.int8),
+        )
+        return columns.sorted ()
+
+    @classmethod
+    def load (cls, path):
+        """
+        Загружает события из файла JSON Lines или каталога с такими файлами
+
+        Args:
+            path: Файл или каталог
+
+        Returns:
+            EventColumns: Столбцы событий
+        """
+        files = sorted (glob.glob (os.path.join (path, '*.jsonl'))) if os.path.isdir (path) else [path]
+
+        def records ():
+            for name in files:
+                with open (name, encoding='utf-8') as events_file:
+                    for line in events_file:
+                        if line.strip ():
+                            yield json.loads (line)
+
+        return cls.from_records (records ())
+
+    def sorted (self):
+        """Возвращает столбцы, упорядоченные по чату, прохождению, затем по времени"""
+        order = np.lexsort ((self.ts, self.game, self.chat))
+        return EventColumns (
+            self.chat[order], self.game[order], self.ts[order], self.scene[order], self.option[order],
+            self.next_scene[order], self.fear_before[order], self.fear_after[order], self.photos[order]
+        )
+
+    def playthroughs (self):
+        """
+        Номер прохождения каждого события (столбцы упорядочены, см. sorted)
+
+        Returns:
+            tuple: (номера прохождений, количество прохождений)
+        """
+        first = np.ones (len (self), dtype=bool)
+        first[1:] = (self.chat[1:] != self.chat[:-1]) | (self.game[1:] != self.game[:-1])
+        return np.cumsum (first) - 1, int (first.sum ())
+
+
+def transition_matrix (events):
+    """
+    Матрица вероятностей переходов между сценами
+
+    Returns:
+        ndarray: [сцена, следующая сцена] -> доля переходов
+    """
+    size = len (SCENES) + 1
+    counts = np.bincount (events.scene.astype (np.int64) * size + events.next_scene,
+                          minlength=size * size).reshape (size, size)
+    totals = counts.sum (axis=1, keepdims=True)
+    return np.divide (counts, totals, out=np.zeros (counts.shape), where=totals > 0)
+
+
+def fear_distribution (events):
+    """
+    Распределение страха после хода по сценам
+
+    Returns:
+        ndarray: [сцена, корзина страха] -> количество ходов
+    """
+    size = len (SCENES) + 1
+    buckets = np.clip (events.fear_after, 0, 100).astype (np.int64) // FEAR_BUCKET
+    return np.bincount (events.scene.astype (np.int64) * FEAR_BUCKETS + buckets,
+                        minlength=size * FEAR_BUCKETS).reshape (size, FEAR_BUCKETS)
+
+
+def fear_crossings (events, threshold=80, max_options=8):
+    """
+    Насколько каждый вариант толкает страх через порог
+
+    Args:
+        events: Столбцы событий
+        threshold: Порог страха
+        max_options: Максимальное количество вариантов в сцене
+
+    Returns:
+        tuple: (доля ходов, пересекающих порог, средний прирост страха),
+            оба массива [сцена, вариант]
+    """
+    size = len (SCENES) + 1
+    valid = (events.option >= 0) & (events.option < max_options)
+    keys = events.scene[valid].astype (np.int64) * max_options + events.option[valid]
+    length = size * max_options
+
+    delta = events.fear_after[valid].astype (np.int32) - events.fear_before[valid]
+    crossed = (events.fear_before[valid] < threshold) & (events.fear_after[valid] >= threshold)
+
+    totals = np.bincount (keys, minlength=length)
+    crossing_rate = np.divide (np.bincount (keys, weights=crossed, minlength=length), totals,
+                               out=np.zeros (length), where=totals > 0)
+    mean_delta = np.divide (np.bincount (keys, weights=delta, minlength=length), totals,
+                            out=np.zeros (length), where=totals > 0)
+    return crossing_rate.reshape (size, max_options), mean_delta.reshape (size, max_options)
+
+
+def ending_funnel (events):
+    """
+    Воронка: в скольких прохождениях игрок дошел до каждой сцены
+
+    Returns:
+        ndarray: [сцена] -> количество прохождений
+    """
+    size = len (SCENES) + 1
+    playthrough, _ = events.playthroughs ()
+    reached = np.unique (playthrough * size + events.next_scene)
+    return np.bincount (reached % size, minlength=size)
+
+
+def photo_roll_impact (events, scene='room_with_portrait', ending='end_secret'):
+    """
+    Доля секретных концовок среди прохождений, где фотография нашлась в заданной сцене, и среди остальных
+
+    Returns:
+        tuple: (доля концовки при находке, доля без находки, количество прохождений с находкой)
+    """
+    # Прирост фотографий внутри прохождения: разность соседних событий, первое событие - от нуля
+    playthrough, count = events.playthroughs ()
+    first = np.ones (len (events), dtype=bool)
+    first[1:] = playthrough[1:] != playthrough[:-1]
+    previous = np.where (first, 0, np.roll (events.photos, 1))
+    gained = events.photos > previous
+
+    found = np.zeros (count, dtype=bool)
+    np.logical_or.at (found, playthrough, gained & (events.scene == SCENE_CODES[scene]))
+    finished = np.zeros (count, dtype=bool)
+    np.logical_or.at (finished, playthrough, events.next_scene == SCENE_CODES[ending])
+
+    with_photo = finished[found].mean () if found.any () else 0.0
+    without_photo = finished[~found].mean () if (~found).any () else 0.0
+    return with_photo, without_photo, int (found.sum ())
+
+
+def naive_transition_and_fear (records):
+    """Те же матрица переходов и распределение страха, посчитанные циклом Python (для сравнения)"""
+    size = len (SCENES) + 1
+    unknown = len (SCENES)
+    counts = [[0] * size for _ in range (size)]
+    fear = [[0] * FEAR_BUCKETS for _ in range (size)]
+    for record in records:
+        scene = SCENE_CODES.get (record['scene'], unknown)
+        counts[scene][SCENE_CODES.get (record['next_scene'], unknown)] += 1
+        fear[scene][min (max (record['fear_after'], 0), 100) // FEAR_BUCKET] += 1
+    matrix = []
+    for row in counts:
+        total = sum (row)
+        matrix.append ([value / total if total else 0.0 for value in row])
+    return matrix, fear
+
+
+def synthetic_records (count, seed=0):
+    """Генерирует случайные события для бенчмарка"""
+    import random
+    rng = random.Random (seed)
+    records = []
+    for i in range (count):
+        scene = rng.choice (SCENES[:-1])
+        fear_before = rng.randint (0, 100)
+        records.append ({
+            'chat': i // 60,
+            'game': i // 20,
+            'ts': float (i),
+            'scene': scene,
+            'option': rng.randint (0, 2),
+            'next_scene': rng.choice (SCENE_TRANSITIONS[scene] or (scene,)),
+            'fear_before': fear_before,
+            'fear_after': min (100, fear_before + rng.randint (0, 20)),
+            'photos': rng.randint (0, 5),
+        })
+    return records
+
+
+def benchmark (count):
+    """Сравнивает векторный расчет с циклом Python на синтетических данных"""
+    records = synthetic_records (count)
+
+    started = time.perf_counter ()
+    events = EventColumns.from_records (records)
+    load_time = time.perf_counter () - started
+
+    started = time.perf_counter ()
+    matrix = transition_matrix (events)
+    fear = fear_distribution (events)
+    numpy_time = time.perf_counter () - started
+
+    started = time.perf_counter ()
+    naive_matrix, naive_fear = naive_transition_and_fear (records)
+    naive_time = time.perf_counter () - started
+
+    assert np.allclose (matrix, np.array (naive_matrix))
+    assert (fear == np.array (naive_fear)).all ()
+
+    print (f"Событий: {count}")
+    print (f"Загрузка в столбцы: {load_time:.3f} с")
+    print (f"NumPy: {numpy_time * 1000:.1f} мс")
+    print (f"Цикл Python: {naive_time * 1000:.1f} мс (в {naive_time / max (numpy_time, 1e-9):.0f} раз медленнее)")
+
+
+def report (events):
+    """Печатает сводку по журналу событий"""
+    names = SCENES + ('?',)
+    print (f"Событий: {len (events)}, чатов: {len (np.unique (events.chat))}, "
+           f"прохождений: {events.playthroughs ()[1]}")
+
+    print ("\nВоронка (прохождений дошло до сцены):")
+    for code, count in enumerate (ending_funnel (events)):
+        if count:
+            print (f"  {names[code]}: {count}")
+
+    print ("\nВарианты, чаще всего поднимающие страх до 80+:")
+    crossing_rate, mean_delta = fear_crossings (events)
+    for flat in np.argsort (crossing_rate, axis=None)[::-1][:5]:
+        scene, option = np.unravel_index (flat, crossing_rate.shape)
+        if crossing_rate[scene, option] > 0:
+            print (f"  {names[scene]} / вариант {option}: {crossing_rate[scene, option]:.1%} ходов, "
+                   f"в среднем +{mean_delta[scene, option]:.1f}")
+
+    with_photo, without_photo, found = photo_roll_impact (events)
+    print (f"\nСекретная концовка при фото в комнате с портретом: {with_photo:.1%} ({found} прохождений), "
+           f"без него: {without_photo:.1%}")
+
+
+def main ():
+    parser = argparse.ArgumentParser (description="Анализ журнала выборов")
+    parser.add_argument ('path', nargs='?', default='events', help="Файл или каталог с *.jsonl")
+    parser.add_argument ('--benchmark', type=int, metavar='N', help="Сравнить с циклом Python на N событиях")
+    args = parser.parse_args ()
+
+    try:
+        _require_numpy ()
+    except ImportError as e:
+        print (e)
+        sys.exit (1)
+
+    if args.benchmark:
+        benchmark (args.benchmark)
+    else:
+        report (EventColumns.load (args.path))
+
+
+if __name__ == '__main__':
+    main ()
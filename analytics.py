@@ -0,0 +1,163 @@
+#!/usr/bin/env python
+"""
+Модуль статистики прохождений.
+Агрегаты (счетчики концовок, гистограммы, таблица самых быстрых секретных
+концовок) обновляются за O(1) на каждое завершенное прохождение и
+периодически сохраняются в локальный JSON-файл.
+"""
+import asyncio
+import heapq
+import json
+import logging
+import os
+import time
+
+logger = logging.getLogger (__name__)
+
+# Концовки, которые учитываются в статистике
+ENDINGS = ('end_acceptance', 'end_denial', 'end_secret', 'neutral')
+
+# Ширина корзины гистограммы пикового страха
+FEAR_BUCKET = 10
+
+
+class EndingStats:
+    """Агрегированная статистика завершенных прохождений"""
+
+    def __init__ (self, path: str = 'stats.json', top_size: int = 10):
+        """
+        Args:
+            path: Файл для сохранения агрегатов
+            top_size: Размер таблицы самых быстрых секретных концовок
+        """
+        self.path = path
+        self.top_size = top_size
+        self.reset ()
+        self.dirty = False
+
+    def reset (self):
+        """Обнуляет все агрегаты"""
+        self.games = 0
+        self.total_turns = 0
+        self.endings = dict.fromkeys (ENDINGS, 0)
+        self.photos = {}  # найдено фотографий -> количество прохождений
+        self.peak_fear = [0] * (100 // FEAR_BUCKET + 1)  # корзины по 10 единиц страха
+        self.turns = {}  # количество ходов -> количество прохождений
+        # Куча (-ходы, время, имя): в корне самое медленное из лучших прохождений
+        self.fastest_secret = []
+
+    def record (self, ending, turns, photos, peak_fear, player_name=None):
+        """
+        Учитывает завершенное прохождение
+
+        Args:
+            ending: Концовка (одна из ENDINGS)
+            turns: Количество ходов
+            photos: Количество найденных фотографий
+            peak_fear: Максимальный уровень страха за прохождение
+            player_name: Имя игрока для таблицы лидеров
+        """
+        if ending not in self.endings:
+            ending = 'neutral'
+
+        self.games += 1
+        self.total_turns += turns
+        self.endings[ending] += 1
+        self.photos[photos] = self.photos.get (photos, 0) + 1
+        self.turns[turns] = self.turns.get (turns, 0) + 1
+        self.peak_fear[min (max (peak_fear, 0), 100) // FEAR_BUCKET] += 1
+
+        # Размер кучи ограничен top_size, поэтому обновление не зависит от истории
+        if ending == 'end_secret':
+            entry = (-turns, time.time (), player_name or 'Аноним')
+            if len (self.fastest_secret) < self.top_size:
+                heapq.heappush (self.fastest_secret, entry)
+            elif entry > self.fastest_secret[0]:
+                heapq.heapreplace (self.fastest_secret, entry)
+
+        self.dirty = True
+
+    def leaderboard (self):
+        """Самые быстрые секретные концовки: список (имя, ходы) по возрастанию ходов"""
+        return [(name, -turns) for turns, _, name in sorted (self.fastest_secret, reverse=True)]
+
+    def average_turns (self):
+        """Среднее количество ходов за прохождение"""
+        return self.total_turns / self.games if self.games else 0.0
+
+    def to_dict (self):
+        """Сериализует агрегаты"""
+        return {
+            'games': self.games,
+            'total_turns': self.total_turns,
+            'endings': dict (self.endings),
+            'photos': {str (key): value for key, value in self.photos.items ()},
+            'peak_fear': list (self.peak_fear),
+            'turns': {str (key): value for key, value in self.turns.items ()},
+            'fastest_secret': [list (entry) for entry in self.fastest_secret],
+        }
+
+    def load (self):
+        """Загружает агрегаты из файла, если он существует"""
+        try:
+            with open (self.path, encoding='utf-8') as stats_file:
+                data = json.load (stats_file)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logger.warning ("Не удалось загрузить статистику из %s: %s", self.path, e)
+            return
+
+        self.reset ()
+        self.games = data.get ('games', 0)
+        self.total_turns = data.get ('total_turns', 0)
+        self.endings.update (data.get ('endings', {}))
+        self.photos = {int (key): value for key, value in data.get ('photos', {}).items ()}
+        self.peak_fear = data.get ('peak_fear', self.peak_fear)
+        self.turns = {int (key): value for key, value in data.get ('turns', {}).items ()}
+        self.fastest_secret = [tuple (entry) for entry in data.get ('fastest_secret', [])]
+        heapq.heapify (self.fastest_secret)
+
+    def flush (self):
+        """Атомарно сохраняет агрегаты в файл, если они изменились"""
+        if not self.dirty:
+            return False
+
+        self._write (self.to_dict ())
+        self.dirty = False
+        return True
+
+    def _write (self, data):
+        """Записывает агрегаты во временный файл и заменяет им основной"""
+        temp_path = f"{self.path}.tmp"
+        with open (temp_path, 'w', encoding='utf-8') as stats_file:
+            json.dump (data, stats_file, ensure_ascii=False)
+        os.replace (temp_path, self.path)
+
+    async def run_flusher (self, interval: float = 60.0):
+        """
+        Фоновая задача периодического сохранения. Снимок агрегатов берется в цикле
+        событий (там же их меняет record), запись файла идет в пуле потоков
+
+        Args:
+            interval: Период сохранения в секундах
+        """
+        loop = asyncio.get_running_loop ()
+        while True:
+            await asyncio.sleep (interval)
+            if not self.dirty:
+                continue
+
+            data = self.to_dict ()
+            self.dirty = False
+            write = loop.run_in_executor (None, self._write, data)
+            try:
+                await asyncio.shield (write)
+            except asyncio.CancelledError:
+                # Запись дописывается до конца, чтобы не столкнуться с сохранением при остановке
+                if (await asyncio.gather (write, return_exceptions=True))[0] is not None:
+                    self.dirty = True
+                raise
+            except OSError as e:
+                self.dirty = True
+                logger.error ("Не удалось сохранить статистику: %s", e)
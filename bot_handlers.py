@@ -1,36 +1,195 @@
 #!/usr/bin/env python
 import asyncio
+import html
+import logging
+import threading
 from telegram import Update
 from telegram.ext import CallbackContext, ConversationHandler
 
-from game_logic import GameLogic
 from game_states import GameState
 from telegram_ui import TelegramUI
 from styles import MessageStyles
+from media import SCENE_IMAGES
+from engine import CONTINUE_OPTION
+from history import SessionHistory
+from callbacks import (
+    ACTION_CONTINUE, ACTION_HELP, ACTION_LEGACY, ACTION_OPTION, ACTION_QUIT, ACTION_RESTART, ACTION_START,
+    CallbackRouter
+)
 import os
 
+logger = logging.getLogger (__name__)
+
+
 class BotHandlers:
     """Класс для обработки команд и сообщений бота"""
 
-    def __init__ (self, game_logic, ui):
+    def __init__ (self, engine, ui, prefetcher=None, stats=None, events=None, history_policy=None,
+                  save_slots: int = 3):
         """
         Инициализация обработчиков
 
         Args:
-            game_logic: Экземпляр класса GameLogic
+            engine: Экземпляр класса GameEngine или функция, создающая его
+                при первом обращении (для быстрого запуска)
             ui: Экземпляр класса TelegramUI
+            prefetcher: Экземпляр MediaPrefetcher для прогрева изображений (необязательно)
+            stats: Экземпляр EndingStats для статистики прохождений (необязательно)
+            events: Экземпляр EventStream для журнала выборов (необязательно)
+            history_policy: CompactionPolicy для истории ходов (/back)
+            save_slots: Количество ячеек сохранений (/save, /load)
         """
-        self.game = game_logic
+        self._engine = engine
+        self._engine_lock = threading.Lock ()
         self.ui = ui
+        self.prefetcher = prefetcher
+        self.stats = stats
+        self.events = events
+        self.history_policy = history_policy
+        self.save_slots = save_slots
         self.styles = MessageStyles ()  # Создаем экземпляр класса MessageStyles
 
+    @property
+    def engine (self):
+        """Экземпляр GameEngine, создаваемый при первом обращении"""
+        if callable (self._engine):
+            with self._engine_lock:
+                if callable (self._engine):
+                    self._engine = self._engine ()
+        return self._engine
+
+    def session (self, context: CallbackContext):
+        """Текущая игровая сессия чата или None"""
+        return context.user_data.get ('session')
+
+    def history (self, context: CallbackContext) -> SessionHistory:
+        """История ходов и ячейки сохранений игрока"""
+        history = context.user_data.get ('history')
+        if history is None:
+            history = context.user_data['history'] = SessionHistory (self.history_policy, self.save_slots)
+        return history
+
+    def export_user_data (self, user_data) -> dict:
+        """Состояние игрока для долговременного хранения (см. session_store.py)"""
+        session = user_data.get ('session')
+        history = user_data.get ('history')
+        # После возврата или загрузки генератор уже инициализирован seed снимка: его и сохраняем,
+        # чтобы следующий ход совпал с ходом из истории
+        rng_seed = history.resume.rng_seed if history is not None and history.resume is not None else None
+        return {
+            'scene': user_data.get ('scene'),
+            'session': self.engine.export_session (session, rng_seed) if session is not None else None,
+            # История ходов живет только в памяти, сохранения в ячейках - снимки из встроенных типов
+            'slots': dict (history.slots) if history is not None else {},
+            'last_turn': user_data.get ('last_turn'),
+        }
+
+    def restore_user_data (self, state: dict, user_data):
+        """Восстанавливает user_data из состояния export_user_data"""
+        if state['scene'] is not None:
+            user_data['scene'] = state['scene']
+        if state['session'] is not None:
+            user_data['session'] = self.engine.restore_session (state['session'])
+        if state.get ('last_turn') is not None:
+            user_data['last_turn'] = state['last_turn']
+        if state.get ('slots'):
+            history = user_data['history'] = SessionHistory (self.history_policy, self.save_slots)
+            history.slots.update (state['slots'])
+
+    def journal_key (self, user_data):
+        """
+        То, что меняется не ходами движка: пока ключ прежний, в журнал пишутся
+        только ходы, иначе - состояние игрока целиком (см. session_store.py)
+        """
+        session = user_data.get ('session')
+        history = user_data.get ('history')
+        scene = user_data.get ('scene')
+        return (
+            session,
+            None if session is not None and scene == self._scene_after_turn (session) else scene,
+            history.saves if history is not None else 0,
+        )
+
+    def replay_turn (self, user_data, turn_id, option_id, text, rng_seed) -> bool:
+        """
+        Повторяет ход из журнала так же, как его сделал обработчик
+
+        Args:
+            user_data: Данные игрока
+            turn_id: Идентификатор хода до хода
+            option_id: Индекс варианта (None для хода текстом)
+            text: Текст хода или None
+            rng_seed: Seed генератора, с которым был сделан ход
+
+        Returns:
+            bool: False, если состояние не совпадает с тем, в котором был сделан ход
+        """
+        session = user_data.get ('session')
+        if session is None or session.turn_id != turn_id or session.finished:
+            return False
+        session.game.rng.seed (rng_seed)
+        if text is None:
+            self.engine.step (session, option_id)
+        else:
+            self.engine.step_input (session, text)
+        user_data['scene'] = self._scene_after_turn (session)
+        # Законченное прохождение обработчик уже учел в статистике (см. _finish_game)
+        if session.finished:
+            session.recorded = True
+        return True
+
+    @staticmethod
+    def _scene_after_turn (session):
+        """Сцена в user_data после хода: по окончании игры - главное меню"""
+        return 'main_menu' if session.finished else session.scene
+
+    def buttons_message (self, context: CallbackContext):
+        """
+        Id последнего сообщения с кнопками, отправленного игроку (см. callbacks.is_stale).
+        В хранилище не сохраняется: после перезапуска бота проверка возобновляется
+        со следующего сообщения с кнопками
+
+        Returns:
+            int: Id сообщения или None, если он неизвестен
+        """
+        return context.user_data.get ('buttons_message')
+
+    async def _send_options (self, update: Update, context: CallbackContext, text: str, options: list, **kwargs):
+        """Отправляет сообщение с кнопками (см. TelegramUI.send_message_with_options) и запоминает его id"""
+        message = await self.ui.send_message_with_options (update, text, options, **kwargs)
+        if message is not None:
+            context.user_data['buttons_message'] = message.message_id
+
+    def _new_session (self, context: CallbackContext):
+        """Начинает новую игровую сессию вместо текущей"""
+        self._end_session (context)
+        session = self.engine.new_session ()
+        # Ходы продолжают нумерацию прошлых игр: номер хода у игрока не повторяется
+        session.turn_id = session.first_turn = context.user_data.get ('last_turn', -1) + 1
+        context.user_data['session'] = session
+        return session
+
+    def _end_session (self, context: CallbackContext):
+        """Убирает игровую сессию, запоминая ее последний ход (см. _new_session)"""
+        session = context.user_data.pop ('session', None)
+        if session is not None:
+            context.user_data['last_turn'] = session.turn_id
+
     async def start (self, update: Update, context: CallbackContext) -> int:
         """Начало работы с ботом"""
         user = update.effective_user
 
-        # Сбрасываем состояние игры при запуске
+        # Сбрасываем состояние игры при запуске (сохранения в ячейках и нумерация ходов остаются)
+        self._end_session (context)
+        history = context.user_data.get ('history')
+        last_turn = context.user_data.get ('last_turn')
         context.user_data.clear ()
         context.user_data['scene'] = 'main_menu'
+        if history is not None:
+            history.reset ()
+            context.user_data['history'] = history
+        if last_turn is not None:
+            context.user_data['last_turn'] = last_turn
 
         welcome_text = (
             f"Привет, {self.styles.bold (user.first_name)}! "
@@ -43,13 +202,15 @@ class BotHandlers:
 
         # Отправляем кнопки для выбора действия
         options = ["Начать игру", "Справка", "Выйти"]
-        await self.ui.send_message_with_options (update, "Выберите действие:", options)
+        await self._send_options (update, context, "Выберите действие:", options,
+                                  actions=(ACTION_START, ACTION_HELP, ACTION_QUIT))
 
         return GameState.MAIN_MENU
 
     async def begin_game (self, update: Update, context: CallbackContext) -> int:
-        # Сбрасываем историю выбранных опций
-        context.user_data['selected_options'] = {}
+        # У каждого чата своя игровая сессия (выбранные варианты, инвентарь, страх)
+        session = self._new_session (context)
+        self.history (context).reset ()
 
         # Показываем эффект набора текста
         await self.ui.send_typing_action (update, context)
@@ -59,11 +220,15 @@ class BotHandlers:
         await self.ui.send_image (
             update,
             context,
-            image_path='images/intro.jpg',  # Путь к изображению
+            image_path=SCENE_IMAGES['intro'],  # Путь к изображению
         )
 
+        # Прогреваем изображения следующих сцен
+        if self.prefetcher:
+            self.prefetcher.on_scene (context.bot, 'intro')
+
         # Получаем вступительный текст
-        intro_raw = self.game.get_introduction ()
+        intro_raw = self.engine.introduction (session)
 
         # Применяем стилизацию к вступительному тексту
         intro_parts = intro_raw.split ("\n\n")
@@ -80,8 +245,6 @@ class BotHandlers:
         # Объединяем все части с форматированием
         intro_text = f"{narration}\n\n{inner_voice}"
 
-        # Получаем варианты ответов для вступительной сцены
-        options = self.game.get_options_for_scene ('intro')
 
         # Отправляем текстовое сообщение
         if update.message:
@@ -90,350 +253,286 @@ class BotHandlers:
             await update.callback_query.message.reply_text (intro_text, parse_mode='HTML')
 
         # Отправляем кнопки с вариантами
-        await self.ui.send_message_with_options (update, "Варианты действий:", options)
+        await self._send_options (update, context, "Варианты действий:", session.options)
 
         # Сохраняем текущую сцену в контексте пользователя
         context.user_data['scene'] = 'intro'
 
         return GameState.IN_GAME
 
-    async def handle_button_selection (self, update: Update, context: CallbackContext) -> int:
-        query = update.callback_query
-        await query.answer ()  # Отвечаем на запрос, чтобы убрать "часики" на кнопке
-
-        # Получаем текущую сцену и данные callback
+    def build_router (self) -> CallbackRouter:
+        """Таблица действий inline-кнопок (см. callbacks.py)"""
+        router = CallbackRouter (buttons_message=self.buttons_message)
+        router.route (ACTION_START, self.begin_game, takes_arg=False)
+        router.route (ACTION_RESTART, self.begin_game, takes_arg=False)
+        router.route (ACTION_HELP, self.help_command, takes_arg=False)
+        router.route (ACTION_QUIT, self.quit_command, takes_arg=False)
+        router.route (ACTION_OPTION, self.choose_option)
+        router.route (ACTION_CONTINUE, self.continue_scene, takes_arg=False)
+        router.route (ACTION_LEGACY, self.handle_button_selection)
+        return router
+
+    async def handle_button_selection (self, update: Update, context: CallbackContext, option_index: int) -> int:
+        """Обработка кнопок старого формата "option_N": значение индекса зависит от текущей сцены"""
         current_scene = context.user_data.get ('scene', 'main_menu')
-        option_index = self.ui.get_option_index (query.data)
+        logger.debug ("Кнопка старого формата, индекс: %s, текущая сцена: %s", option_index, current_scene)
 
-        print (f"Получили callback с данными: {query.data}, индекс: {option_index}, текущая сцена: {current_scene}")
-        print (f"DEBUG: Инвентарь игрока: {self.game.player.inventory}")
-        print (f"DEBUG: Начинаем обработку выбора. Текущая сцена: {current_scene}, индекс: {option_index}")
+        # Специальные обработчики для главного меню
+        if current_scene == 'main_menu' or not current_scene:
+            if option_index == 0:  # "Начать игру"
+                return await self.begin_game (update, context)
+            elif option_index == 1:  # "Справка"
+                return await self.help_command (update, context)
+            elif option_index == 2:  # "Выйти"
+                return await self.quit_command (update, context)
+            return GameState.MAIN_MENU
 
-        # Проверяем, является ли это специальным индексом для продолжения
-        if option_index == -1:
-            print ("DEBUG: Это опция 'Продолжить', переходим к обработке")
+        if option_index == CONTINUE_OPTION:
+            return await self.continue_scene (update, context)
+        return await self.choose_option (update, context, option_index)
 
-            # Определяем следующую сцену в зависимости от текущей
-            next_scene = self._get_next_scene_after_exhaustion (current_scene)
+    async def continue_scene (self, update: Update, context: CallbackContext) -> int:
+        """Переход по варианту "Продолжить", когда все варианты сцены исчерпаны"""
+        # Сессии нет (например, после перезапуска бота) - начинаем заново
+        session = context.user_data.get ('session')
+        if session is None or session.finished:
+            return await self.begin_game (update, context)
 
-            # Отправляем сообщение о переходе
-            transition_message = f"Алексей решает двигаться дальше, поскольку больше нечего здесь исследовать."
-            formatted_message = self._apply_style_to_response (transition_message)
+        if not session.exhausted:
+            return GameState.IN_GAME
 
-            await query.message.reply_text (formatted_message, parse_mode='HTML')
+        current_scene = session.scene
+        self.history (context).record (session)
+        result = self.engine.step (session, CONTINUE_OPTION)
+        await self._publish_turn (update, session, result)
 
-            # Обновляем текущую сцену
-            context.user_data['scene'] = next_scene
+        # Отправляем сообщение о переходе
+        await update.callback_query.message.reply_text (self.styles.format_response (result.text), parse_mode='HTML')
 
-            # Получаем варианты для новой сцены
-            options = self.game.get_options_for_scene (next_scene)
-            selected_options = context.user_data.get ('selected_options', {})
+        # Обновляем текущую сцену и отправляем варианты для новой сцены
+        context.user_data['scene'] = result.next_scene
+        await self._enter_scene (update, context, current_scene, result.next_scene)
+        await self._send_scene_options (update, context, result)
 
-            # Если для новой сцены нет списка выбранных опций, создаем пустой
-            if next_scene not in selected_options:
-                selected_options[next_scene] = []
+        return GameState.IN_GAME
 
-            # Отправляем варианты для новой сцены
-            await self.ui.send_message_with_options (
-                update,
-                "Что будете делать?",
-                options,
-                disabled_options=selected_options.get (next_scene, [])
-            )
+    async def choose_option (self, update: Update, context: CallbackContext, option_index: int) -> int:
+        """
+        Ход выбором варианта сцены
 
-            return GameState.IN_GAME
+        Args:
+            update: Объект Update из Telegram
+            context: Контекст обработчика
+            option_index: Исходный индекс варианта в session.options
+        """
+        query = update.callback_query
 
-        # Специальные обработчики для главного меню
-        elif current_scene == 'main_menu' or not current_scene:
-            print (f"DEBUG: Обработка опции главного меню: {option_index}")
-            if option_index == 0:  # "Начать игру"
-                print ("DEBUG: Выбрана опция 'Начать игру'")
-                return await self.begin_game (update, context)
-            elif option_index == 1:  # "Справка"
-                print ("DEBUG: Выбрана опция 'Справка'")
-                return await self.help_command (update, context)
-            elif option_index == 2:  # "Выйти"
-                print ("DEBUG: Выбрана опция 'Выйти'")
-                return await self.quit_command (update, context)
+        # Сессии нет (например, после перезапуска бота) - начинаем заново
+        session = context.user_data.get ('session')
+        if session is None or session.finished:
+            return await self.begin_game (update, context)
 
-        # Обработка игровых опций
-        else:
-            print (f"DEBUG: Обработка игровой опции для сцены {current_scene}")
-
-            # Получаем варианты ответов для текущей сцены
-            options = self.game.get_options_for_scene (current_scene)
-            print (f"DEBUG: Доступные опции: {options}")
-
-            # Проверяем, что индекс опции действителен
-            if option_index >= len (options):
-                print (f"ERROR: Индекс опции {option_index} за пределами списка вариантов длиной {len (options)}")
-                return GameState.IN_GAME
-
-            print (f"DEBUG: Выбрана опция '{options[option_index]}'")
-
-            # ЗДЕСЬ ДОЛЖЕН БЫТЬ ВАШ ОРИГИНАЛЬНЫЙ КОД ДЛЯ ОБРАБОТКИ ИГРОВЫХ ОПЦИЙ
-            # Получаем словарь выбранных сцен из контекста пользователя
-            selected_options = context.user_data.get ('selected_options', {})
-
-            # Если для текущей сцены нет списка выбранных опций, создаем пустой
-            if current_scene not in selected_options:
-                selected_options[current_scene] = []
-
-            # Обработка выбора для игровых сцен
-            await self.ui.send_typing_action (update, context)
-            await asyncio.sleep (2)
-
-            # Сохраняем состояние игрока ДО обработки опции
-            old_inventory = self.game.player.inventory.copy ()
-
-            # Обрабатываем выбор пользователя
-            response, next_scene = self.game.process_option_selection (current_scene, option_index)
-
-            # Сравниваем инвентарь до и после выбора
-            new_inventory = self.game.player.inventory.copy ()
-            items_gained = [item for item in new_inventory if item not in old_inventory]
-            if items_gained:
-                print (f"DEBUG: Игрок получил новые предметы: {items_gained}")
-
-            # Проверяем, требует ли выбранный вариант предмета, которого нет у игрока
-            requires_unavailable_item = self._option_requires_unavailable_item (current_scene, option_index)
-
-            # Добавляем текущий выбор в список выбранных для текущей сцены только если
-            # он не требует недоступного предмета или добавил предмет в инвентарь
-            if ((option_index not in selected_options[current_scene] and not requires_unavailable_item)
-                    or items_gained):
-                selected_options[current_scene].append (option_index)
-                print (f"DEBUG: Добавлена опция {option_index} в список выбранных для сцены {current_scene}")
-            else:
-                print (
-                    f"DEBUG: Опция {option_index} НЕ добавлена в список выбранных. Требует недоступный предмет: {requires_unavailable_item}")
-
-            # Сохраняем обновленный список в контексте пользователя
-            context.user_data['selected_options'] = selected_options
-            print (f"DEBUG: Текущие выбранные опции: {selected_options}")
-
-            # Применяем стилизацию к ответу
-            formatted_response = self._apply_style_to_response (response)
-
-            # Обновляем текущую сцену
-            context.user_data['scene'] = next_scene
-
-            # Если игра завершена, показываем соответствующие опции
-            if next_scene == 'end':
-                await query.message.reply_text (formatted_response, parse_mode='HTML')
-                await self.ui.send_message_with_options (update,
-                                                         "Игра окончена. Что делаем дальше?",
-                                                         ["Начать заново", "Выйти"])
-                context.user_data['scene'] = 'main_menu'
-                return GameState.MAIN_MENU
-
-            # Получаем варианты ответов для новой сцены
-            options = self.game.get_options_for_scene (next_scene)
-
-            # Отправляем текстовый ответ
-            await query.message.reply_text (formatted_response, parse_mode='HTML')
-
-            # Добавляем информацию об уровне страха
-            if hasattr (self.game, 'player') and hasattr (self.game.player, 'fear_level'):
-                fear_level_text = self.styles.format_fear_level (self.game.player.fear_level)
-                await query.message.reply_text (fear_level_text, parse_mode='HTML')
-
-            # При переходе в новую сцену используем сохраненные выбранные опции для этой сцены
-            # Если сцена новая, создаем для нее пустой список
-            if next_scene not in selected_options:
-                selected_options[next_scene] = []
-
-            # Распечатаем доступные опции и список скрытых опций
-            print (f"DEBUG: Доступные опции для сцены {next_scene}: {options}")
-            print (f"DEBUG: Скрытые опции: {selected_options.get (next_scene, [])}")
-
-            # При отправке опций передаем список выбранных индексов для текущей сцены
-            await self.ui.send_message_with_options (
-                update,
-                "Что будете делать?",
-                options,
-                disabled_options=selected_options.get (next_scene, [])
-            )
+        current_scene = session.scene
+        logger.debug ("Обработка игровой опции %s для сцены %s", option_index, current_scene)
+        logger.debug ("Инвентарь игрока: %s", session.game.player.inventory)
 
+        # Проверяем, что индекс опции действителен
+        if not 0 <= option_index < len (session.options):
+            logger.error ("Индекс опции %s за пределами списка вариантов длиной %d", option_index, len (session.options))
             return GameState.IN_GAME
 
-    def _get_next_scene_after_exhaustion (self, current_scene):
-        """
-        Определяет, в какую сцену перейти после того, как все опции
-        в текущей сцене исчерпаны
+        logger.debug ("Выбрана опция '%s'", session.options[option_index])
 
-        Args:
-            current_scene: Текущая сцена
+        # Обработка выбора для игровых сцен
+        await self.ui.send_typing_action (update, context)
+        await asyncio.sleep (2)
 
-        Returns:
-            str: Следующая сцена
-        """
-        # Карта переходов для разных сцен
-        scene_transitions = {
-            'room_with_portrait': 'corridor',
-            'corridor': 'basement',
-            'children_room': 'corridor',
-            'basement': 'corridor',
-            'library': 'corridor',
-            'doctor_office': 'library'
-        }
+        self.history (context).record (session)
+        result = self.engine.step (session, option_index)
+        if result.items_gained:
+            logger.debug ("Игрок получил новые предметы: %s", result.items_gained)
+        logger.debug ("Выбранные опции: %s", session.selected)
+
+        # Публикуем событие выбора (без ожидания записи на диск)
+        await self._publish_turn (update, session, result)
+
+        # Применяем стилизацию к ответу
+        formatted_response = self.styles.format_response (result.text)
 
-        # Если для текущей сцены определен переход, используем его
-        if current_scene in scene_transitions:
-            return scene_transitions[current_scene]
+        # Обновляем текущую сцену
+        context.user_data['scene'] = result.next_scene
+
+        # Если игра завершена, показываем соответствующие опции
+        if result.finished:
+            return await self._finish_game (update, context, session, query.message, formatted_response)
 
-        # По умолчанию возвращаемся в коридор
-        return 'corridor'
+        # Отправляем текстовый ответ
+        await query.message.reply_text (formatted_response, parse_mode='HTML')
+        await self._enter_scene (update, context, current_scene, result.next_scene)
 
+        # Индикатор страха отправляем только при смене полосы
+        if result.band_changed:
+            fear_level_text = self.styles.format_fear_level (result.fear_after)
+            await query.message.reply_text (fear_level_text, parse_mode='HTML')
 
+        # Отправляем варианты с масками выбранных и закрытых вариантов новой сцены
+        await self._send_scene_options (update, context, result)
 
+        return GameState.IN_GAME
 
-    def _option_requires_unavailable_item (self, scene, option_index):
+    async def _send_scene_options (self, update: Update, context: CallbackContext, result):
         """
-        Проверяет, требует ли выбранный вариант предмета, которого нет у игрока
+        Отправляет варианты следующего хода
 
         Args:
-            scene: Текущая сцена
-            option_index: Индекс выбранного варианта
+            update: Объект Update из Telegram
+            context: Контекст обработчика
+            result: TurnResult последнего хода
+        """
+        logger.debug ("Доступные опции для сцены %s: %s", result.next_scene, result.options)
+        logger.debug ("Скрытые опции: %s", bin (result.disabled))
 
-        Returns:
-            bool: True, если вариант требует отсутствующий предмет, иначе False
+        await self._send_options (
+            update,
+            context,
+            "Что будете делать?",
+            result.options,
+            scene=result.next_scene,
+            disabled_options=result.disabled,
+            locked_options=result.locked
+        )
+
+    async def _publish_turn (self, update: Update, session, result):
         """
-        # Получаем варианты для текущей сцены
-        options = self.game.get_options_for_scene (scene)
-        if option_index >= len (options):
-            return False
+        Публикует событие хода в журнал выборов (вариант - CONTINUE_OPTION для "Продолжить",
+        None для хода текстом)
 
-        selected_option = options[option_index].lower ()
+        Args:
+            update: Объект Update из Telegram
+            session: Игровая сессия
+            result: TurnResult хода
+        """
+        if not self.events:
+            return
+
+        await self.events.publish ({
+            'chat': update.effective_chat.id,
+            'game': session.first_turn,
+            'scene': result.scene,
+            'option': result.option_id,
+            'next_scene': result.next_scene,
+            'fear_before': result.fear_before,
+            'fear_after': result.fear_after,
+            'false_option': result.false_option,
+            'hallucinations': len (result.hallucinations),
+            'items_gained': result.items_gained,
+            'photos': session.game.found_photos,
+        })
+
+    async def _finish_game (self, update: Update, context: CallbackContext, session, message, formatted_response):
+        """
+        Завершает прохождение: учитывает его в статистике и предлагает начать заново
 
-        # Проверяем сцены и варианты, требующие предметы
-        if scene == 'room_with_portrait':
-            # Проверка для варианта с ящиком, который требует ключ
-            if "ящик" in selected_option and not self.game.player.has_item ("ключ"):
-                print (f"DEBUG: Ящик требует ключ, у игрока нет ключа")
-                return True
-            # Проверка для варианта с дверью, который требует ключ
-            elif "дверь" in selected_option and not self.game.player.has_item ("ключ"):
-                print (f"DEBUG: Дверь требует ключ, у игрока нет ключа")
-                return True
+        Args:
+            update: Объект Update из Telegram
+            context: Контекст обработчика
+            session: Завершенная игровая сессия
+            message: Сообщение, на которое отвечаем
+            formatted_response: Оформленный текст последнего хода
 
-        elif scene == 'library':
-            # Проверка для входа в библиотеку, требующего ключ
-            if not self.game.player.has_item ("ключ от библиотеки"):
-                print (f"DEBUG: Библиотека требует ключ, у игрока нет ключа")
-                return True
+        Returns:
+            int: Состояние главного меню
+        """
+        self._record_playthrough (update, session)
+        # К ходам законченного прохождения не вернуться
+        self.history (context).reset ()
+        await message.reply_text (formatted_response, parse_mode='HTML')
+        await self._send_options (update, context,
+                                  "Игра окончена. Что делаем дальше?",
+                                  ["Начать заново", "Выйти"],
+                                  actions=(ACTION_RESTART, ACTION_QUIT))
+        context.user_data['scene'] = 'main_menu'
+        return GameState.MAIN_MENU
 
-        # Добавляем отладочную информацию
-        print (f"DEBUG: Опция '{selected_option}' не требует предметов или требуемые предметы есть у игрока")
-        return False
+    def _record_playthrough (self, update: Update, session):
+        """
+        Передает завершенное прохождение в статистику
 
+        Args:
+            update: Объект Update из Telegram
+            session: Завершенная игровая сессия
+        """
+        if self.stats is None or session.recorded:
+            return
 
+        session.recorded = True
+        user = update.effective_user
+        self.stats.record (
+            ending=session.ending or 'neutral',
+            turns=session.turns,
+            photos=session.game.found_photos,
+            peak_fear=session.peak_fear,
+            player_name=user.first_name if user else None
+        )
 
-    def _apply_style_to_response (self, response):
+    async def _enter_scene (self, update: Update, context: CallbackContext, previous_scene, scene):
         """
-        Применяет стилизацию к ответу игры
+        Показывает изображение сцены при входе в нее и прогревает изображения ближайших сцен
 
         Args:
-            response: Исходный текст ответа
-
-        Returns:
-            str: Стилизованный текст
+            update: Объект Update из Telegram
+            context: Контекст обработчика
+            previous_scene: Сцена, из которой пришел игрок
+            scene: Новая сцена
         """
-        # Разделяем ответ на части (нарративный текст и диалоги)
-        parts = response.split ("\n\n")
-        formatted_parts = []
-
-        for part in parts:
-            if "Внутренний голос:" in part:
-                # Форматируем внутренний голос
-                voice_parts = part.split ("Внутренний голос:", 1)
-                message_text = voice_parts[1].strip ()
-                formatted_parts.append (self.styles.format_scene_message ("Внутренний голос", message_text))
-            elif "Доктор Валентин:" in part:
-                # Форматируем сообщение от доктора
-                message_text = part.replace ("Доктор Валентин:", "").strip ()
-                formatted_parts.append (self.styles.format_scene_message ("Доктор Валентин", message_text))
-
-            elif "галлюцинац" in part.lower () or "мерещ" in part.lower () or "чудит" in part.lower ():
-                # Форматируем галлюцинации особым образом
-                formatted_parts.append (self.styles.format_hallucination (part))
-
-            elif "Алексей:" in part:
-                # Форматируем сообщение от Алексея
-                message_text = part.replace ("Алексей:", "").strip ()
-                formatted_parts.append (self.styles.format_scene_message ("Алексей", message_text))
-            elif "ЗАПИСЬ ПАЦИЕНТА" in part or "ПРОТОКОЛ ЛЕЧЕНИЯ" in part:
-                # Форматируем медицинские записи как код
-                formatted_parts.append (self.styles.code (part))
-            elif "ХОРОШАЯ КОНЦОВКА" in part:
-                # Форматируем текст хорошей концовки
-                formatted_parts.append (self.styles.format_ending ("good", part))
-            elif "ПЛОХАЯ КОНЦОВКА" in part:
-                # Форматируем текст плохой концовки
-                formatted_parts.append (self.styles.format_ending ("bad", part))
-            elif "СЕКРЕТНАЯ КОНЦОВКА" in part:
-                # Форматируем текст секретной концовки
-                formatted_parts.append (self.styles.format_ending ("secret", part))
-            elif "НЕЙТРАЛЬНАЯ КОНЦОВКА" in part:
-                # Форматируем текст нейтральной концовки
-                formatted_parts.append (self.styles.format_ending ("neutral", part))
-            elif part.startswith ("'") and part.endswith ("'") and len (part) > 10:
-                # Форматируем цитаты и записи как выделенный текст
-                formatted_parts.append (self.styles.format_horror_effect (part.strip ("'")))
-            else:
-                # Остальной текст - это нарратив
-                formatted_parts.append (self.styles.format_narration (part))
-
-        # Объединяем форматированные части
-        return "\n\n".join (formatted_parts)
+        if scene == previous_scene:
+            return
+
+        if self.prefetcher:
+            self.prefetcher.on_scene (context.bot, scene)
+
+        image_path = SCENE_IMAGES.get (scene)
+        if image_path:
+            await self.ui.send_image (update, context, image_path=image_path)
 
     async def handle_message (self, update: Update, context: CallbackContext) -> int:
         """Обработка текстовых сообщений (устаревший метод, оставлен для совместимости)"""
         user_message = update.message.text
-        current_scene = context.user_data.get ('scene', 'intro')
+
+        # Вне игры текст игнорируется
+        session = context.user_data.get ('session')
+        if session is None or session.finished:
+            return GameState.MAIN_MENU
 
         # Показываем эффект набора текста
         await self.ui.send_typing_action (update, context)
         await asyncio.sleep (2)  # Задержка для реалистичности хоррора
 
         # Получаем ответ и следующую сцену
-        response, next_scene = self.game.process_input (current_scene, user_message)
+        self.history (context).record (session)
+        result = self.engine.step_input (session, user_message)
+        await self._publish_turn (update, session, result)
 
         # Применяем стилизацию к ответу
-        formatted_response = self._apply_style_to_response (response)
-
-        # Получаем словарь выбранных сцен из контекста пользователя
-        selected_options = context.user_data.get ('selected_options', {})
-
-        # Если для текущей сцены нет списка выбранных опций, создаем пустой
-        if next_scene not in selected_options:
-            selected_options[next_scene] = []
+        formatted_response = self.styles.format_response (result.text)
 
         # Обновляем текущую сцену
-        context.user_data['scene'] = next_scene
+        context.user_data['scene'] = result.next_scene
+
+        # Если игра закончилась
+        if result.finished:
+            return await self._finish_game (update, context, session, update.message, formatted_response)
 
         # Отправляем ответ
         await update.message.reply_text (formatted_response, parse_mode='HTML')
 
-        # Добавляем информацию об уровне страха, если персонаж в игре
-        if hasattr (self.game, 'player') and hasattr (self.game.player, 'fear_level'):
-            fear_level_text = self.styles.format_fear_level (self.game.player.fear_level)
+        # Индикатор страха отправляем только при смене полосы
+        if result.band_changed:
+            fear_level_text = self.styles.format_fear_level (result.fear_after)
             await update.message.reply_text (fear_level_text, parse_mode='HTML')
 
-        # Если игра закончилась
-        if next_scene == 'end':
-            options = ["Начать заново", "Выйти"]
-            await self.ui.send_message_with_options (update, "Игра окончена. Что делаем дальше?", options)
-            return GameState.MAIN_MENU
-
         # Для всех остальных сцен показываем варианты ответов
-        options = self.game.get_options_for_scene (next_scene)
-        await self.ui.send_message_with_options (
-            update,
-            "Что будете делать?",
-            options,
-            disabled_options=selected_options.get (next_scene, [])
-        )
+        await self._send_scene_options (update, context, result)
 
         return GameState.IN_GAME
 
@@ -449,6 +548,10 @@ class BotHandlers:
             f"/start - Перезапустить бота\n"
             f"/begin - Начать новую игру\n"
             f"/help - Показать эту справку\n"
+            f"/save [N] - Сохранить игру в ячейку N (по умолчанию 1)\n"
+            f"/load [N] - Загрузить игру из ячейки N\n"
+            f"/back - Вернуться на ход назад\n"
+            f"/stats - Статистика прохождений\n"
             f"/quit - Выйти из игры"
         )
 
@@ -460,16 +563,124 @@ class BotHandlers:
 
         # Показываем кнопки для возврата
         options = ["Начать игру", "Выйти"]
-        await self.ui.send_message_with_options (update, "Что дальше?", options)
+        await self._send_options (update, context, "Что дальше?", options,
+                                  actions=(ACTION_START, ACTION_QUIT))
 
         return GameState.MAIN_MENU
 
+    def _slot (self, context: CallbackContext):
+        """Номер ячейки из аргумента команды (по умолчанию 1) или None, если он некорректен"""
+        if not context.args:
+            return 1
+        try:
+            slot = int (context.args[0])
+        except ValueError:
+            return None
+        return slot if 1 <= slot <= self.save_slots else None
+
+    async def _send_current_options (self, update: Update, context: CallbackContext, session, text: str):
+        """Отправляет сообщение и варианты текущей сцены сессии (после загрузки или возврата)"""
+        await update.message.reply_text (text, parse_mode='HTML')
+        await self._send_options (
+            update,
+            context,
+            "Что будете делать?",
+            session.options,
+            scene=session.scene,
+            disabled_options=session.disabled,
+            locked_options=self.engine.locked_options (session)
+        )
+
+    async def save_command (self, update: Update, context: CallbackContext):
+        """Сохранение игры в ячейку: /save [N]"""
+        session = context.user_data.get ('session')
+        if session is None or session.finished:
+            await update.message.reply_text ("Нет начатой игры. Начните ее командой /begin.")
+            return
+
+        slot = self._slot (context)
+        if slot is None:
+            await update.message.reply_text (f"Укажите номер ячейки от 1 до {self.save_slots}.")
+            return
+
+        self.history (context).save (slot, session)
+        await update.message.reply_text (
+            f"{self.styles.emoji['info']} Игра сохранена в ячейку {slot}. Загрузить: /load {slot}",
+            parse_mode='HTML'
+        )
+
+    async def load_command (self, update: Update, context: CallbackContext):
+        """Загрузка игры из ячейки: /load [N]"""
+        slot = self._slot (context)
+        if slot is None:
+            await update.message.reply_text (f"Укажите номер ячейки от 1 до {self.save_slots}.")
+            return
+
+        history = self.history (context)
+        if slot not in history.slots:
+            await update.message.reply_text (f"Ячейка {slot} пуста.")
+            return
+
+        # Сохранение можно загрузить и после выхода из игры или ее окончания
+        session = context.user_data.get ('session')
+        if session is None:
+            session = self._new_session (context)
+        history.load (slot, session)
+        context.user_data['scene'] = session.scene
+        await self._send_current_options (
+            update, context, session, f"{self.styles.emoji['info']} Игра загружена из ячейки {slot}."
+        )
+
+    async def back_command (self, update: Update, context: CallbackContext):
+        """Возврат на ход назад: /back"""
+        session = context.user_data.get ('session')
+        if session is None or session.finished or not self.history (context).rewind (session):
+            await update.message.reply_text ("Возвращаться некуда.")
+            return
+
+        context.user_data['scene'] = session.scene
+        await self._send_current_options (update, context, session, "Алексей пытается вспомнить, что было мгновение назад...")
+
+    async def stats_command (self, update: Update, context: CallbackContext):
+        """Отправка статистики прохождений"""
+        if self.stats is None:
+            await update.message.reply_text ("Статистика недоступна.")
+            return
+
+        stats = self.stats
+        ending_names = {
+            'end_acceptance': "принятие",
+            'end_denial': "отрицание",
+            'end_secret': "секретная",
+            'neutral': "нейтральная",
+        }
+        endings_text = ", ".join (
+            f"{name} - {stats.endings[ending]}" for ending, name in ending_names.items ()
+        )
+
+        stats_text = (
+            f"{self.styles.emoji['info']} {self.styles.bold ('Статистика прохождений')}\n\n"
+            f"Завершено игр: {stats.games}\n"
+            f"Концовки: {endings_text}\n"
+            f"Среднее количество ходов: {stats.average_turns ():.1f}"
+        )
+
+        leaderboard = stats.leaderboard ()
+        if leaderboard:
+            stats_text += f"\n\n{self.styles.emoji['unlock']} {self.styles.bold ('Быстрейшие секретные концовки:')}"
+            for place, (name, turns) in enumerate (leaderboard, 1):
+                stats_text += f"\n{place}. {html.escape (name)} - {turns} ход."
+
+        await update.message.reply_text (stats_text, parse_mode='HTML')
+
     async def quit_command (self, update: Update, context: CallbackContext) -> int:
         """Выход из игры"""
         message = (
             f"Спасибо за игру! {self.styles.emoji['skull']} "
             f"Чтобы снова погрузиться в кошмар, введите /start."
         )
+        # Вышедшему игроку не приходят фоновые события
+        self._end_session (context)
 
         if update.message:
             await update.message.reply_text (message, parse_mode='HTML')
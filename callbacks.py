@@ -0,0 +1,267 @@
+#!/usr/bin/env python
+"""
+Компактный протокол данных inline-кнопок и маршрутизатор нажатий.
+Данные кнопки - версия протокола и упакованное число (действие и его
+аргумент) в шестнадцатеричной записи, например "r1:15". Разбор - один
+split и int, маршрут - поиск в таблице действий, без проверки состояний
+ConversationHandler и ветвления по сценам.
+
+Данные кнопки не зависят от хода, поэтому одна клавиатура подходит
+всем ходам и игрокам (см. TelegramUI). Устаревшее нажатие - кнопка из
+сообщения старше последнего сообщения с кнопками, отправленного игроку
+(id сообщений в чате только растут). Такие нажатия отбрасываются (см.
+dedup.py и CallbackRouter.dispatch). Третье поле в данных кнопок прошлой
+версии ("r1:15:4") игнорируется.
+
+Запуск бенчмарка:
+    python callbacks.py --benchmark 1000000
+"""
+import argparse
+import datetime
+import logging
+import time
+import warnings
+
+logger = logging.getLogger (__name__)
+
+# Версия протокола: кнопки старых версий распознаются по префиксу
+PREFIX = 'r1'
+
+# Максимальная длина callback_data в Telegram, байт
+MAX_CALLBACK_DATA = 64
+
+# Действия
+(
+    ACTION_UNKNOWN,  # данные не распознаны
+    ACTION_OPTION,  # вариант сцены, аргумент - исходный индекс варианта
+    ACTION_CONTINUE,  # "Продолжить" после исчерпания вариантов
+    ACTION_START,  # "Начать игру" в главном меню
+    ACTION_HELP,  # "Справка"
+    ACTION_QUIT,  # "Выйти"
+    ACTION_RESTART,  # "Начать заново" после концовки
+    ACTION_LEGACY,  # кнопка формата "option_N", отправленная до перехода на протокол
+) = range (8)
+
+ACTION_COUNT = 8
+
+
+def encode (action, arg=0):
+    """
+    Упаковывает действие и аргумент в callback_data
+
+    Args:
+        action: Действие (ACTION_*)
+        arg: Неотрицательный аргумент действия
+
+    Returns:
+        str: Данные кнопки
+    """
+    data = f"{PREFIX}:{arg * ACTION_COUNT + action:x}"
+    if len (data.encode ()) > MAX_CALLBACK_DATA:
+        raise ValueError (f"callback_data длиннее {MAX_CALLBACK_DATA} байт: {data}")
+    return data
+
+
+def decode (data):
+    """
+    Распаковывает callback_data
+
+    Args:
+        data: Данные кнопки
+
+    Returns:
+        tuple: (действие, аргумент); для нераспознанных данных (ACTION_UNKNOWN, 0)
+    """
+    prefix, _, packed = data.partition (':')
+    if prefix == PREFIX:
+        try:
+            value = int (packed.partition (':')[0], 16)
+        except ValueError:
+            return ACTION_UNKNOWN, 0
+        return value % ACTION_COUNT, value // ACTION_COUNT
+
+    # Кнопки старого формата в сообщениях, отправленных до обновления
+    if data.startswith ('option_'):
+        try:
+            return ACTION_LEGACY, int (data[7:])
+        except ValueError:
+            pass
+    return ACTION_UNKNOWN, 0
+
+
+def is_stale (query, message_id):
+    """
+    True, если нажата кнопка из сообщения старше последнего сообщения с кнопками.
+    Более новое сообщение - то, которое еще отправляется: его id пока не запомнен
+
+    Args:
+        query: CallbackQuery
+        message_id: Id последнего сообщения с кнопками, отправленного игроку (None - неизвестен)
+    """
+    return message_id is not None and query.message is not None and query.message.message_id < message_id
+
+
+class CallbackRouter:
+    """Таблица действий: нажатие передается обработчику без промежуточных проверок"""
+
+    def __init__ (self, buttons_message=None):
+        """
+        Args:
+            buttons_message: Функция context -> id последнего сообщения с кнопками (см. is_stale);
+                без нее устаревшие нажатия не проверяются
+        """
+        self.routes = {}
+        self.buttons_message = buttons_message
+        self.dispatched = 0
+        self.unknown = 0
+        self.stale = 0
+
+    def route (self, action, handler, takes_arg=True):
+        """
+        Регистрирует обработчик действия
+
+        Args:
+            action: Действие (ACTION_*)
+            handler: Асинхронный обработчик (update, context, arg) или (update, context)
+            takes_arg: Передавать ли обработчику аргумент действия
+        """
+        if takes_arg:
+            self.routes[action] = handler
+        else:
+            async def without_arg (update, context, arg):
+                return await handler (update, context)
+
+            self.routes[action] = without_arg
+
+    async def dispatch (self, update, context):
+        """Обработчик CallbackQuery: подтверждает нажатие и вызывает обработчик действия"""
+        query = update.callback_query
+        await query.answer ()  # Убираем "часики" на кнопке
+
+        # Под блокировкой чата прошлый ход уже отправил свои кнопки: нажатие старой кнопки не применяется
+        if self.buttons_message is not None and is_stale (query, self.buttons_message (context)):
+            self.stale += 1
+            return None
+
+        action, arg = decode (query.data)
+        handler = self.routes.get (action)
+        if handler is None:
+            self.unknown += 1
+            logger.debug ("Неизвестные данные кнопки: %s", query.data)
+            return None
+
+        self.dispatched += 1
+        return await handler (update, context, arg)
+
+    def get_stats (self):
+        """Возвращает счетчики маршрутизации"""
+        return {'dispatched': self.dispatched, 'unknown': self.unknown, 'stale': self.stale}
+
+
+def _legacy_route (data, scene):
+    """Разбор и ветвление в том виде, как это делали get_option_index и handle_button_selection"""
+    if data.startswith ("option_"):
+        try:
+            index = int (data.replace ("option_", ""))
+        except ValueError:
+            index = -1
+    else:
+        index = -1
+
+    if index == -1:
+        return 'continue'
+    elif scene == 'main_menu' or not scene:
+        if index == 0:
+            return 'begin'
+        elif index == 1:
+            return 'help'
+        elif index == 2:
+            return 'quit'
+        return None
+    return 'option'
+
+
+def benchmark (count):
+    """Сравнивает разбор и маршрутизацию нажатий старым и новым способом"""
+    legacy_samples = [("option_1", 'corridor'), ("option_-1", 'basement'), ("option_0", 'main_menu')]
+    samples = [encode (ACTION_OPTION, 1), encode (ACTION_CONTINUE), encode (ACTION_START)]
+    routes = {ACTION_OPTION: 'option', ACTION_CONTINUE: 'continue', ACTION_START: 'begin'}
+    rounds = count // len (samples)
+
+    started = time.perf_counter ()
+    for _ in range (rounds):
+        for data, scene in legacy_samples:
+            _legacy_route (data, scene)
+    legacy_time = time.perf_counter () - started
+
+    started = time.perf_counter ()
+    for _ in range (rounds):
+        for data in samples:
+            action, arg = decode (data)
+            routes.get (action)
+    new_time = time.perf_counter () - started
+
+    total = rounds * len (samples)
+    print (f"Нажатий: {total}")
+    print (f"option_N + ветвление по сцене: {legacy_time * 1e9 / total:.0f} нс на нажатие")
+    print (f"Протокол {PREFIX} + таблица действий: {new_time * 1e9 / total:.0f} нс на нажатие")
+    print (f"Примеры данных: {', '.join (samples)}")
+
+    try:
+        _handler_benchmark (count // 10)
+    except ImportError:
+        print ("python-telegram-bot не установлен: проверка обработчиков пропущена")
+
+
+def _handler_benchmark (count):
+    """Сравнивает проверку нажатия ConversationHandler (как было в main.py) и одного CallbackQueryHandler"""
+    from telegram import CallbackQuery, Chat, Message, Update, User
+    from telegram.ext import CallbackQueryHandler, CommandHandler, ConversationHandler, MessageHandler, filters
+
+    async def callback (update, context):
+        pass
+
+    chat = Chat (1, 'private')
+    message = Message (10, datetime.datetime.now (), chat)
+    update = Update (1, callback_query=CallbackQuery ('1', User (1, 'Алексей', False), '1',
+                                                      message=message, data=encode (ACTION_OPTION, 1)))
+
+    with warnings.catch_warnings ():
+        warnings.simplefilter ('ignore')
+        conversation = ConversationHandler (
+            entry_points=[CommandHandler ('start', callback)],
+            states={
+                'menu': [CommandHandler ('begin', callback), CommandHandler ('help', callback),
+                         CommandHandler ('quit', callback), CallbackQueryHandler (callback)],
+                'game': [MessageHandler (filters.TEXT & ~filters.COMMAND, callback), CommandHandler ('help', callback),
+                         CommandHandler ('quit', callback), CallbackQueryHandler (callback)],
+            },
+            fallbacks=[CommandHandler ('quit', callback)],
+        )
+    # Игрок в игре: состояние разговора для (чат, пользователь)
+    conversation._conversations[(1, 1)] = 'game'
+    handler = CallbackQueryHandler (callback)
+
+    started = time.perf_counter ()
+    for _ in range (count):
+        conversation.check_update (update)
+    conversation_time = time.perf_counter () - started
+
+    started = time.perf_counter ()
+    for _ in range (count):
+        handler.check_update (update)
+    handler_time = time.perf_counter () - started
+
+    print (f"ConversationHandler.check_update: {conversation_time * 1e9 / count:.0f} нс на нажатие")
+    print (f"CallbackQueryHandler.check_update: {handler_time * 1e9 / count:.0f} нс на нажатие")
+
+
+def main ():
+    parser = argparse.ArgumentParser (description="Бенчмарк маршрутизации нажатий")
+    parser.add_argument ('--benchmark', type=int, default=1000000, metavar='N')
+    args = parser.parse_args ()
+    benchmark (args.benchmark)
+
+
+if __name__ == '__main__':
+    main ()
@@ -1,4 +1,48 @@
 #!/usr/bin/env python
+from item_requirements import item_bit
+from fear import FearMeter
+
+# Ответы доктора Валентина по настроению
+DOCTOR_RESPONSES = {
+    'default': (
+        "Алексей, ваши воспоминания все еще подавлены. Доверьтесь процессу.",
+        "Интересно, что вызвало такую реакцию...",
+        "Продолжайте исследовать дом, и память вернется.",
+    ),
+    'threatening': (
+        "Вы не должны заходить так далеко. Некоторые двери лучше держать закрытыми.",
+        "Алексей, вы не готовы к правде. Уходите, пока можете.",
+        "То, что вы ищете, может уничтожить вас. Не все воспоминания стоит возвращать.",
+    ),
+    'manipulative': (
+        "Вы сами пришли ко мне за помощью, Алексей. Помните это.",
+        "Разве не вы хотели забыть? Теперь вы должны принять последствия.",
+        "Ваше чувство вины разрушило вас. Я лишь пытался помочь.",
+    ),
+}
+
+# Шепот призраков по типу сообщения
+GHOST_WHISPERS = {
+    'family': (
+        "Помнишь нас?",
+        "Почему ты не спас нас?",
+        "Мы скучаем по тебе...",
+        "Ты обещал всегда быть рядом...",
+    ),
+    'cryptic': (
+        "Ключ в твоих воспоминаниях...",
+        "Следуй за шепотом прошлого...",
+        "Некоторые двери должны оставаться закрытыми...",
+        "Дом знает твои секреты...",
+    ),
+    'helping': (
+        "Не верь ему...",
+        "Ищи фотографии...",
+        "Правда в библиотеке...",
+        "Ты не виноват...",
+    )
+}
+
 
 class Character:
     """Базовый класс для всех персонажей"""
@@ -41,17 +85,22 @@ class Player (Character):
             description="Мужчина, страдающий от потери памяти и чувства вины."
         )
         self.inventory = []
+        self.inventory_mask = 0  # Битовая маска предметов (см. item_requirements)
         self.story_flags = set ()
-        self.fear_level = 0  # Уровень страха от 0 до 100
+        self.fear = FearMeter ()  # Уровень страха от 0 до 100 и его полосы
 
     def add_to_inventory (self, item):
         """Добавление предмета в инвентарь"""
         self.inventory.append (item)
+        self.inventory_mask |= item_bit (item)
 
     def remove_from_inventory (self, item):
         """Удаление предмета из инвентаря"""
         if item in self.inventory:
             self.inventory.remove (item)
+            # Бит снимаем, только если в инвентаре не осталось копий предмета
+            if item not in self.inventory:
+                self.inventory_mask &= ~item_bit (item)
             return True
         return False
 
@@ -67,45 +116,35 @@ class Player (Character):
         """Проверка наличия флага сюжета"""
         return flag in self.story_flags
 
+    @property
+    def fear_level (self):
+        """Уровень страха от 0 до 100"""
+        return self.fear.level
+
+    @fear_level.setter
+    def fear_level (self, level):
+        self.fear.set (level)
+
     def increase_fear (self, amount):
-        """Увеличение уровня страха"""
-        self.fear_level += amount
-        # Ограничиваем максимальный уровень страха
-        self.fear_level = min (100, self.fear_level)
+        """Увеличение уровня страха (не выше 100)"""
+        self.fear.increase (amount)
 
     def decrease_fear (self, amount):
-        """Уменьшение уровня страха"""
-        self.fear_level -= amount
-        # Уровень страха не может быть отрицательным
-        self.fear_level = max (0, self.fear_level)
+        """Уменьшение уровня страха (не ниже 0)"""
+        self.fear.decrease (amount)
 
 
 class DoctorValentin (Character):
     """Класс доктора Валентина - антагониста"""
 
-    def __init__ (self):
+    def __init__ (self, responses=None):
         super ().__init__ (
             name="Доктор Валентин",
             age=60,
             description="Психиатр, проводивший экспериментальные методы лечения."
         )
-        self.responses = {
-            'default': [
-                "Алексей, ваши воспоминания все еще подавлены. Доверьтесь процессу.",
-                "Интересно, что вызвало такую реакцию...",
-                "Продолжайте исследовать дом, и память вернется.",
-            ],
-            'threatening': [
-                "Вы не должны заходить так далеко. Некоторые двери лучше держать закрытыми.",
-                "Алексей, вы не готовы к правде. Уходите, пока можете.",
-                "То, что вы ищете, может уничтожить вас. Не все воспоминания стоит возвращать.",
-            ],
-            'manipulative': [
-                "Вы сами пришли ко мне за помощью, Алексей. Помните это.",
-                "Разве не вы хотели забыть? Теперь вы должны принять последствия.",
-                "Ваше чувство вины разрушило вас. Я лишь пытался помочь.",
-            ],
-        }
+        # Ответы доктора по настроению
+        self.responses = responses if responses is not None else DOCTOR_RESPONSES
 
     def get_response (self, mood='default', idx=0):
         """Получение ответа определенного настроения"""
@@ -123,31 +162,12 @@ class DoctorValentin (Character):
 class Ghost (Character):
     """Класс для призрачных персонажей"""
 
-    def __init__ (self, name, age, description, ghost_type='family'):
+    def __init__ (self, name, age, description, ghost_type='family', whispers=None):
         super ().__init__ (name, age, description)
         self.ghost_type = ghost_type  # family, victim, враждебный
 
         # Тип сообщений от призрака
-        self.whispers = {
-            'family': [
-                "Помнишь нас?",
-                "Почему ты не спас нас?",
-                "Мы скучаем по тебе...",
-                "Ты обещал всегда быть рядом...",
-            ],
-            'cryptic': [
-                "Ключ в твоих воспоминаниях...",
-                "Следуй за шепотом прошлого...",
-                "Некоторые двери должны оставаться закрытыми...",
-                "Дом знает твои секреты...",
-            ],
-            'helping': [
-                "Не верь ему...",
-                "Ищи фотографии...",
-                "Правда в библиотеке...",
-                "Ты не виноват...",
-            ]
-        }
+        self.whispers = whispers if whispers is not None else GHOST_WHISPERS
 
     def get_whisper (self, mood='cryptic', idx=0):
         """Получение шепота определенного типа"""
@@ -0,0 +1,233 @@
+#!/usr/bin/env python
+"""
+Консольная версия игры для локального тестирования и профилирования.
+Работает на том же движке (engine.py), что и бот: те же сцены, система
+галлюцинаций и оформление ответов, только с разметкой ANSI вместо HTML
+и без сетевых задержек.
+
+Запуск:
+    python cli.py --seed 42
+    python cli.py --seed 42 --script playthrough.txt --profile
+"""
+import argparse
+import cProfile
+import io
+import pstats
+import sys
+import time
+
+from engine import CONTINUE_OPTION, GameEngine
+from option_masks import has_option, is_exhausted, visible_options
+from styles import AnsiStyles
+
+# Команда выхода из игры
+QUIT_COMMANDS = ('q', 'quit', 'выход')
+
+
+class SceneProfiler:
+    """Профиль ходов, сгруппированный по сценам"""
+
+    def __init__ (self):
+        self.profiles = {}  # сцена -> cProfile.Profile
+        self.wall_time = {}  # сцена -> суммарное время ходов, секунд
+        self.turns = {}  # сцена -> количество ходов
+
+    def run (self, scene, function, *args):
+        """Выполняет ход под профилировщиком сцены"""
+        profile = self.profiles.setdefault (scene, cProfile.Profile ())
+        started = time.perf_counter ()
+        try:
+            return profile.runcall (function, *args)
+        finally:
+            self.wall_time[scene] = self.wall_time.get (scene, 0.0) + time.perf_counter () - started
+            self.turns[scene] = self.turns.get (scene, 0) + 1
+
+    def report (self, top=8):
+        """
+        Сводка по сценам: время ходов и самые затратные функции
+
+        Args:
+            top: Количество функций в списке каждой сцены
+
+        Returns:
+            str: Текст отчета
+        """
+        lines = ["Профиль по сценам:"]
+        for scene in sorted (self.wall_time, key=self.wall_time.get, reverse=True):
+            wall_time = self.wall_time[scene]
+            turns = self.turns[scene]
+            lines.append (f"\n{scene}: {turns} ход., {wall_time * 1000:.2f} мс "
+                          f"({wall_time * 1000 / turns:.3f} мс на ход)")
+
+            stream = io.StringIO ()
+            stats = pstats.Stats (self.profiles[scene], stream=stream)
+            stats.sort_stats ('cumulative').print_stats (top)
+            # Оставляем только таблицу функций
+            table = stream.getvalue ().split ("\n")
+            start = next ((i for i, line in enumerate (table) if line.lstrip ().startswith ("ncalls")), 0)
+            lines.extend ("    " + line for line in table[start:] if line.strip ())
+        return "\n".join (lines)
+
+
+class ConsoleGame:
+    """Игровой цикл в терминале"""
+
+    def __init__ (self, engine, styles, read_line, output=None, profiler=None, echo=False):
+        """
+        Args:
+            engine: Экземпляр GameEngine
+            styles: Стили оформления (AnsiStyles)
+            read_line: Функция чтения ввода (prompt) -> строка или None по окончании ввода
+            output: Поток вывода (по умолчанию sys.stdout)
+            profiler: Экземпляр SceneProfiler (необязательно)
+            echo: Печатать прочитанный ввод (для сценариев)
+        """
+        self.engine = engine
+        self.styles = styles
+        self.read_line = read_line
+        self.output = output or sys.stdout
+        self.profiler = profiler
+        self.echo = echo
+
+    def print (self, text=""):
+        """Печатает текст в поток вывода"""
+        self.output.write (f"{text}\n")
+
+    def play (self, seed=None):
+        """
+        Проводит одно прохождение
+
+        Args:
+            seed: Seed генератора случайных чисел сессии
+
+        Returns:
+            GameSession: Сессия после окончания игры или ввода
+        """
+        session = self.engine.new_session (seed)
+        self.print (self.styles.horror_title ("Ranovell"))
+        self.print ()
+        self.print (self.styles.format_response (self.engine.introduction (session)))
+
+        while not session.finished:
+            option_map = self.show_options (session)
+            line = self.read_line ("> ")
+            if line is None:
+                break
+            line = line.strip ()
+            if self.echo:
+                self.print (f"> {line}")
+            if not line:
+                continue
+            if line.lower () in QUIT_COMMANDS:
+                break
+
+            # Номер варианта или произвольный текст (как в устаревшем текстовом режиме)
+            if line.isdigit ():
+                number = int (line) - 1
+                if not 0 <= number < len (option_map):
+                    self.print (self.styles.format_scene_message ("Ошибка", f"Нет варианта {line}"))
+                    continue
+                result = self._step (session, self.engine.step, option_map[number])
+            else:
+                result = self._step (session, self.engine.step_input, line)
+
+            self.print ()
+            self.print (self.styles.format_response (result.text))
+            if result.band_changed and not result.finished:
+                self.print (self.styles.format_fear_level (result.fear_after))
+
+        if session.finished:
+            self.print ()
+            self.print (self.styles.bold ("Игра окончена."))
+            self.print (f"Ходов: {session.turns}, концовка: {session.ending or 'neutral'}, "
+                        f"фотографий: {session.game.found_photos}")
+        return session
+
+    def show_options (self, session):
+        """
+        Печатает варианты текущей сцены
+
+        Returns:
+            tuple: Исходные индексы вариантов в порядке показа
+        """
+        options = session.options
+        disabled = session.disabled
+        if is_exhausted (len (options), disabled):
+            option_map = (CONTINUE_OPTION,)
+            labels = ["Продолжить"]
+        else:
+            locked = self.engine.locked_options (session)
+            option_map = visible_options (session.scene, len (options), disabled)
+            labels = [
+                f"{self.styles.emoji['lock']} {options[i]}" if has_option (locked, i) else options[i]
+                for i in option_map
+            ]
+
+        self.print (self.styles.format_options_header ())
+        for number, label in enumerate (labels, 1):
+            self.print (f"{number}. {label}")
+        return option_map
+
+    def _step (self, session, step, argument):
+        """Делает ход, при необходимости под профилировщиком"""
+        if self.profiler:
+            return self.profiler.run (session.scene, step, session, argument)
+        return step (session, argument)
+
+
+def script_reader (lines):
+    """
+    Возвращает функцию чтения ввода из готового списка строк (комментарии # пропускаются)
+
+    Args:
+        lines: Строки сценария
+
+    Returns:
+        callable: Функция (prompt) -> строка или None, когда сценарий закончился
+    """
+    commands = iter ([line for line in lines if not line.lstrip ().startswith ('#')])
+
+    def read_line (prompt):
+        return next (commands, None)
+
+    return read_line
+
+
+def interactive_reader (prompt):
+    """Читает строку с клавиатуры (None при Ctrl+D)"""
+    try:
+        return input (prompt)
+    except EOFError:
+        return None
+
+
+def main ():
+    parser = argparse.ArgumentParser (description="Консольная версия игры")
+    parser.add_argument ('--seed', type=int, help="Seed прохождения (для воспроизводимых запусков)")
+    parser.add_argument ('--script', metavar='FILE',
+                         help="Файл с вводом игрока, по строке на ход ('-' - стандартный ввод)")
+    parser.add_argument ('--profile', action='store_true', help="Профилировать ходы по сценам")
+    parser.add_argument ('--top', type=int, default=8, help="Количество функций в профиле сцены")
+    parser.add_argument ('--no-color', action='store_true', help="Не использовать цвета ANSI")
+    args = parser.parse_args ()
+
+    if args.script == '-':
+        read_line = script_reader (sys.stdin.read ().splitlines ())
+    elif args.script:
+        with open (args.script, encoding='utf-8') as script_file:
+            read_line = script_reader (script_file.read ().splitlines ())
+    else:
+        read_line = interactive_reader
+
+    styles = AnsiStyles (color=not args.no_color and sys.stdout.isatty ())
+    profiler = SceneProfiler () if args.profile else None
+    game = ConsoleGame (GameEngine (), styles, read_line, profiler=profiler, echo=args.script is not None)
+    game.play (args.seed)
+
+    if profiler:
+        print ()
+        print (profiler.report (args.top))
+
+
+if __name__ == '__main__':
+    main ()
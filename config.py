@@ -12,7 +12,13 @@ class Config:
         token = None
 
         try:
-            # Способ 1: из python-dotenv
+            # Способ 1: напрямую из окружения (без лишних импортов)
+            token = os.environ.get ('TELEGRAM_TOKEN')
+            if token:
+                print (f"Загрузка токена из переменных окружения: Успешно")
+                return token
+
+            # Способ 2: из python-dotenv
             try:
                 from dotenv import load_dotenv
                 load_dotenv ()
@@ -23,7 +29,7 @@ class Config:
             except ImportError:
                 print ("Модуль dotenv не найден")
 
-            # Способ 2: из файла env.py
+            # Способ 3: из файла env.py
             try:
                 sys.path.append (os.getcwd ())
                 from env import TELEGRAM_TOKEN
@@ -33,17 +39,59 @@ class Config:
             except ImportError:
                 print ("Файл env.py не найден")
 
-            # Способ 3: напрямую из окружения
-            token = os.environ.get ('TELEGRAM_TOKEN')
-            if token:
-                print (f"Загрузка токена из переменных окружения: Успешно")
-                return token
-
             # Если и это не помогло, запрашиваем вручную
-            token = input ("Введите ваш токен Telegram бота: ").strip ()
-            return token
+            return Config._ask_token ()
 
         except Exception as e:
             print (f"Ошибка при загрузке токена: {e}")
-            token = input ("Введите ваш токен Telegram бота: ").strip ()
-            return token
\ No newline at end of file
+            return Config._ask_token ()
+
+    @staticmethod
+    def _ask_token ():
+        """Запрашивает токен у пользователя, только если запуск интерактивный"""
+        if not sys.stdin or not sys.stdin.isatty ():
+            print ("Неинтерактивный запуск: токен не запрашивается")
+            return None
+        return input ("Введите ваш токен Telegram бота: ").strip ()
+
+    @staticmethod
+    def get_int (name, default=None):
+        """
+        Читает целочисленный параметр из переменных окружения
+
+        Args:
+            name: Имя переменной окружения
+            default: Значение по умолчанию, если переменная не задана или некорректна
+
+        Returns:
+            int: Значение параметра
+        """
+        value = os.environ.get (name)
+        if value is None or not value.strip ():
+            return default
+        try:
+            return int (value)
+        except ValueError:
+            print (f"Некорректное значение {name}={value!r}, используется {default}")
+            return default
+
+    @staticmethod
+    def get_float (name, default=None):
+        """
+        Читает дробный параметр из переменных окружения
+
+        Args:
+            name: Имя переменной окружения
+            default: Значение по умолчанию, если переменная не задана или некорректна
+
+        Returns:
+            float: Значение параметра
+        """
+        value = os.environ.get (name)
+        if value is None or not value.strip ():
+            return default
+        try:
+            return float (value)
+        except ValueError:
+            print (f"Некорректное значение {name}={value!r}, используется {default}")
+            return default
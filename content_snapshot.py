@@ -0,0 +1,200 @@
+#!/usr/bin/env python
+"""
+Модуль сборки и загрузки снимка статического контента игры.
+Варианты ответов сцен, ключевые слова, каталоги галлюцинаций, реплики
+персонажей и таблица эмодзи собираются в один версионированный бинарный
+файл (marshal). Процесс загружает его одним чтением; если исходные модули
+изменились (не совпал хэш), снимок пересобирается. Чтобы не читать модули
+при каждом запуске, в заголовке хранятся и их размеры и времена изменения:
+модули хэшируются, только если эти отметки не совпали.
+
+Сборка вручную:
+    python content_snapshot.py [путь]
+"""
+import hashlib
+import marshal
+import mmap
+import os
+import struct
+import sys
+
+SNAPSHOT_VERSION = 2
+MAGIC = b'RNVS'
+
+BASE_DIR = os.path.dirname (os.path.abspath (__file__))
+
+# Модули, из которых собирается контент
+SOURCES = ('game_logic.py', 'hallucination_system.py', 'characters.py', 'styles.py')
+
+# Заголовок: сигнатура, версия формата, SHA-256 исходных модулей,
+# затем время изменения (нс) и размер каждого модуля
+HEADER = struct.Struct ('<4sH32s' + 'qq' * len (SOURCES))
+
+DEFAULT_PATH = os.environ.get ('RANOVELL_SNAPSHOT', os.path.join (BASE_DIR, 'content.snapshot'))
+
+# Контент, уже загруженный в этом процессе
+_loaded = None
+
+
+def source_hash (base_dir=BASE_DIR):
+    """
+    Вычисляет хэш исходных модулей с контентом
+
+    Args:
+        base_dir: Каталог с модулями
+
+    Returns:
+        bytes: SHA-256 (32 байта)
+    """
+    digest = hashlib.sha256 ()
+    digest.update (struct.pack ('<H', SNAPSHOT_VERSION))
+    for name in SOURCES:
+        digest.update (name.encode ())
+        with open (os.path.join (base_dir, name), 'rb') as source:
+            digest.update (source.read ())
+    return digest.digest ()
+
+
+def source_stamps (base_dir=BASE_DIR):
+    """
+    Отметки исходных модулей без чтения их содержимого
+
+    Args:
+        base_dir: Каталог с модулями
+
+    Returns:
+        tuple: Время изменения (нс) и размер каждого модуля подряд
+    """
+    stamps = []
+    for name in SOURCES:
+        stat = os.stat (os.path.join (base_dir, name))
+        stamps.extend ((stat.st_mtime_ns, stat.st_size))
+    return tuple (stamps)
+
+
+def collect_content ():
+    """
+    Собирает статический контент из констант модулей
+
+    Returns:
+        dict: Контент игры
+    """
+    from game_logic import SCENE_OPTIONS, KEYWORDS
+    from hallucination_system import HALLUCINATIONS, FALSE_OPTIONS
+    from characters import DOCTOR_RESPONSES, GHOST_WHISPERS
+    from styles import MessageStyles
+
+    return {
+        'scene_options': SCENE_OPTIONS,
+        'keywords': KEYWORDS,
+        'hallucinations': HALLUCINATIONS,
+        'false_options': FALSE_OPTIONS,
+        'doctor_responses': DOCTOR_RESPONSES,
+        'ghost_whispers': GHOST_WHISPERS,
+        'emoji': MessageStyles.EMOJI,
+    }
+
+
+def build_snapshot (path=DEFAULT_PATH):
+    """
+    Собирает снимок контента и атомарно записывает его в файл
+
+    Args:
+        path: Путь к файлу снимка
+
+    Returns:
+        dict: Собранный контент
+    """
+    content = collect_content ()
+    payload = HEADER.pack (MAGIC, SNAPSHOT_VERSION, source_hash (), *source_stamps ()) + marshal.dumps (content)
+
+    temp_path = f"{path}.tmp"
+    with open (temp_path, 'wb') as snapshot:
+        snapshot.write (payload)
+    os.replace (temp_path, path)
+
+    return content
+
+
+def load_snapshot (path=DEFAULT_PATH, use_mmap=False, check_sources=True):
+    """
+    Загружает снимок контента
+
+    Args:
+        path: Путь к файлу снимка
+        use_mmap: Читать через разделяемое отображение файла в память только для чтения
+        check_sources: Сверять снимок с текущими исходными модулями (хэш - только
+            если изменились их размеры или времена изменения)
+
+    Returns:
+        dict: Контент или None, если снимок отсутствует, поврежден или устарел
+    """
+    try:
+        with open (path, 'rb') as snapshot:
+            if use_mmap:
+                buffer = mmap.mmap (snapshot.fileno (), 0, access=mmap.ACCESS_READ)
+            else:
+                buffer = snapshot.read ()
+    except (OSError, ValueError):
+        return None
+
+    try:
+        if len (buffer) < HEADER.size:
+            return None
+
+        magic, version, content_hash, *stamps = HEADER.unpack_from (buffer)
+        if magic != MAGIC or version != SNAPSHOT_VERSION:
+            return None
+        if check_sources:
+            try:
+                changed = tuple (stamps) != source_stamps ()
+            except OSError:
+                changed = False  # модулей нет рядом (например, в сборке без исходников)
+            if changed and content_hash != source_hash ():
+                return None
+
+        try:
+            return marshal.loads (memoryview (buffer)[HEADER.size:])
+        except (EOFError, ValueError, TypeError):
+            return None
+    finally:
+        if use_mmap:
+            buffer.close ()
+
+
+def load_content (path=DEFAULT_PATH, use_mmap=False, rebuild=True):
+    """
+    Возвращает контент игры: из снимка, если он актуален, иначе из модулей.
+    Результат запоминается, повторные вызовы в процессе ничего не читают
+
+    Args:
+        path: Путь к файлу снимка
+        use_mmap: Читать снимок через отображение файла в память
+        rebuild: Пересобрать снимок, если он отсутствует или устарел
+
+    Returns:
+        dict: Контент игры
+    """
+    global _loaded
+    if _loaded is not None:
+        return _loaded
+
+    content = load_snapshot (path, use_mmap=use_mmap)
+    if content is None:
+        if rebuild:
+            try:
+                content = build_snapshot (path)
+                print (f"Снимок контента пересобран: {path}")
+            except OSError as e:
+                print (f"Не удалось записать снимок контента: {e}")
+        if content is None:
+            content = collect_content ()
+
+    _loaded = content
+    return content
+
+
+if __name__ == '__main__':
+    target = sys.argv[1] if len (sys.argv) > 1 else DEFAULT_PATH
+    build_snapshot (target)
+    print (f"Снимок контента записан: {target} ({os.path.getsize (target)} байт)")
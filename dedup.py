@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+"""
+Модуль подавления повторных нажатий кнопок.
+Нажатие кнопки из сообщения старше последнего сообщения с кнопками
+устарело (см. callbacks.py) и получает пустой ответ на CallbackQuery, не
+дожидаясь блокировки чата. Повтор нажатия (чат, сообщение, данные кнопки)
+в течение TTL отбрасывается так же - это ловит повторы, пришедшие, пока
+первое нажатие еще обрабатывается. Таблица ключей ограничена по размеру (LRU).
+"""
+import functools
+import time
+from collections import OrderedDict
+
+from callbacks import is_stale
+
+
+class CallbackDeduplicator:
+    """Ограниченная таблица недавно обработанных нажатий с TTL"""
+
+    def __init__ (self, capacity: int = 10000, ttl: float = 30.0):
+        """
+        Args:
+            capacity: Максимальное количество хранимых ключей
+            ttl: Сколько секунд повтор считается дубликатом
+        """
+        self.capacity = capacity
+        self.ttl = ttl
+        self.entries = OrderedDict ()  # ключ -> время истечения, в порядке добавления
+
+        # Счетчики
+        self.checked = 0
+        self.duplicates = 0
+        self.stale = 0
+        self.expired = 0
+        self.evicted = 0
+
+    def seen (self, key, now=None):
+        """
+        Проверяет ключ и запоминает его
+
+        Args:
+            key: Ключ нажатия
+            now: Текущее время (по умолчанию time.monotonic ())
+
+        Returns:
+            bool: True, если такое нажатие уже было в течение TTL
+        """
+        now = time.monotonic () if now is None else now
+        self.checked += 1
+        self._expire (now)
+
+        if key in self.entries:
+            self.duplicates += 1
+            return True
+
+        self.entries[key] = now + self.ttl
+        if len (self.entries) > self.capacity:
+            self.entries.popitem (last=False)
+            self.evicted += 1
+        return False
+
+    def _expire (self, now):
+        """Удаляет просроченные ключи (они всегда в начале: TTL одинаковый)"""
+        entries = self.entries
+        while entries:
+            key, expires = next (iter (entries.items ()))
+            if expires > now:
+                break
+            del entries[key]
+            self.expired += 1
+
+    def guard (self, callback, buttons_message):
+        """
+        Оборачивает обработчик CallbackQuery: повторные нажатия подтверждаются и отбрасываются
+
+        Args:
+            callback: Асинхронный обработчик (update, context)
+            buttons_message: Функция context -> id последнего сообщения с кнопками игрока (None - неизвестен)
+
+        Returns:
+            callable: Обернутый обработчик
+        """
+
+        @functools.wraps (callback)
+        async def wrapper (update, context):
+            query = update.callback_query
+            if query is not None and query.message is not None:
+                if is_stale (query, buttons_message (context)):
+                    self.stale += 1
+                    await query.answer ()
+                    return None
+                key = (query.message.chat_id, query.message.message_id, query.data)
+                if self.seen (key):
+                    await query.answer ()
+                    return None
+            return await callback (update, context)
+
+        return wrapper
+
+    def get_stats (self):
+        """Возвращает счетчики повторных нажатий"""
+        return {
+            'size': len (self.entries),
+            'checked': self.checked,
+            'duplicates': self.duplicates,
+            'stale': self.stale,
+            'expired': self.expired,
+            'evicted': self.evicted,
+        }
@@ -0,0 +1,438 @@
+#!/usr/bin/env python
+"""
+Безынтерфейсный игровой движок.
+Каждое прохождение - отдельная сессия со своим GameLogic и генератором
+случайных чисел. Движок ничего не отправляет и не ждет: ход принимает
+индекс варианта и возвращает TurnResult с фрагментами текста, изменением
+состояния и вариантами следующего хода. На этом API работают Telegram-бот,
+симулятор и бенчмарки.
+"""
+import asyncio
+import random
+
+from analytics import ENDINGS
+from item_requirements import RequirementsIndex
+from option_masks import add_option, has_option, is_exhausted
+from scene_graph import next_scene_after_exhaustion
+
+# Индекс варианта "Продолжить", доступного, когда все варианты сцены исчерпаны
+CONTINUE_OPTION = -1
+
+CONTINUE_TEXT = "Алексей решает двигаться дальше, поскольку больше нечего здесь исследовать."
+
+
+class GameSession:
+    """Состояние одного прохождения"""
+
+    def __init__ (self, game, seed=None):
+        """
+        Args:
+            game: Экземпляр GameLogic этой сессии
+            seed: Seed генератора случайных чисел сессии
+        """
+        self.game = game
+        self.seed = seed
+        self.scene = 'intro'
+        self.selected = {}  # сцена -> битовая маска выбранных вариантов
+        self.options = []  # варианты, показанные игроку на текущем ходу
+        self.turns = 0
+        self.turn_id = 0  # растет на каждом шаге, включая "Продолжить"
+        # Ход, с которого началось прохождение: ходы игрока не повторяются между играми,
+        # поэтому вместе с чатом он идентифицирует прохождение (см. analysis.py)
+        self.first_turn = 0
+        self.peak_fear = 0
+        self.ending = None
+        self.finished = False
+        # Прохождение учтено в статистике. Не входит в снимки истории: возврат или
+        # загрузка сохранения не дают учесть то же прохождение еще раз
+        self.recorded = False
+        # Ходы для журнала (см. journal.py): [(turn_id, вариант, текст, seed), ...] или None
+        self.journal = None
+
+    @property
+    def disabled (self):
+        """Маска уже выбранных вариантов текущей сцены"""
+        return self.selected.get (self.scene, 0)
+
+    @property
+    def option_ids (self):
+        """Исходные индексы показанных вариантов (-1 - ложный вариант, см. item_requirements.py)"""
+        return self.game.option_ids (self.scene, self.options)
+
+    @property
+    def exhausted (self):
+        """True, если все варианты текущей сцены уже выбраны"""
+        return is_exhausted (len (self.options), self.disabled)
+
+
+class TurnResult:
+    """Результат одного хода"""
+
+    def __init__ (self, scene, option_id, option, fragments, next_scene, fear_before, fear_after,
+                  fear_band_before, fear_band, items_gained, photos_found, false_option, hallucinations,
+                  options, disabled, locked, finished, ending):
+        """
+        Args:
+            scene: Сцена, в которой сделан ход
+            option_id: Индекс выбранного варианта (CONTINUE_OPTION для "Продолжить")
+            option: Текст выбранного варианта
+            fragments: Абзацы ответа без оформления
+            next_scene: Сцена после хода
+            fear_before: Уровень страха до хода
+            fear_after: Уровень страха после хода
+            fear_band_before: Полоса страха до хода (см. fear.BAND_NAMES)
+            fear_band: Полоса страха после хода
+            items_gained: Предметы, полученные за ход
+            photos_found: Количество фотографий, найденных за ход
+            false_option: Выбранный ложный вариант или None
+            hallucinations: Галлюцинации, вставленные в ответ
+            options: Варианты следующего хода
+            disabled: Маска уже выбранных вариантов следующей сцены
+            locked: Маска вариантов следующей сцены, закрытых требованиями к предметам
+            finished: True, если прохождение завершено
+            ending: Достигнутая концовка или None
+        """
+        self.scene = scene
+        self.option_id = option_id
+        self.option = option
+        self.fragments = fragments
+        self.next_scene = next_scene
+        self.fear_before = fear_before
+        self.fear_after = fear_after
+        self.fear_band_before = fear_band_before
+        self.fear_band = fear_band
+        self.items_gained = items_gained
+        self.photos_found = photos_found
+        self.false_option = false_option
+        self.hallucinations = hallucinations
+        self.options = options
+        self.disabled = disabled
+        self.locked = locked
+        self.finished = finished
+        self.ending = ending
+
+    @property
+    def text (self):
+        """Ответ одной строкой"""
+        return "\n\n".join (self.fragments)
+
+    @property
+    def fear_delta (self):
+        """Изменение уровня страха за ход"""
+        return self.fear_after - self.fear_before
+
+    @property
+    def band_changed (self):
+        """True, если за ход сменилась полоса страха (индикатор нужно обновить)"""
+        return self.fear_band != self.fear_band_before
+
+
+class GameEngine:
+    """Движок, ведущий игровые сессии без привязки к интерфейсу"""
+
+    def __init__ (self, content=None, requirements: RequirementsIndex = None):
+        """
+        Args:
+            content: Словарь статического контента (см. content_snapshot.load_content).
+                По умолчанию используются константы модулей
+            requirements: Индекс требований вариантов к предметам
+        """
+        if content is None:
+            from content_snapshot import collect_content
+            content = collect_content ()
+        self.content = content
+        self.requirements = requirements or RequirementsIndex ()
+
+    def new_session (self, seed=None) -> GameSession:
+        """
+        Создает новое прохождение
+
+        Args:
+            seed: Seed генератора случайных чисел. Одинаковый seed и одинаковые
+                выборы дают одинаковое прохождение
+
+        Returns:
+            GameSession: Сессия в начальной сцене
+        """
+        from game_logic import GameLogic
+
+        game = GameLogic (content=self.content, rng=random.Random (seed), headless=True)
+        session = GameSession (game, seed)
+        session.options = game.get_options_for_scene (session.scene)
+        return session
+
+    def export_session (self, session: GameSession, rng_seed: int = None) -> dict:
+        """
+        Изменяемое состояние прохождения без статического контента.
+        Вместо состояния генератора случайных чисел (625 слов) сохраняется
+        64-битный seed: генератор переинициализируется им
+
+        Args:
+            session: Сессия
+            rng_seed: Seed, которым генератор уже инициализирован и с тех пор
+                не использовался (тогда он не переинициализируется)
+
+        Returns:
+            dict: Состояние из встроенных типов (см. restore_session)
+        """
+        game = session.game
+        player = game.player
+        if rng_seed is None:
+            rng_seed = self._reseed (session)
+        return {
+            'seed': session.seed,
+            'scene': session.scene,
+            'selected': dict (session.selected),
+            'options': list (session.options),
+            'turns': session.turns,
+            'turn_id': session.turn_id,
+            'first_turn': session.first_turn,
+            'peak_fear': session.peak_fear,
+            'ending': session.ending,
+            'finished': session.finished,
+            'recorded': session.recorded,
+            'rng_seed': rng_seed,
+            'inventory': list (player.inventory),
+            'story_flags': sorted (player.story_flags),
+            'fear': player.fear.level,
+            'band_changes': player.fear.band_changes,
+            'found_photos': game.found_photos,
+            'last_false_option': game.last_false_option,
+            'hallucinations': list (game.hallucination_system.last_shown),
+        }
+
+    def restore_session (self, state: dict) -> GameSession:
+        """
+        Восстанавливает прохождение из состояния export_session
+
+        Args:
+            state: Состояние сессии
+
+        Returns:
+            GameSession: Сессия, продолжающая прохождение с того же хода
+        """
+        session = self.new_session (state['seed'])
+        game = session.game
+        player = game.player
+        if 'rng' in state:
+            game.rng.setstate (state['rng'])  # состояние, сохраненное до перехода на seed
+        else:
+            game.rng.seed (state['rng_seed'])
+        for item in state['inventory']:
+            player.add_to_inventory (item)
+        player.story_flags.update (state['story_flags'])
+        player.fear.set (state['fear'])
+        player.fear.band_changes = state['band_changes']
+        game.found_photos = state['found_photos']
+        game.last_false_option = state['last_false_option']
+        game.hallucination_system.last_shown = list (state['hallucinations'])
+
+        session.scene = state['scene']
+        session.selected = dict (state['selected'])
+        session.options = list (state['options'])
+        session.turns = state['turns']
+        session.turn_id = state['turn_id']
+        session.first_turn = state.get ('first_turn', 0)
+        session.peak_fear = state['peak_fear']
+        session.ending = state['ending']
+        session.finished = state['finished']
+        session.recorded = state.get ('recorded', session.finished)
+        return session
+
+    def introduction (self, session: GameSession):
+        """Вступительный текст прохождения"""
+        return session.game.get_introduction ()
+
+    def locked_options (self, session: GameSession):
+        """Маска вариантов текущей сцены, закрытых требованиями к предметам"""
+        return self.requirements.locked_mask (session.scene, session.game.player.inventory_mask, session.option_ids)
+
+    def step (self, session: GameSession, option_id: int) -> TurnResult:
+        """
+        Делает ход выбором варианта
+
+        Args:
+            session: Сессия
+            option_id: Индекс варианта в session.options или CONTINUE_OPTION
+
+        Returns:
+            TurnResult: Результат хода
+
+        Raises:
+            ValueError: Если сессия завершена или вариант недоступен
+        """
+        if session.finished:
+            raise ValueError ("Прохождение уже завершено")
+
+        scene = session.scene
+
+        # Все варианты исчерпаны - переход по "Продолжить" не считается ходом
+        if option_id == CONTINUE_OPTION:
+            if not session.exhausted:
+                raise ValueError (f"В сцене {scene} еще есть невыбранные варианты")
+            self._journal (session, option_id)
+            game = session.game
+            game.last_false_option = None
+            game.hallucination_system.last_shown = []
+            fear = game.player.fear
+            session.turn_id += 1
+            session.scene = next_scene_after_exhaustion (scene)
+            session.options = game.get_options_for_scene (session.scene)
+            return self._result (session, scene, option_id, "Продолжить", (CONTINUE_TEXT,),
+                                 fear.level, fear.band, [], 0)
+
+        if not 0 <= option_id < len (session.options):
+            raise ValueError (f"Вариант {option_id} за пределами списка из {len (session.options)}")
+
+        self._journal (session, option_id)
+        game = session.game
+        scene_mask = session.disabled
+        original_id = session.option_ids[option_id]  # требования заданы по исходным индексам
+        inventory_before = list (game.player.inventory)
+        fear_before = game.player.fear_level
+        band_before = game.player.fear.band
+        photos_before = game.found_photos
+
+        # Ход обрабатывается по тем вариантам, которые видел игрок
+        response, next_scene = game.process_option_selection (scene, option_id, session.options)
+        items_gained = [item for item in game.player.inventory if item not in inventory_before]
+
+        # Вариант, требующий отсутствующего предмета, остается доступным, пока не даст предмет
+        locked = self.requirements.is_locked (scene, original_id, game.player.inventory_mask)
+        if (not has_option (scene_mask, option_id) and not locked) or items_gained:
+            session.selected[scene] = add_option (scene_mask, option_id)
+
+        option = session.options[option_id]
+        self._advance (session, next_scene)
+        return self._result (session, scene, option_id, option, tuple (response.split ("\n\n")),
+                             fear_before, band_before, items_gained, game.found_photos - photos_before)
+
+    def step_input (self, session: GameSession, text: str) -> TurnResult:
+        """
+        Делает ход произвольным текстом (без ложных вариантов и учета выбранных)
+
+        Args:
+            session: Сессия
+            text: Ввод игрока
+
+        Returns:
+            TurnResult: Результат хода (option_id равен None)
+        """
+        if session.finished:
+            raise ValueError ("Прохождение уже завершено")
+
+        self._journal (session, None, text)
+        game = session.game
+        scene = session.scene
+        inventory_before = list (game.player.inventory)
+        fear_before = game.player.fear_level
+        band_before = game.player.fear.band
+        photos_before = game.found_photos
+
+        game.last_false_option = None
+        game.hallucination_system.last_shown = []
+        response, next_scene = game.process_input (scene, text)
+        items_gained = [item for item in game.player.inventory if item not in inventory_before]
+
+        self._advance (session, next_scene)
+        return self._result (session, scene, None, text, tuple (response.split ("\n\n")),
+                             fear_before, band_before, items_gained, game.found_photos - photos_before)
+
+    def step_many (self, sessions, choices):
+        """
+        Делает по одному ходу в каждой сессии
+
+        Args:
+            sessions: Сессии
+            choices: Индексы вариантов (по одному на сессию) или функция
+                choose (session) -> индекс
+
+        Returns:
+            list: TurnResult для каждой сессии (None для уже завершенных)
+        """
+        if callable (choices):
+            choices = [None if session.finished else choices (session) for session in sessions]
+
+        step = self.step
+        return [None if session.finished else step (session, option_id)
+                for session, option_id in zip (sessions, choices)]
+
+    async def step_async (self, session: GameSession, option_id: int) -> TurnResult:
+        """Асинхронный вариант step (ход не выполняет ввода-вывода и не ждет)"""
+        return self.step (session, option_id)
+
+    async def step_many_async (self, sessions, choices, chunk_size: int = 1000):
+        """
+        Асинхронный вариант step_many: сессии обрабатываются порциями,
+        между порциями управление возвращается циклу событий
+
+        Args:
+            sessions: Сессии
+            choices: Индексы вариантов или функция choose (session) -> индекс
+            chunk_size: Количество сессий в порции
+
+        Returns:
+            list: TurnResult для каждой сессии (None для уже завершенных)
+        """
+        sessions = list (sessions)
+        if not callable (choices):
+            choices = list (choices)
+
+        results = []
+        for start in range (0, len (sessions), chunk_size):
+            chunk = sessions[start:start + chunk_size]
+            results.extend (self.step_many (chunk, choices if callable (choices) else choices[start:start + chunk_size]))
+            await asyncio.sleep (0)
+        return results
+
+    def _reseed (self, session: GameSession) -> int:
+        """Переинициализирует генератор сессии 64-битным seed, взятым из него же"""
+        rng_seed = session.game.rng.getrandbits (64)
+        session.game.rng.seed (rng_seed)
+        return rng_seed
+
+    def _journal (self, session: GameSession, option_id, text=None):
+        """
+        Если ходы сессии записываются, переинициализирует генератор и запоминает ход:
+        повтор хода с тем же seed на том же состоянии дает тот же результат
+        """
+        if session.journal is not None:
+            session.journal.append ((session.turn_id, option_id, text, self._reseed (session)))
+
+    def _advance (self, session: GameSession, next_scene):
+        """Обновляет счетчики прохождения и переводит сессию в следующую сцену"""
+        session.turns += 1
+        session.turn_id += 1
+        session.peak_fear = max (session.peak_fear, session.game.player.fear_level)
+        if next_scene in ENDINGS:
+            session.ending = next_scene
+        if next_scene == 'end':
+            session.finished = True
+
+        session.scene = next_scene
+        session.options = [] if session.finished else session.game.get_options_for_scene (next_scene)
+
+    def _result (self, session, scene, option_id, option, fragments, fear_before, band_before,
+                 items_gained, photos_found):
+        """Собирает TurnResult после хода"""
+        game = session.game
+        return TurnResult (
+            scene=scene,
+            option_id=option_id,
+            option=option,
+            fragments=fragments,
+            next_scene=session.scene,
+            fear_before=fear_before,
+            fear_after=game.player.fear_level,
+            fear_band_before=band_before,
+            fear_band=game.player.fear.band,
+            items_gained=items_gained,
+            photos_found=photos_found,
+            false_option=game.last_false_option,
+            hallucinations=tuple (game.hallucination_system.last_shown),
+            options=session.options,
+            disabled=session.disabled,
+            locked=self.locked_options (session),
+            finished=session.finished,
+            ending=session.ending
+        )
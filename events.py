@@ -0,0 +1,168 @@
+#!/usr/bin/env python
+"""
+Модуль потока аналитических событий.
+Обработчики публикуют события в ограниченную очередь asyncio без ожидания
+записи на диск. Фоновая задача забирает события пачками и дописывает их
+в файлы формата JSON Lines (по одному файлу на день).
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+
+logger = logging.getLogger (__name__)
+
+# Маркер остановки фоновой записи
+_STOP = object ()
+
+# Поведение при заполненной очереди
+POLICY_DROP = 'drop'  # событие отбрасывается и учитывается в счетчике
+POLICY_BLOCK = 'block'  # публикация ждет освобождения места (не дольше block_timeout)
+
+
+class EventStream:
+    """Буферизованный поток событий с фоновой записью пачками"""
+
+    def __init__ (self, directory: str = 'events', capacity: int = 10000, batch_size: int = 500,
+                  flush_interval: float = 1.0, policy: str = POLICY_DROP, block_timeout: float = 0.05):
+        """
+        Args:
+            directory: Каталог для файлов событий
+            capacity: Максимальное количество событий в очереди
+            batch_size: Максимальное количество событий в одной записи
+            flush_interval: Сколько ждать наполнения пачки, секунд
+            policy: POLICY_DROP или POLICY_BLOCK
+            block_timeout: Максимальное ожидание места в очереди для POLICY_BLOCK, секунд
+        """
+        if policy not in (POLICY_DROP, POLICY_BLOCK):
+            raise ValueError (f"Неизвестная политика переполнения: {policy}")
+
+        self.directory = directory
+        self.capacity = capacity
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.policy = policy
+        self.block_timeout = block_timeout
+
+        self.queue = None
+        self.task = None
+        self.stopping = False
+
+        # Счетчики
+        self.published = 0
+        self.dropped = 0
+        self.blocked = 0
+        self.written = 0
+        self.batches = 0
+        self.write_errors = 0
+
+    def start (self):
+        """Создает очередь и запускает фоновую запись (внутри работающего цикла событий)"""
+        if self.task is not None:
+            return
+        os.makedirs (self.directory, exist_ok=True)
+        self.queue = asyncio.Queue (maxsize=self.capacity)
+        self.task = asyncio.get_running_loop ().create_task (self._run ())
+
+    async def publish (self, event: dict) -> bool:
+        """
+        Публикует событие
+
+        Args:
+            event: Словарь с данными события (метка времени добавляется автоматически)
+
+        Returns:
+            bool: True, если событие принято в очередь
+        """
+        if self.queue is None or self.stopping:
+            self.dropped += 1
+            return False
+
+        event.setdefault ('ts', time.time ())
+
+        try:
+            self.queue.put_nowait (event)
+        except asyncio.QueueFull:
+            if self.policy == POLICY_DROP:
+                self.dropped += 1
+                return False
+
+            self.blocked += 1
+            try:
+                await asyncio.wait_for (self.queue.put (event), self.block_timeout)
+            except asyncio.TimeoutError:
+                self.dropped += 1
+                return False
+
+        self.published += 1
+        return True
+
+    async def _run (self):
+        """Фоновая задача: собирает пачки и записывает их до получения маркера остановки"""
+        loop = asyncio.get_running_loop ()
+        while True:
+            event = await self.queue.get ()
+            if event is _STOP:
+                return
+            batch = [event]
+
+            # Добираем пачку, не дольше flush_interval
+            stop = False
+            deadline = loop.time () + self.flush_interval
+            while len (batch) < self.batch_size:
+                timeout = deadline - loop.time ()
+                if timeout <= 0:
+                    break
+                try:
+                    event = await asyncio.wait_for (self.queue.get (), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if event is _STOP:
+                    stop = True
+                    break
+                batch.append (event)
+
+            await self._write (batch)
+            if stop:
+                return
+
+    async def _write (self, batch):
+        """Записывает пачку в пуле потоков, чтобы не блокировать цикл событий"""
+        try:
+            await asyncio.get_running_loop ().run_in_executor (None, self._append, batch)
+            self.written += len (batch)
+            self.batches += 1
+        except (OSError, TypeError, ValueError) as e:
+            self.write_errors += 1
+            logger.error ("Не удалось записать %d событий: %s", len (batch), e)
+
+    def _append (self, batch):
+        """Дописывает пачку событий в файл текущего дня"""
+        path = os.path.join (self.directory, time.strftime ('events-%Y%m%d.jsonl'))
+        lines = "".join (json.dumps (event, ensure_ascii=False) + "\n" for event in batch)
+        with open (path, 'a', encoding='utf-8') as events_file:
+            events_file.write (lines)
+
+    async def stop (self):
+        """Прекращает прием событий и дожидается записи всего, что уже в очереди"""
+        if self.task is None:
+            return
+
+        # Маркер встает в очередь после уже принятых событий
+        self.stopping = True
+        await self.queue.put (_STOP)
+        await self.task
+        self.task = None
+
+    def get_stats (self):
+        """Возвращает счетчики потока событий"""
+        return {
+            'published': self.published,
+            'dropped': self.dropped,
+            'blocked': self.blocked,
+            'written': self.written,
+            'batches': self.batches,
+            'write_errors': self.write_errors,
+            'queued': self.queue.qsize () if self.queue is not None else 0,
+        }
@@ -0,0 +1,324 @@
+#!/usr/bin/env python
+"""
+Локальный сервер, имитирующий Bot API, для проверки транспорта без сети.
+Поддерживает keep-alive HTTP/1.1, long polling getUpdates и задержку
+ответа, считает открытые соединения и запросы по методам.
+
+Нагрузочный прогон отправки (пулы из переменных RANOVELL_SEND_*/RANOVELL_POLL_*):
+    python fake_bot_api.py --load 5000 --concurrency 200 --latency 50
+    python fake_bot_api.py --load 5000 --concurrency 200 --latency 50 --shared
+
+Сервер для бота (TELEGRAM_BASE_URL=http://127.0.0.1:8081/bot python main.py):
+    python fake_bot_api.py --serve --port 8081 --chats 20 --turns 10 --spam 200
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from urllib.parse import parse_qsl
+
+# Методы, для которых ответ - сообщение
+MESSAGE_METHODS = ('sendMessage', 'sendPhoto', 'editMessageText', 'editMessageReplyMarkup')
+
+
+class FakeBotApi:
+    """HTTP-сервер с ответами в формате Bot API"""
+
+    def __init__ (self, host: str = '127.0.0.1', port: int = 0, latency: float = 0.0,
+                  turns: int = 0, seed: int = None):
+        """
+        Args:
+            host: Адрес сервера
+            port: Порт (0 - любой свободный)
+            latency: Задержка ответа на отправку, секунд
+            turns: Сколько раз нажимать кнопки в ответ на сообщения бота (0 - не нажимать)
+            seed: Seed выбора кнопок
+        """
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.turns = turns
+        self.rng = random.Random (seed)
+        self.server = None
+        self.handlers = {}  # задача соединения -> поток записи
+
+        self.updates = []
+        self.next_update_id = 1
+        self.next_message_id = 1
+        self.new_updates = asyncio.Event ()
+        self.pressed = {}  # чат -> количество нажатий
+
+        # Счетчики
+        self.connections = 0
+        self.open_connections = 0
+        self.peak_connections = 0
+        self.methods = {}
+
+    @property
+    def base_url (self):
+        """Адрес для Bot (base_url)"""
+        return f"http://{self.host}:{self.port}/bot"
+
+    async def start (self):
+        """Запускает сервер"""
+        self.server = await asyncio.start_server (self._serve, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname ()[1]
+
+    async def stop (self):
+        """Останавливает сервер вместе с незавершенными запросами (например, long polling)"""
+        self.server.close ()
+        self.new_updates.set ()
+        for writer in self.handlers.values ():
+            writer.close ()
+        await asyncio.gather (*self.handlers, return_exceptions=True)
+        await self.server.wait_closed ()
+
+    def push_update (self, **update):
+        """Добавляет обновление в очередь getUpdates"""
+        update['update_id'] = self.next_update_id
+        self.next_update_id += 1
+        self.updates.append (update)
+        self.new_updates.set ()
+
+    def push_text (self, chat_id: int, text: str):
+        """Добавляет текстовое сообщение (или команду) от игрока"""
+        entities = [{'type': 'bot_command', 'offset': 0, 'length': len (text.split ()[0])}] \
+            if text.startswith ('/') else []
+        self.push_update (message=self._message (chat_id, text=text, entities=entities, user=True))
+
+    def push_press (self, chat_id: int, message: dict, data: str):
+        """Добавляет нажатие inline-кнопки"""
+        self.push_update (callback_query={
+            'id': str (self.next_update_id),
+            'from': self._user (chat_id),
+            'chat_instance': str (chat_id),
+            'message': message,
+            'data': data,
+        })
+
+    def get_stats (self):
+        """Возвращает счетчики сервера"""
+        return {
+            'connections': self.connections,
+            'peak_connections': self.peak_connections,
+            'requests': sum (self.methods.values ()),
+            'methods': dict (self.methods),
+        }
+
+    @staticmethod
+    def _user (chat_id):
+        return {'id': chat_id, 'is_bot': False, 'first_name': f"Игрок {chat_id}"}
+
+    def _message (self, chat_id, user=False, **fields):
+        message = {
+            'message_id': self.next_message_id,
+            'date': int (time.time ()),
+            'chat': {'id': chat_id, 'type': 'private'},
+        }
+        if user:
+            message['from'] = self._user (chat_id)
+        message.update ({key: value for key, value in fields.items () if value})
+        self.next_message_id += 1
+        return message
+
+    async def _serve (self, reader, writer):
+        """Обслуживает одно соединение (несколько запросов при keep-alive)"""
+        handler = asyncio.current_task ()
+        self.handlers[handler] = writer
+        self.connections += 1
+        self.open_connections += 1
+        self.peak_connections = max (self.peak_connections, self.open_connections)
+        try:
+            while True:
+                request_line = await reader.readline ()
+                if not request_line:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline ()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode ('latin-1').partition (':')
+                    headers[name.strip ().lower ()] = value.strip ()
+                body = await reader.readexactly (int (headers.get ('content-length', 0)))
+
+                path = request_line.split ()[1].decode ()
+                method = path.rsplit ('/', 1)[-1]
+                params = self._parse_params (headers.get ('content-type', ''), body)
+                result = await self._call (method, params)
+
+                payload = json.dumps ({'ok': True, 'result': result}).encode ()
+                writer.write (b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                              b"Content-Length: %d\r\n\r\n%s" % (len (payload), payload))
+                await writer.drain ()
+                if headers.get ('connection', '').lower () == 'close':
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self.handlers.pop (handler, None)
+            self.open_connections -= 1
+            writer.close ()
+
+    @staticmethod
+    def _parse_params (content_type, body):
+        """Параметры запроса: значения python-telegram-bot кодирует в JSON внутри формы"""
+        if not content_type.startswith ('application/x-www-form-urlencoded'):
+            return {}  # multipart (файлы) не разбираем
+        params = {}
+        for name, value in parse_qsl (body.decode ()):
+            try:
+                params[name] = json.loads (value)
+            except ValueError:
+                params[name] = value
+        return params
+
+    async def _call (self, method, params):
+        """Результат метода Bot API"""
+        self.methods[method] = self.methods.get (method, 0) + 1
+
+        if method == 'getMe':
+            return {'id': 1, 'is_bot': True, 'first_name': 'Ranovell', 'username': 'ranovell_bot'}
+        if method == 'getUpdates':
+            return await self._get_updates (int (params.get ('offset', 0) or 0), float (params.get ('timeout', 0)))
+
+        if self.latency:
+            await asyncio.sleep (self.latency)
+
+        if method in MESSAGE_METHODS:
+            chat_id = int (params.get ('chat_id', 0))
+            message = self._message (chat_id, text=params.get ('text') or params.get ('caption'),
+                                     reply_markup=params.get ('reply_markup'))
+            self._maybe_press (chat_id, message)
+            return message
+        return True
+
+    async def _get_updates (self, offset, timeout):
+        """Long polling: ждет обновлений не дольше timeout секунд"""
+        self.updates = [update for update in self.updates if update['update_id'] >= offset]
+        if not self.updates and timeout and self.server.is_serving ():
+            self.new_updates.clear ()
+            try:
+                await asyncio.wait_for (self.new_updates.wait (), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return self.updates[:100]
+
+    def _maybe_press (self, chat_id, message):
+        """Нажимает случайную кнопку в сообщении бота, пока у чата есть ходы"""
+        keyboard = (message.get ('reply_markup') or {}).get ('inline_keyboard')
+        if not keyboard or self.pressed.get (chat_id, 0) >= self.turns:
+            return
+        self.pressed[chat_id] = self.pressed.get (chat_id, 0) + 1
+        button = self.rng.choice ([button for row in keyboard for button in row])
+        self.push_press (chat_id, message, button['callback_data'])
+
+
+async def run_load (count, concurrency, latency, shared=False):
+    """
+    Отправляет count сообщений при работающем long polling и печатает метрики пулов
+
+    Args:
+        count: Количество сообщений
+        concurrency: Количество одновременных отправок
+        latency: Задержка ответа сервера, секунд
+        shared: Один пул на отправку и получение обновлений (как по умолчанию в Application)
+    """
+    from telegram import Bot
+    from telegram.error import TimedOut
+
+    from transport import create_requests
+
+    server = FakeBotApi (latency=latency)
+    await server.start ()
+
+    send, polling = create_requests ()
+    if shared:
+        polling = send
+    bot = Bot ('123:fake', base_url=server.base_url, request=send, get_updates_request=polling)
+
+    async with bot:
+        async def poll ():
+            while True:
+                try:
+                    await bot.get_updates (timeout=10)
+                except TimedOut:
+                    pass  # при общем пуле getUpdates может не дождаться соединения
+
+        poller = asyncio.create_task (poll ())
+        await asyncio.sleep (0.05)  # getUpdates успевает занять соединение
+
+        semaphore = asyncio.Semaphore (concurrency)
+        timeouts = 0
+
+        async def send_one (number):
+            nonlocal timeouts
+            async with semaphore:
+                try:
+                    await bot.send_message (number % 1000 + 1, f"Сообщение {number}")
+                except TimedOut:
+                    timeouts += 1
+
+        started = time.perf_counter ()
+        await asyncio.gather (*(send_one (number) for number in range (count)))
+        elapsed = time.perf_counter () - started
+
+        poller.cancel ()
+        try:
+            await poller
+        except asyncio.CancelledError:
+            pass
+
+    await server.stop ()
+
+    print (f"Отправлено: {count - timeouts} из {count} за {elapsed:.2f} с "
+           f"({(count - timeouts) / elapsed:.0f} сообщений/с), тайм-аутов: {timeouts}")
+    print (f"Пул отправки: {send.get_stats ()}")
+    if not shared:
+        print (f"Пул получения: {polling.get_stats ()}")
+    print (f"Сервер: {server.get_stats ()}")
+
+
+async def serve (port, chats, turns, latency, seed, spam=0):
+    """Запускает сервер для бота и отправляет /start от chats игроков и spam сообщений от одного игрока"""
+    server = FakeBotApi (port=port, latency=latency, turns=turns, seed=seed)
+    await server.start ()
+    print (f"Bot API: {server.base_url} (Ctrl+C для остановки)")
+    for chat_id in range (1, chats + 1):
+        server.push_text (chat_id, '/start')
+    for number in range (spam):
+        server.push_text (chats + 1, f"Сообщение {number}")
+    try:
+        while True:
+            await asyncio.sleep (10)
+            print (f"Сервер: {server.get_stats ()}")
+    finally:
+        await server.stop ()
+
+
+def main ():
+    parser = argparse.ArgumentParser (description="Имитация Bot API для проверки транспорта")
+    parser.add_argument ('--load', type=int, metavar='N', help="Нагрузочный прогон: отправить N сообщений")
+    parser.add_argument ('--concurrency', type=int, default=100, help="Одновременных отправок")
+    parser.add_argument ('--shared', action='store_true', help="Общий пул для отправки и getUpdates")
+    parser.add_argument ('--serve', action='store_true', help="Запустить сервер для бота")
+    parser.add_argument ('--port', type=int, default=8081)
+    parser.add_argument ('--chats', type=int, default=10, help="Количество игроков в режиме --serve")
+    parser.add_argument ('--turns', type=int, default=10, help="Нажатий кнопок на игрока в режиме --serve")
+    parser.add_argument ('--spam', type=int, default=0, help="Сообщений подряд от одного игрока в режиме --serve")
+    parser.add_argument ('--latency', type=float, default=20, help="Задержка ответа, мс")
+    parser.add_argument ('--seed', type=int)
+    args = parser.parse_args ()
+
+    if args.serve:
+        try:
+            asyncio.run (serve (args.port, args.chats, args.turns, args.latency / 1000, args.seed, args.spam))
+        except KeyboardInterrupt:
+            pass
+    else:
+        asyncio.run (run_load (args.load or 1000, args.concurrency, args.latency / 1000, args.shared))
+
+
+if __name__ == '__main__':
+    main ()
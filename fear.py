@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+"""
+Модуль уровня страха.
+Изменения страха по настроению выбора и по локации заданы таблицами,
+а результат хода для каждой пары (настроение, локация) и каждого уровня
+посчитан заранее. Уровни сгруппированы в полосы; подписчики получают
+событие только при переходе в другую полосу, поэтому неизменная полоса
+ничего не стоит на ходу.
+"""
+from bisect import bisect_right
+
+FEAR_MIN = 0
+FEAR_MAX = 100
+
+# Изменение страха в зависимости от настроения выбора
+SENTIMENT_DELTAS = {
+    'brave': -5,
+    'scared': 10,
+    'aggressive': 15,
+}
+
+# Дополнительное изменение страха в зависимости от локации
+LOCATION_DELTAS = {
+    'basement': 15,
+    'children_room': 10,
+    'corridor': 5,
+    'doctor_office': 20,
+}
+
+# Полосы страха: нижние границы полос, начиная со второй
+BAND_THRESHOLDS = (20, 50, 80)
+BAND_NAMES = ('low', 'medium', 'high', 'critical')
+BAND_LOW, BAND_MEDIUM, BAND_HIGH, BAND_CRITICAL = range (len (BAND_NAMES))
+
+# Полоса для каждого уровня страха
+BAND_BY_LEVEL = tuple (bisect_right (BAND_THRESHOLDS, level) for level in range (FEAR_MAX + 1))
+
+# Вероятность галлюцинации в полосе BAND_HIGH (в BAND_CRITICAL галлюцинации есть всегда)
+HALLUCINATION_CHANCE = tuple (max (level - 50, 0) / 100.0 for level in range (FEAR_MAX + 1))
+
+# Вероятность ложного варианта действия
+FALSE_OPTION_CHANCE = tuple (max (level - 70, 0) / 100.0 for level in range (FEAR_MAX + 1))
+
+
+def clamp (level):
+    """Ограничивает уровень страха допустимым диапазоном"""
+    return min (FEAR_MAX, max (FEAR_MIN, level))
+
+
+def _build_updates ():
+    """
+    Таблица результатов хода: (настроение, локация) -> кортеж новых уровней
+    по исходному уровню. Изменения применяются по очереди с ограничением
+    после каждого, как и раньше в GameLogic
+    """
+    updates = {}
+    for sentiment in tuple (SENTIMENT_DELTAS) + ('neutral', 'curious'):
+        for location in tuple (LOCATION_DELTAS) + (None,):
+            first = SENTIMENT_DELTAS.get (sentiment, 0)
+            second = LOCATION_DELTAS.get (location, 0)
+            updates[sentiment, location] = tuple (
+                clamp (clamp (level + first) + second) for level in range (FEAR_MAX + 1)
+            )
+    return updates
+
+
+FEAR_UPDATES = _build_updates ()
+
+
+class FearMeter:
+    """Уровень страха с событиями смены полосы"""
+
+    def __init__ (self, level: int = 0):
+        """
+        Args:
+            level: Начальный уровень страха
+        """
+        self.level = clamp (level)
+        self.band = BAND_BY_LEVEL[self.level]
+        self.listeners = []
+        self.band_changes = 0
+
+    def subscribe (self, listener):
+        """
+        Подписывает на смену полосы
+
+        Args:
+            listener: Функция (старая полоса, новая полоса, уровень)
+        """
+        self.listeners.append (listener)
+
+    def set (self, level: int):
+        """Устанавливает уровень страха и оповещает подписчиков, если сменилась полоса"""
+        self.level = level = clamp (level)
+        band = BAND_BY_LEVEL[level]
+        if band != self.band:
+            old_band = self.band
+            self.band = band
+            self.band_changes += 1
+            for listener in self.listeners:
+                listener (old_band, band, level)
+
+    def increase (self, amount: int):
+        """Увеличение уровня страха"""
+        self.set (self.level + amount)
+
+    def decrease (self, amount: int):
+        """Уменьшение уровня страха"""
+        self.set (self.level - amount)
+
+    def apply (self, sentiment, location):
+        """
+        Изменяет страх по настроению выбора и локации
+
+        Args:
+            sentiment: Настроение выбора (см. GameLogic._analyze_sentiment)
+            location: Локация (сцена)
+        """
+        table = FEAR_UPDATES.get ((sentiment, location if location in LOCATION_DELTAS else None))
+        if table is None:
+            self.set (clamp (clamp (self.level + SENTIMENT_DELTAS.get (sentiment, 0))
+                             + LOCATION_DELTAS.get (location, 0)))
+        else:
+            self.set (table[self.level])
+
+    @property
+    def band_name (self):
+        """Название текущей полосы"""
+        return BAND_NAMES[self.band]
@@ -3,30 +3,126 @@ import random
 from characters import Player, DoctorValentin, Ghost
 from hallucination_system import HallucinationSystem
 
+# Варианты ответов для каждой сцены
+SCENE_OPTIONS = {
+    'intro': (
+        "Осмотреться вокруг",
+        "Попытаться вспомнить, как я сюда попал",
+        "Позвать кого-нибудь"
+    ),
+    'room_with_portrait': (
+        "Осмотреть портрет внимательнее",
+        "Проверить ящик письменного стола",
+        "Попытаться открыть дверь"
+    ),
+    'corridor': (
+        "Идти по коридору дальше",
+        "Прислушаться к звукам за дверями",
+        "Вернуться в начальную комнату"
+    ),
+    'children_room': (
+        "Осмотреть музыкальную шкатулку",
+        "Прочитать дневник на столе",
+        "Заглянуть в шкаф"
+    ),
+    'basement': (
+        "Исследовать алтарь в центре комнаты",
+        "Осмотреть странные банки на полках",
+        "Быстро уйти отсюда"
+    ),
+    'library': (
+        "Искать книги с информацией о доме",
+        "Изучить вырванные страницы",
+        "Проверить новую дверь в конце комнаты"
+    ),
+    'doctor_office': (
+        "Прочитать записи о пациентах",
+        "Осмотреть странное кресло в центре комнаты",
+        "Искать выход из дома"
+    ),
+    'final_choice': (
+        "Сесть в кресло и вспомнить правду",
+        "Отказаться и попытаться покинуть дом"
+    ),
+    'end_acceptance': (
+        "Принять правду и двигаться дальше",
+        "Попросить прощения у призраков семьи"
+    ),
+    'end_denial': (
+        "Продолжать отрицать произошедшее",
+        "Попытаться снова забыть всё"
+    ),
+    'end_secret': (
+        "Противостоять доктору Валентину",
+        "Помочь душам обрести покой"
+    ),
+    'end': (
+        "Начать игру заново",
+    )
+}
+
+# Варианты ответов для сцен без собственного списка
+DEFAULT_OPTIONS = ("Продолжить", "Вернуться", "Закончить игру")
+
+# Ключевые слова для анализа ответов игрока
+KEYWORDS = {
+    'brave': ('исследовать', 'продолжить', 'вперёд', 'открыть', 'читать', 'смотреть', 'да', 'хочу'),
+    'scared': ('страшно', 'боюсь', 'назад', 'вернуться', 'выйти', 'убежать', 'нет', 'не хочу'),
+    'curious': ('что', 'почему', 'как', 'где', 'когда', 'узнать', 'правда', 'память', 'искать'),
+    'aggressive': ('удар', 'сломать', 'разбить', 'драться', 'уничтожить', 'выбить', 'напасть'),
+}
+
 
 class GameLogic:
     """Класс для управления игровой логикой и сюжетом хоррор-новеллы"""
 
-    def __init__ (self):
+    def __init__ (self, content=None, rng=None, headless=False):
+        """
+        Инициализация игровой логики
+
+        Args:
+            content: Словарь статического контента (см. content_snapshot.load_content).
+                По умолчанию используются константы модулей
+            rng: Генератор случайных чисел (random.Random). По умолчанию модуль random
+            headless: Не создавать стили оформления (для симуляций без интерфейса)
+        """
+        if content is None:
+            from content_snapshot import collect_content
+            content = collect_content ()
+        self.content = content
+        self.scene_options = content['scene_options']
+
+        # Все случайные события игры берутся из этого генератора
+        self.rng = rng if rng is not None else random
+
         # Создаем персонажей
-        from styles import MessageStyles
-        self.styles = MessageStyles ()  # Добавляем экземпляр MessageStyles
+        if headless:
+            self.styles = None
+        else:
+            from styles import MessageStyles
+            self.styles = MessageStyles (emoji=content['emoji'])  # Добавляем экземпляр MessageStyles
         self.player = Player ()
-        self.doctor = DoctorValentin ()
+        self.doctor = DoctorValentin (responses=content['doctor_responses'])
         self.wife_ghost = Ghost (
             name="Призрак жены",
             age=34,
             description="Призрачная фигура женщины, окутанная печалью",
-            ghost_type="family"
+            ghost_type="family",
+            whispers=content['ghost_whispers']
         )
         self.child_ghost = Ghost (
             name="Призрак ребёнка",
             age=7,
             description="Тень ребёнка, блуждающая по дому",
-            ghost_type="family"
+            ghost_type="family",
+            whispers=content['ghost_whispers']
         )
         # Инициализация системы галлюцинаций
-        self.hallucination_system = HallucinationSystem (self)
+        self.hallucination_system = HallucinationSystem (
+            self,
+            hallucinations=content['hallucinations'],
+            false_options=content['false_options']
+        )
 
         # Инициализация отношений между персонажами
         self.player.add_relationship ("Доктор Валентин", "доктор", -10)
@@ -36,6 +132,9 @@ class GameLogic:
         self.found_photos = 0
         self.max_photos = 5
 
+        # Ложный вариант, выбранный на последнем ходу (None, если выбор был настоящим)
+        self.last_false_option = None
+
         # Сцены игры и их обработчики
         self.scenes = {
             'intro': self._handle_intro,
@@ -53,12 +152,7 @@ class GameLogic:
         }
 
         # Ключевые слова для анализа ответов игрока
-        self.keywords = {
-            'brave': ['исследовать', 'продолжить', 'вперёд', 'открыть', 'читать', 'смотреть', 'да', 'хочу'],
-            'scared': ['страшно', 'боюсь', 'назад', 'вернуться', 'выйти', 'убежать', 'нет', 'не хочу'],
-            'curious': ['что', 'почему', 'как', 'где', 'когда', 'узнать', 'правда', 'память', 'искать'],
-            'aggressive': ['удар', 'сломать', 'разбить', 'драться', 'уничтожить', 'выбить', 'напасть'],
-        }
+        self.keywords = content['keywords']
 
     def get_introduction (self):
         """Вступительный текст при начале игры"""
@@ -71,69 +165,28 @@ class GameLogic:
 
     def get_options_for_scene (self, scene):
         """Возвращает варианты ответов для текущей сцены"""
-        options_map = {
-            'intro': [
-                "Осмотреться вокруг",
-                "Попытаться вспомнить, как я сюда попал",
-                "Позвать кого-нибудь"
-            ],
-            'room_with_portrait': [
-                "Осмотреть портрет внимательнее",
-                "Проверить ящик письменного стола",
-                "Попытаться открыть дверь"
-            ],
-            'corridor': [
-                "Идти по коридору дальше",
-                "Прислушаться к звукам за дверями",
-                "Вернуться в начальную комнату"
-            ],
-            'children_room': [
-                "Осмотреть музыкальную шкатулку",
-                "Прочитать дневник на столе",
-                "Заглянуть в шкаф"
-            ],
-            'basement': [
-                "Исследовать алтарь в центре комнаты",
-                "Осмотреть странные банки на полках",
-                "Быстро уйти отсюда"
-            ],
-            'library': [
-                "Искать книги с информацией о доме",
-                "Изучить вырванные страницы",
-                "Проверить новую дверь в конце комнаты"
-            ],
-            'doctor_office': [
-                "Прочитать записи о пациентах",
-                "Осмотреть странное кресло в центре комнаты",
-                "Искать выход из дома"
-            ],
-            'final_choice': [
-                "Сесть в кресло и вспомнить правду",
-                "Отказаться и попытаться покинуть дом"
-            ],
-            'end_acceptance': [
-                "Принять правду и двигаться дальше",
-                "Попросить прощения у призраков семьи"
-            ],
-            'end_denial': [
-                "Продолжать отрицать произошедшее",
-                "Попытаться снова забыть всё"
-            ],
-            'end_secret': [
-                "Противостоять доктору Валентину",
-                "Помочь душам обрести покой"
-            ],
-            'end': [
-                "Начать игру заново"
-            ]
-        }
-        options = options_map.get (scene, ["Продолжить", "Вернуться", "Закончить игру"])
+        # Копируем кортеж в список: ложные варианты вставляются в него на месте
+        options = list (self.scene_options.get (scene, DEFAULT_OPTIONS))
         # Добавляем ложные варианты при высоком уровне страха
         if hasattr (self, 'player') and hasattr (self.player, 'fear_level'):
             options = self.hallucination_system.add_false_options (options, scene)
 
         return options
 
+    def option_ids (self, scene, options):
+        """
+        Исходные индексы показанных вариантов в списке вариантов сцены
+
+        Args:
+            scene: Сцена
+            options: Показанные варианты (возможно, с ложными)
+
+        Returns:
+            tuple: Индекс каждого варианта; -1 для ложных вариантов
+        """
+        base = self.scene_options.get (scene, DEFAULT_OPTIONS)
+        return tuple (base.index (option) if option in base else -1 for option in options)
+
 
 
     def process_input (self, scene, user_input):
@@ -146,19 +199,23 @@ class GameLogic:
             # Для неизвестных сцен возвращаем общий ответ
             return "Что-то пошло не так...", "end"
 
-    def process_option_selection (self, scene, option_index):
+    def process_option_selection (self, scene, option_index, options=None):
         """
         Обработка выбора варианта ответа
 
         Args:
             scene: Текущая сцена
             option_index: Индекс выбранного варианта
+            options: Варианты, показанные игроку. По умолчанию запрашиваются заново
 
         Returns:
             tuple: (ответ, следующая сцена)
         """
         # Получаем варианты ответов для текущей сцены
-        options = self.get_options_for_scene (scene)
+        if options is None:
+            options = self.get_options_for_scene (scene)
+        self.last_false_option = None
+        self.hallucination_system.last_shown = []
 
         # Проверяем, что индекс в допустимых пределах
         if 0 <= option_index < len (options):
@@ -169,6 +226,7 @@ class GameLogic:
             for false_options in self.hallucination_system.false_options.values ():
                 if user_input in false_options:
                     # Это галлюцинация - обрабатываем специальным образом
+                    self.last_false_option = user_input
                     self.player.increase_fear (10)  # Увеличиваем страх при выборе ложного варианта
 
                     hallucination_response = (
@@ -221,24 +279,8 @@ class GameLogic:
         return discovery_text
 
     def _update_fear_level (self, sentiment, location):
-        """Обновление уровня страха на основе настроения и локации"""
-        # Базовые изменения страха в зависимости от сентимента
-        if sentiment == 'brave':
-            self.player.decrease_fear (5)
-        elif sentiment == 'scared':
-            self.player.increase_fear (10)
-        elif sentiment == 'aggressive':
-            self.player.increase_fear (15)
-
-        # Дополнительно увеличиваем страх в зависимости от локации
-        if location == 'basement':
-            self.player.increase_fear (15)
-        elif location == 'children_room':
-            self.player.increase_fear (10)
-        elif location == 'corridor':
-            self.player.increase_fear (5)
-        elif location == 'doctor_office':
-            self.player.increase_fear (20)
+        """Обновление уровня страха на основе настроения и локации (см. fear.FEAR_UPDATES)"""
+        self.player.fear.apply (sentiment, location)
 
     def _handle_intro (self, user_input):
         """Обработка вступительной сцены"""
@@ -276,7 +318,7 @@ class GameLogic:
         self._update_fear_level (sentiment, 'room')
 
         # Случайный шанс найти фотографию при осмотре комнаты
-        random_discovery = random.random () < 0.3  # 30% шанс
+        random_discovery = self.rng.random () < 0.3  # 30% шанс
 
         if "портрет" in user_input.lower ():
             response = (
@@ -360,7 +402,7 @@ class GameLogic:
             )
 
             # Шанс найти фотографию
-            if random.random () < 0.4:  # 40% шанс
+            if self.rng.random () < 0.4:  # 40% шанс
                 response += "\n\n" + self._handle_photo_discovery ()
 
             return response, 'basement'
@@ -415,7 +457,7 @@ class GameLogic:
             )
 
             # Есть шанс найти фотографию
-            if random.random () < 0.5:  # 50% шанс
+            if self.rng.random () < 0.5:  # 50% шанс
                 response += "\n\n" + self._handle_photo_discovery ()
 
             return response, 'children_room'
@@ -457,7 +499,7 @@ class GameLogic:
             self.player.add_to_inventory ("журнал эксперимента")
 
             # Есть шанс найти фотографию
-            if random.random () < 0.3:  # 30% шанс
+            if self.rng.random () < 0.3:  # 30% шанс
                 response += "\n\n" + self._handle_photo_discovery ()
 
             response += "\n\nСреди бумаг Алексей находит ключ с надписью 'Библиотека'."
@@ -516,7 +558,7 @@ class GameLogic:
             self.player.add_to_inventory ("книга об истории больницы")
 
             # Есть шанс найти фотографию
-            if random.random () < 0.4:  # 40% шанс
+            if self.rng.random () < 0.4:  # 40% шанс
                 response += "\n\n" + self._handle_photo_discovery ()
 
             return response, 'library'
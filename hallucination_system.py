@@ -1,93 +1,116 @@
 #!/usr/bin/env python
 import random
 
+from fear import BAND_CRITICAL, BAND_HIGH, FALSE_OPTION_CHANCE, HALLUCINATION_CHANCE
+
+# Галлюцинации для разных сцен
+HALLUCINATIONS = {
+    'common': (  # Общие галлюцинации для всех сцен
+        "Краем глаза Алексей замечает движущуюся тень, но когда оборачивается - никого нет.",
+        "На мгновение кажется, что все предметы в комнате слегка вибрируют.",
+        "Алексею чудится шепот за спиной, но слов не разобрать.",
+        "На стене мелькает темный силуэт, исчезая, когда Алексей смотрит прямо на него.",
+        "Собственное отражение в тусклом стекле кажется искаженным, будто это кто-то другой."
+    ),
+    'room_with_portrait': (
+        "Глаза на портрете, кажется, следят за каждым движением Алексея.",
+        "На секунду портрет меняется, и женщина на нем начинает плакать кровавыми слезами.",
+        "Алексей слышит тихий плач, исходящий от портрета."
+    ),
+    'corridor': (
+        "Коридор на мгновение кажется бесконечно длинным, стены уходят вдаль.",
+        "Двери по бокам коридора начинают беззвучно открываться и закрываться.",
+        "Под ногами проступают темные пятна, похожие на кровь, но через секунду исчезают."
+    ),
+    'children_room': (
+        "Игрушки на полке поворачивают головы, следя за Алексеем.",
+        "Из шкатулки на мгновение доносится детский смех, сменяющийся плачем.",
+        "Алексей видит маленькие следы босых ног, ведущие в стену и исчезающие."
+    ),
+    'basement': (
+        "В темноте подвала мелькают красные глаза, десятки пар.",
+        "Стены подвала, кажется, пульсируют, словно живые.",
+        "Алексей чувствует на шее чье-то дыхание, но обернувшись, никого не видит."
+    ),
+    'library': (
+        "Буквы в книгах шевелятся и меняют местами, складываясь в пугающие послания.",
+        "С полок падают книги, раскрываясь на страницах с рисунками ритуальных убийств.",
+        "Алексей слышит шепот, доносящийся из-за книжных полок."
+    ),
+    'doctor_office': (
+        "Медицинские инструменты на столе кажутся покрытыми свежей кровью.",
+        "Силуэт доктора мелькает в отражениях, хотя в комнате никого нет.",
+        "Кресло в центре комнаты поворачивается само по себе, словно в нем кто-то сидит."
+    )
+}
+
+# Ложные варианты действий для разных сцен
+FALSE_OPTIONS = {
+    'common': (
+        "Прислушаться к шепоту",
+        "Проверить тень в углу",
+        "Закрыть глаза и сосчитать до десяти",
+        "Позвать на помощь"
+    ),
+    'room_with_portrait': (
+        "Сорвать портрет со стены",
+        "Заговорить с женщиной на портрете"
+    ),
+    'corridor': (
+        "Бежать до конца коридора",
+        "Спрятаться в тени"
+    ),
+    'children_room': (
+        "Собрать игрушки в кучу",
+        "Поискать ребенка под кроватью"
+    ),
+    'basement': (
+        "Погасить свет",
+        "Закрыть глаза и прислушаться"
+    ),
+    'library': (
+        "Сжечь пугающие книги",
+        "Прочитать заклинание с открытой страницы"
+    ),
+    'doctor_office': (
+        "Разбить зеркало",
+        "Попытаться связаться с доктором"
+    )
+}
+
 
 class HallucinationSystem:
     """Система для добавления галлюцинаций и искажений реальности при высоком уровне страха"""
 
-    def __init__ (self, game_logic):
+    def __init__ (self, game_logic, hallucinations=None, false_options=None):
         """
         Инициализация системы галлюцинаций
 
         Args:
             game_logic: Экземпляр класса GameLogic, для доступа к игре
+            hallucinations: Каталог галлюцинаций по сценам (по умолчанию HALLUCINATIONS)
+            false_options: Каталог ложных вариантов по сценам (по умолчанию FALSE_OPTIONS)
         """
         self.game = game_logic
+        # Генератор случайных чисел игры (модуль random, если у игры его нет)
+        self.rng = getattr (game_logic, 'rng', random)
 
         # Галлюцинации для разных сцен
-        self.hallucinations = {
-            'common': [  # Общие галлюцинации для всех сцен
-                "Краем глаза Алексей замечает движущуюся тень, но когда оборачивается - никого нет.",
-                "На мгновение кажется, что все предметы в комнате слегка вибрируют.",
-                "Алексею чудится шепот за спиной, но слов не разобрать.",
-                "На стене мелькает темный силуэт, исчезая, когда Алексей смотрит прямо на него.",
-                "Собственное отражение в тусклом стекле кажется искаженным, будто это кто-то другой."
-            ],
-            'room_with_portrait': [
-                "Глаза на портрете, кажется, следят за каждым движением Алексея.",
-                "На секунду портрет меняется, и женщина на нем начинает плакать кровавыми слезами.",
-                "Алексей слышит тихий плач, исходящий от портрета."
-            ],
-            'corridor': [
-                "Коридор на мгновение кажется бесконечно длинным, стены уходят вдаль.",
-                "Двери по бокам коридора начинают беззвучно открываться и закрываться.",
-                "Под ногами проступают темные пятна, похожие на кровь, но через секунду исчезают."
-            ],
-            'children_room': [
-                "Игрушки на полке поворачивают головы, следя за Алексеем.",
-                "Из шкатулки на мгновение доносится детский смех, сменяющийся плачем.",
-                "Алексей видит маленькие следы босых ног, ведущие в стену и исчезающие."
-            ],
-            'basement': [
-                "В темноте подвала мелькают красные глаза, десятки пар.",
-                "Стены подвала, кажется, пульсируют, словно живые.",
-                "Алексей чувствует на шее чье-то дыхание, но обернувшись, никого не видит."
-            ],
-            'library': [
-                "Буквы в книгах шевелятся и меняют местами, складываясь в пугающие послания.",
-                "С полок падают книги, раскрываясь на страницах с рисунками ритуальных убийств.",
-                "Алексей слышит шепот, доносящийся из-за книжных полок."
-            ],
-            'doctor_office': [
-                "Медицинские инструменты на столе кажутся покрытыми свежей кровью.",
-                "Силуэт доктора мелькает в отражениях, хотя в комнате никого нет.",
-                "Кресло в центре комнаты поворачивается само по себе, словно в нем кто-то сидит."
-            ]
-        }
+        self.hallucinations = hallucinations if hallucinations is not None else HALLUCINATIONS
 
         # Ложные варианты действий для разных сцен
-        self.false_options = {
-            'common': [
-                "Прислушаться к шепоту",
-                "Проверить тень в углу",
-                "Закрыть глаза и сосчитать до десяти",
-                "Позвать на помощь"
-            ],
-            'room_with_portrait': [
-                "Сорвать портрет со стены",
-                "Заговорить с женщиной на портрете"
-            ],
-            'corridor': [
-                "Бежать до конца коридора",
-                "Спрятаться в тени"
-            ],
-            'children_room': [
-                "Собрать игрушки в кучу",
-                "Поискать ребенка под кроватью"
-            ],
-            'basement': [
-                "Погасить свет",
-                "Закрыть глаза и прислушаться"
-            ],
-            'library': [
-                "Сжечь пугающие книги",
-                "Прочитать заклинание с открытой страницы"
-            ],
-            'doctor_office': [
-                "Разбить зеркало",
-                "Попытаться связаться с доктором"
-            ]
-        }
+        self.false_options = false_options if false_options is not None else FALSE_OPTIONS
+
+        # Галлюцинации, добавленные при последнем вызове apply_hallucination_effects
+        self.last_shown = []
+
+        # Полоса страха игрока обновляется только по событию смены полосы
+        self.band = game_logic.player.fear.band
+        game_logic.player.fear.subscribe (self._on_fear_band)
+
+    def _on_fear_band (self, old_band, new_band, level):
+        """Обработчик смены полосы страха"""
+        self.band = new_band
 
     def get_hallucination (self, scene):
         """
@@ -100,15 +123,15 @@ class HallucinationSystem:
             str: Текст галлюцинации
         """
         # Комбинируем общие галлюцинации и специфичные для сцены
-        available_hallucinations = self.hallucinations.get ('common', [])
-        scene_specific = self.hallucinations.get (scene, [])
-        available_hallucinations.extend (scene_specific)
+        # (в новом списке: каталог общий и не должен изменяться)
+        available_hallucinations = (list (self.hallucinations.get ('common', ()))
+                                    + list (self.hallucinations.get (scene, ())))
 
         # Если для сцены нет галлюцинаций, возвращаем пустую строку
         if not available_hallucinations:
             return ""
 
-        return random.choice (available_hallucinations)
+        return self.rng.choice (available_hallucinations)
 
     def get_false_option (self, scene):
         """
@@ -121,15 +144,15 @@ class HallucinationSystem:
             str: Текст ложного варианта
         """
         # Комбинируем общие варианты и специфичные для сцены
-        available_options = self.false_options.get ('common', [])
-        scene_specific = self.false_options.get (scene, [])
-        available_options.extend (scene_specific)
+        # (в новом списке: каталог общий и не должен изменяться)
+        available_options = (list (self.false_options.get ('common', ()))
+                             + list (self.false_options.get (scene, ())))
 
         # Если для сцены нет вариантов, возвращаем None
         if not available_options:
             return None
 
-        return random.choice (available_options)
+        return self.rng.choice (available_options)
 
     def apply_hallucination_effects (self, response, scene):
         """
@@ -142,24 +165,18 @@ class HallucinationSystem:
         Returns:
             str: Измененный текст с галлюцинациями
         """
-        # Получаем уровень страха игрока
-        fear_level = self.game.player.fear_level
-
+        self.last_shown = []
 
-        # Если уровень страха низкий, ничего не меняем
-        if fear_level < 30:
+        # Ниже высокой полосы страха галлюцинаций нет
+        if self.band < BAND_HIGH:
             return response
 
-        # Определяем вероятность галлюцинации в зависимости от уровня страха
-        hallucination_chance = (fear_level - 50) / 100.0
-
         # Чем выше уровень страха, тем больше галлюцинаций
         num_hallucinations = 0
-        if fear_level >= 80:
-            num_hallucinations = random.randint (1, 2)
-        elif fear_level >= 50:
-            if random.random () < hallucination_chance:
-                num_hallucinations = 1
+        if self.band >= BAND_CRITICAL:
+            num_hallucinations = self.rng.randint (1, 2)
+        elif self.rng.random () < HALLUCINATION_CHANCE[self.game.player.fear_level]:
+            num_hallucinations = 1
 
         # Если нет галлюцинаций, возвращаем исходный текст
         if num_hallucinations == 0:
@@ -173,8 +190,9 @@ class HallucinationSystem:
             hallucination_text = self.get_hallucination (scene)
             if hallucination_text:
                 # Добавляем галлюцинацию как новый абзац в случайное место
-                insert_pos = random.randint (0, len (paragraphs))
+                insert_pos = self.rng.randint (0, len (paragraphs))
                 paragraphs.insert (insert_pos, hallucination_text)
+                self.last_shown.append (hallucination_text)
 
         # Объединяем абзацы обратно
         return "\n\n".join (paragraphs)
@@ -190,23 +208,17 @@ class HallucinationSystem:
         Returns:
             list: Обновленный список вариантов
         """
-        # Получаем уровень страха игрока
-        fear_level = self.game.player.fear_level
-
-
-        # Если уровень страха низкий, ничего не меняем
-        if fear_level < 30:
+        # Ниже высокой полосы страха ничего не меняем
+        if self.band < BAND_HIGH:
             return options
 
-        # Определяем вероятность появления ложного варианта
-        false_option_chance = (fear_level - 70) / 100.0
-
-        # Добавляем ложный вариант только при высоком уровне страха и по вероятности
-        if random.random () < false_option_chance:
+        # Ложный вариант появляется только при высоком уровне страха и по вероятности
+        false_option_chance = FALSE_OPTION_CHANCE[self.game.player.fear_level]
+        if false_option_chance > 0 and self.rng.random () < false_option_chance:
             false_option = self.get_false_option (scene)
             if false_option and false_option not in options:
                 # Добавляем ложный вариант в случайную позицию
-                position = random.randint (0, len (options))
+                position = self.rng.randint (0, len (options))
                 options.insert (position, false_option)
 
         return options
\ No newline at end of file
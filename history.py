@@ -0,0 +1,338 @@
+#!/usr/bin/env python
+"""
+Модуль сохранений и возврата на ход назад.
+Перед каждым ходом снимается неизменяемый снимок сессии. Снимок - это
+кортеж ссылок: коллекции (инвентарь, флаги, выбранные варианты по сценам)
+хранятся как tuple и frozenset, и если поле с прошлого снимка не
+изменилось, новый снимок ссылается на тот же объект. Выбранные варианты
+хранятся кортежем пар (сцена, маска), неизменившиеся пары тоже общие,
+поэтому снимок стоит примерно столько, сколько изменилось за ход.
+
+Состояние генератора случайных чисел (625 слов) в снимок не входит:
+при снятии снимка генератор переинициализируется 64-битным seed,
+взятым из него же, и в снимке хранится только этот seed. Прохождение
+с тем же seed сессии и теми же выборами остается воспроизводимым.
+После возврата или загрузки сессия совпадает со снимком, поэтому
+следующий ход использует его же, а не снимает новый: иначе генератор
+переинициализировался бы еще раз и ход пошел бы иначе, чем в первый раз.
+
+Старые снимки прореживаются политикой CompactionPolicy; сохранения в
+ячейках (/save) не прореживаются.
+
+Запуск бенчмарка:
+    python history.py --benchmark 1000
+"""
+import argparse
+import copy
+import random
+import time
+import tracemalloc
+from collections import namedtuple
+
+# Неизменяемый снимок сессии (engine.GameSession)
+Snapshot = namedtuple ('Snapshot', (
+    'seed', 'scene', 'selected', 'options', 'turns', 'turn_id', 'peak_fear', 'ending', 'finished',
+    'inventory', 'story_flags', 'fear', 'band_changes', 'found_photos', 'last_false_option',
+    'hallucinations', 'rng_seed',
+))
+
+
+def _share (previous, value):
+    """Значение из прошлого снимка, если оно не изменилось, иначе новое"""
+    return previous if previous == value else value
+
+
+def _share_pairs (previous, mapping):
+    """
+    Кортеж пар (ключ, значение) словаря; пары, не изменившиеся с прошлого снимка, общие
+
+    Args:
+        previous: Кортеж пар прошлого снимка или None
+        mapping: Текущий словарь
+
+    Returns:
+        tuple: Пары в порядке словаря
+    """
+    if previous is None:
+        return tuple (mapping.items ())
+    if len (previous) == len (mapping) and all (mapping.get (key) == value for key, value in previous):
+        return previous
+    pairs = {pair[0]: pair for pair in previous}
+    return tuple (
+        pairs[key] if key in pairs and pairs[key][1] == value else (key, value)
+        for key, value in mapping.items ()
+    )
+
+
+def capture (session, previous: Snapshot = None) -> Snapshot:
+    """
+    Снимает снимок сессии. Генератор случайных чисел игры переинициализируется
+
+    Args:
+        session: Игровая сессия
+        previous: Прошлый снимок этой сессии (его неизменившиеся поля используются повторно)
+
+    Returns:
+        Snapshot: Снимок
+    """
+    game = session.game
+    player = game.player
+    rng_seed = game.rng.getrandbits (64)
+    game.rng.seed (rng_seed)
+
+    if previous is None:
+        return Snapshot (
+            session.seed, session.scene, tuple (session.selected.items ()), tuple (session.options),
+            session.turns, session.turn_id, session.peak_fear, session.ending, session.finished,
+            tuple (player.inventory), frozenset (player.story_flags), player.fear.level,
+            player.fear.band_changes, game.found_photos, game.last_false_option,
+            tuple (game.hallucination_system.last_shown), rng_seed
+        )
+    return Snapshot (
+        session.seed, session.scene, _share_pairs (previous.selected, session.selected),
+        _share (previous.options, tuple (session.options)),
+        session.turns, session.turn_id, session.peak_fear, session.ending, session.finished,
+        _share (previous.inventory, tuple (player.inventory)),
+        _share (previous.story_flags, frozenset (player.story_flags)),
+        player.fear.level, player.fear.band_changes, game.found_photos, game.last_false_option,
+        _share (previous.hallucinations, tuple (game.hallucination_system.last_shown)), rng_seed
+    )
+
+
+def apply (snapshot: Snapshot, session):
+    """
+    Возвращает сессию в состояние снимка. Идентификатор хода не уменьшается:
+    по его скачку хранилище видит, что сессия изменилась не ходом (см. session_store.py)
+
+    Args:
+        snapshot: Снимок
+        session: Игровая сессия (той же или другой игры)
+    """
+    game = session.game
+    player = game.player
+    game.rng.seed (snapshot.rng_seed)
+    player.inventory = []
+    player.inventory_mask = 0
+    for item in snapshot.inventory:
+        player.add_to_inventory (item)
+    player.story_flags = set (snapshot.story_flags)
+    player.fear.set (snapshot.fear)
+    player.fear.band_changes = snapshot.band_changes
+    game.found_photos = snapshot.found_photos
+    game.last_false_option = snapshot.last_false_option
+    game.hallucination_system.last_shown = list (snapshot.hallucinations)
+
+    session.seed = snapshot.seed
+    session.scene = snapshot.scene
+    session.selected = dict (snapshot.selected)
+    session.options = list (snapshot.options)
+    session.turns = snapshot.turns
+    session.turn_id += 1
+    session.peak_fear = snapshot.peak_fear
+    session.ending = snapshot.ending
+    session.finished = snapshot.finished
+
+
+class CompactionPolicy:
+    """Какие снимки истории хранить"""
+
+    def __init__ (self, recent: int = 10, stride: int = 5, limit: int = 30):
+        """
+        Args:
+            recent: Сколько последних снимков хранить все подряд
+            stride: Из более старых хранится каждый stride-й ход (по turn_id)
+            limit: Больше снимков не хранится, самые старые удаляются
+        """
+        self.recent = recent
+        self.stride = max (1, stride)
+        self.limit = limit
+
+    def compact (self, snapshots):
+        """
+        Прореживает историю
+
+        Args:
+            snapshots: Снимки от старых к новым
+
+        Returns:
+            list: Оставленные снимки от старых к новым
+        """
+        if len (snapshots) <= self.recent:
+            return snapshots
+        split = len (snapshots) - self.recent
+        kept = [snapshot for snapshot in snapshots[:split] if snapshot.turn_id % self.stride == 0]
+        kept.extend (snapshots[split:])
+        return kept[-self.limit:]
+
+
+class SessionHistory:
+    """История ходов одной игры и ячейки сохранений игрока"""
+
+    def __init__ (self, policy: CompactionPolicy = None, slots: int = 3):
+        """
+        Args:
+            policy: Политика прореживания истории
+            slots: Количество ячеек сохранений
+        """
+        self.policy = policy or CompactionPolicy ()
+        self.max_slots = slots
+        self.snapshots = []  # от старых к новым
+        self.slots = {}  # номер ячейки -> снимок
+        self.resume = None  # снимок, в состоянии которого сессия после возврата или загрузки
+        self.saves = 0  # растет при каждой записи в ячейку (по нему видно, что ячейки изменились)
+
+    def record (self, session) -> Snapshot:
+        """Снимает снимок перед ходом"""
+        if self.resume is not None:
+            snapshot, self.resume = self.resume, None
+        else:
+            snapshot = capture (session, self.snapshots[-1] if self.snapshots else None)
+        self.snapshots.append (snapshot)
+        if len (self.snapshots) > self.policy.recent:
+            self.snapshots = self.policy.compact (self.snapshots)
+        return snapshot
+
+    def reset (self):
+        """Очищает историю ходов (ячейки сохранений остаются)"""
+        self.snapshots = []
+        self.resume = None
+
+    def rewind (self, session) -> bool:
+        """
+        Возвращает сессию на ход назад (на последний оставшийся снимок)
+
+        Returns:
+            bool: False, если возвращаться некуда
+        """
+        if not self.snapshots:
+            return False
+        self.resume = self.snapshots.pop ()
+        apply (self.resume, session)
+        return True
+
+    def save (self, slot: int, session):
+        """
+        Сохраняет сессию в ячейку
+
+        Raises:
+            ValueError: Если номер ячейки вне диапазона 1..slots
+        """
+        if not 1 <= slot <= self.max_slots:
+            raise ValueError (f"Ячейка {slot} вне диапазона 1..{self.max_slots}")
+        if self.resume is None:
+            self.resume = capture (session, self.snapshots[-1] if self.snapshots else None)
+        self.slots[slot] = self.resume
+        self.saves += 1
+
+    def load (self, slot: int, session) -> bool:
+        """
+        Загружает сохранение из ячейки. История ходов при этом очищается
+
+        Returns:
+            bool: False, если ячейка пуста
+        """
+        snapshot = self.slots.get (slot)
+        if snapshot is None:
+            return False
+        apply (snapshot, session)
+        self.reset ()
+        self.resume = snapshot
+        return True
+
+    def get_stats (self):
+        """Возвращает размер истории"""
+        return {
+            'snapshots': len (self.snapshots),
+            'slots': len (self.slots),
+        }
+
+
+# Ограничение длины прохождения в бенчмарке (переход "Продолжить" может зациклиться)
+MAX_TURNS = 200
+
+
+def _play (engine, games, seed, record):
+    """Играет games прохождений случайными вариантами, вызывая record (session) перед каждым ходом"""
+    from engine import CONTINUE_OPTION
+
+    rng = random.Random (seed)
+    for number in range (games):
+        session = engine.new_session (seed + number)
+        while not session.finished and session.turn_id < MAX_TURNS:
+            record (session)
+            option_id = CONTINUE_OPTION if session.exhausted else rng.randrange (len (session.options))
+            engine.step (session, option_id)
+    return session
+
+
+def benchmark (games, seed=1):
+    """Память снимка при структурном разделении в сравнении с копированием состояния на каждом ходу"""
+    from engine import GameEngine
+
+    engine = GameEngine ()
+    unlimited = CompactionPolicy (recent=10 ** 9, limit=10 ** 9)
+
+    history = SessionHistory (unlimited)
+    tracemalloc.start ()
+    _play (engine, 1, seed, lambda session: None)  # прогрев кэшей игры
+    baseline, _ = tracemalloc.get_traced_memory ()
+    _play (engine, games, seed, history.record)
+    memory, _ = tracemalloc.get_traced_memory ()
+    tracemalloc.stop ()
+    count = len (history.snapshots)
+    shared = (memory - baseline) / count
+
+    # Для сравнения: копии инвентаря, флагов, отношений, выбранных вариантов и генератора
+    copies = []
+
+    def deep_copy (session):
+        player = session.game.player
+        copies.append ((copy.deepcopy (player.inventory), copy.deepcopy (player.story_flags),
+                        copy.deepcopy (player.relationships), copy.deepcopy (session.selected),
+                        session.game.rng.getstate ()))
+
+    tracemalloc.start ()
+    _play (engine, 1, seed, lambda session: None)
+    baseline, _ = tracemalloc.get_traced_memory ()
+    _play (engine, games, seed, deep_copy)
+    memory, _ = tracemalloc.get_traced_memory ()
+    tracemalloc.stop ()
+    deep = (memory - baseline) / len (copies)
+
+    # Время хода со снимком и возврата по всей истории
+    history = SessionHistory (unlimited)
+    started = time.perf_counter ()
+    session = _play (engine, games, seed, history.record)
+    play_time = time.perf_counter () - started
+    started = time.perf_counter ()
+    rewinds = 0
+    while history.rewind (session):
+        rewinds += 1
+    rewind_time = time.perf_counter () - started
+
+    started = time.perf_counter ()
+    _play (engine, games, seed, lambda session: None)
+    bare_time = time.perf_counter () - started
+
+    print (f"Прохождений: {games}, снимков: {count}")
+    print (f"Снимок с разделением: {shared:.0f} байт, копия состояния: {deep:.0f} байт")
+    print (f"Ход: {bare_time * 1e6 / count:.1f} мкс, со снимком: {play_time * 1e6 / count:.1f} мкс, "
+           f"возврат: {rewind_time * 1e6 / rewinds:.1f} мкс")
+
+    policy = CompactionPolicy ()
+    history = SessionHistory (policy)
+    _play (engine, 1, seed, history.record)
+    print (f"Политика по умолчанию (recent={policy.recent}, stride={policy.stride}, limit={policy.limit}): "
+           f"{len (history.snapshots)} снимков после прохождения")
+
+
+def main ():
+    parser = argparse.ArgumentParser (description="Бенчмарк памяти снимков истории")
+    parser.add_argument ('--benchmark', type=int, default=1000, metavar='GAMES')
+    parser.add_argument ('--seed', type=int, default=1)
+    args = parser.parse_args ()
+    benchmark (args.benchmark, args.seed)
+
+
+if __name__ == '__main__':
+    main ()
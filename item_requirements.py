@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+"""
+Модуль с требованиями вариантов действий к предметам инвентаря.
+Требования объявлены заранее для каждой пары (сцена, индекс варианта)
+и хранятся в виде битовых масок, поэтому проверка замка - это одна операция AND.
+Индекс варианта - его позиция в списке вариантов сцены до вставки ложных
+вариантов: показанный список может быть сдвинут галлюцинацией, поэтому
+показанные позиции переводятся в исходные (см. GameSession.option_ids).
+"""
+
+# Все предметы, которые игрок может получить по ходу сюжета.
+# Позиция предмета в кортеже определяет его бит в маске инвентаря.
+ITEMS = (
+    "ключ",
+    "страница дневника",
+    "ключ от библиотеки",
+    "журнал эксперимента",
+    "книга об истории больницы",
+    "медицинская карта",
+    "семейное фото",
+)
+
+ITEM_BITS = {item: 1 << position for position, item in enumerate (ITEMS)}
+
+# Предметы, необходимые для вариантов действий: (сцена, исходный индекс варианта) -> предметы
+OPTION_REQUIREMENTS = {
+    ('room_with_portrait', 1): ("ключ",),  # Проверить ящик письменного стола
+    ('room_with_portrait', 2): ("ключ",),  # Попытаться открыть дверь
+    ('library', 0): ("ключ от библиотеки",),
+    ('library', 1): ("ключ от библиотеки",),
+    ('library', 2): ("ключ от библиотеки",),
+}
+
+
+def item_bit (item):
+    """Возвращает бит предмета (0 для предметов вне каталога)"""
+    return ITEM_BITS.get (item, 0)
+
+
+def items_mask (items):
+    """
+    Собирает битовую маску из набора предметов
+
+    Args:
+        items: Итерируемый набор названий предметов
+
+    Returns:
+        int: Битовая маска предметов
+    """
+    mask = 0
+    for item in items:
+        mask |= item_bit (item)
+    return mask
+
+
+class RequirementsIndex:
+    """Предвычисленный индекс требований вариантов действий к предметам"""
+
+    def __init__ (self, requirements=None):
+        """
+        Инициализация индекса
+
+        Args:
+            requirements: Словарь (сцена, индекс варианта) -> предметы.
+                По умолчанию используется OPTION_REQUIREMENTS
+        """
+        if requirements is None:
+            requirements = OPTION_REQUIREMENTS
+
+        # (сцена, индекс) -> маска требуемых предметов
+        self.required = {
+            key: items_mask (items)
+            for key, items in requirements.items ()
+        }
+
+        # Сцена -> кортеж пар (индекс, маска), чтобы не перебирать весь индекс
+        by_scene = {}
+        for (scene, option_id), mask in self.required.items ():
+            by_scene.setdefault (scene, []).append ((option_id, mask))
+        self.by_scene = {scene: tuple (entries) for scene, entries in by_scene.items ()}
+
+    def required_mask (self, scene, option_id):
+        """Маска предметов, необходимых для варианта"""
+        return self.required.get ((scene, option_id), 0)
+
+    def is_locked (self, scene, option_id, inventory_mask):
+        """
+        Проверяет, заблокирован ли вариант из-за отсутствующих предметов
+
+        Args:
+            scene: Текущая сцена
+            option_id: Исходный индекс варианта (-1 - ложный вариант, он не закрыт)
+            inventory_mask: Маска инвентаря игрока
+
+        Returns:
+            bool: True, если каких-то предметов не хватает
+        """
+        return bool (self.required.get ((scene, option_id), 0) & ~inventory_mask)
+
+    def locked_mask (self, scene, inventory_mask, option_ids=None):
+        """
+        Возвращает маску заблокированных вариантов сцены
+
+        Args:
+            scene: Сцена
+            inventory_mask: Маска инвентаря игрока
+            option_ids: Исходные индексы показанных вариантов (-1 - ложный вариант).
+                Если заданы, маска строится по показанным позициям
+
+        Returns:
+            int: Бит i установлен, если вариант i недоступен
+        """
+        locked = 0
+        for option_id, mask in self.by_scene.get (scene, ()):
+            if mask & ~inventory_mask:
+                locked |= 1 << option_id
+        if option_ids is None or not locked:
+            return locked
+
+        shown = 0
+        for position, option_id in enumerate (option_ids):
+            if option_id >= 0 and (locked >> option_id) & 1:
+                shown |= 1 << position
+        return shown
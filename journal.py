@@ -0,0 +1,227 @@
+#!/usr/bin/env python
+"""
+Модуль журнала ходов.
+Журнал - каталог сегментов 00000001.log, 00000002.log, ... Запись в
+сегмент идет кадрами: длина и CRC32 содержимого, затем записи. Кадр -
+единица группового подтверждения: все записи, накопившиеся за интервал,
+дописываются одной операцией write и одним fsync. При чтении кадр с
+неполной длиной или неверной контрольной суммой считается оборванным
+сбоем, и чтение сегмента на нем заканчивается.
+
+Записи:
+    ход: пользователь, turn_id до хода, индекс варианта, seed генератора хода
+    ввод: пользователь, turn_id до хода, seed генератора хода, текст
+    состояние: пользователь, сериализованное состояние игрока целиком
+    граница: обработанные update_id (см. session_store.ProcessedUpdates)
+Ход занимает 23 байта: сам результат хода не пишется, при восстановлении
+он повторяется движком с тем же seed.
+"""
+import os
+import struct
+import zlib
+
+# Типы записей
+RECORD_STEP = 1
+RECORD_INPUT = 2
+RECORD_STATE = 3
+RECORD_PROGRESS = 4
+
+_FRAME = struct.Struct ('<II')  # длина содержимого, CRC32
+_STEP = struct.Struct ('<BqIhQ')  # тип, пользователь, turn_id, вариант, seed
+_INPUT = struct.Struct ('<BqIQI')  # тип, пользователь, turn_id, seed, длина текста
+_STATE = struct.Struct ('<BqI')  # тип, пользователь, длина состояния
+_PROGRESS = struct.Struct ('<BqI')  # тип, граница, количество id выше границы
+_ID = struct.Struct ('<q')
+
+SEGMENT_SUFFIX = '.log'
+
+
+def encode_step (user_id, turn_id, option_id, rng_seed) -> bytes:
+    """Запись хода выбором варианта"""
+    return _STEP.pack (RECORD_STEP, user_id, turn_id, option_id, rng_seed)
+
+
+def encode_input (user_id, turn_id, rng_seed, text) -> bytes:
+    """Запись хода произвольным текстом"""
+    data = text.encode ('utf-8')
+    return _INPUT.pack (RECORD_INPUT, user_id, turn_id, rng_seed, len (data)) + data
+
+
+def encode_state (user_id, state: bytes) -> bytes:
+    """Запись полного состояния игрока"""
+    return _STATE.pack (RECORD_STATE, user_id, len (state)) + state
+
+
+def encode_progress (high_water, recent) -> bytes:
+    """Запись границы обработанных обновлений"""
+    return _PROGRESS.pack (RECORD_PROGRESS, high_water, len (recent)) + b''.join (
+        _ID.pack (update_id) for update_id in sorted (recent)
+    )
+
+
+def decode (payload: bytes):
+    """
+    Разбирает записи кадра
+
+    Yields:
+        tuple: (RECORD_STEP, пользователь, turn_id, вариант, seed),
+            (RECORD_INPUT, пользователь, turn_id, seed, текст),
+            (RECORD_STATE, пользователь, состояние),
+            (RECORD_PROGRESS, граница, множество id выше границы)
+    """
+    view = memoryview (payload)
+    offset = 0
+    while offset < len (view):
+        kind = view[offset]
+        if kind == RECORD_STEP:
+            _, user_id, turn_id, option_id, rng_seed = _STEP.unpack_from (view, offset)
+            offset += _STEP.size
+            yield RECORD_STEP, user_id, turn_id, option_id, rng_seed
+        elif kind == RECORD_INPUT:
+            _, user_id, turn_id, rng_seed, length = _INPUT.unpack_from (view, offset)
+            offset += _INPUT.size
+            yield RECORD_INPUT, user_id, turn_id, rng_seed, bytes (view[offset:offset + length]).decode ('utf-8')
+            offset += length
+        elif kind == RECORD_STATE:
+            _, user_id, length = _STATE.unpack_from (view, offset)
+            offset += _STATE.size
+            yield RECORD_STATE, user_id, bytes (view[offset:offset + length])
+            offset += length
+        elif kind == RECORD_PROGRESS:
+            _, high_water, count = _PROGRESS.unpack_from (view, offset)
+            offset += _PROGRESS.size
+            recent = {_ID.unpack_from (view, offset + index * _ID.size)[0] for index in range (count)}
+            offset += count * _ID.size
+            yield RECORD_PROGRESS, high_water, recent
+        else:
+            raise ValueError (f"Неизвестный тип записи {kind} на смещении {offset}")
+
+
+class Journal:
+    """Сегментированный журнал с групповым подтверждением кадров"""
+
+    def __init__ (self, directory: str, segment_bytes: int = 8 * 1024 * 1024, fsync: bool = True):
+        """
+        Args:
+            directory: Каталог сегментов
+            segment_bytes: Размер, после которого начинается новый сегмент
+            fsync: Вызывать fsync после каждого кадра
+        """
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.fsync = fsync
+        self.active = None  # номер сегмента, в который идет запись
+        self.file = None
+
+        # Счетчики
+        self.frames = 0
+        self.bytes_written = 0
+        self.syncs = 0
+
+    def path (self, number: int) -> str:
+        """Путь к сегменту"""
+        return os.path.join (self.directory, f"{number:08d}{SEGMENT_SUFFIX}")
+
+    def segments (self):
+        """Номера существующих сегментов по возрастанию"""
+        if not os.path.isdir (self.directory):
+            return []
+        return sorted (
+            int (name[:-len (SEGMENT_SUFFIX)]) for name in os.listdir (self.directory)
+            if name.endswith (SEGMENT_SUFFIX) and name[:-len (SEGMENT_SUFFIX)].isdigit ()
+        )
+
+    def open (self, after: int = 0):
+        """
+        Начинает запись в новый сегмент (оборванный хвост старых сегментов не дописывается)
+
+        Args:
+            after: Номер, больше которого должен быть новый сегмент
+        """
+        os.makedirs (self.directory, exist_ok=True)
+        self.active = max ([after] + self.segments ()) + 1
+        self.file = open (self.path (self.active), 'ab')
+
+    def close (self):
+        """Закрывает текущий сегмент (пустой сегмент удаляется)"""
+        if self.file is not None:
+            empty = self.file.tell () == 0
+            self.file.close ()
+            self.file = None
+            if empty:
+                self.remove ([self.active])
+
+    def roll (self) -> int:
+        """
+        Закрывает текущий сегмент и начинает следующий
+
+        Returns:
+            int: Номер закрытого сегмента
+        """
+        sealed = self.active
+        self.close ()
+        self.active += 1
+        self.file = open (self.path (self.active), 'ab')
+        return sealed
+
+    def append (self, records):
+        """
+        Дописывает кадр из записей одной операцией и подтверждает его fsync.
+        При ошибке недописанный кадр обрезается, чтобы не обрывать следующие
+
+        Args:
+            records: Закодированные записи (encode_*)
+        """
+        payload = b''.join (records)
+        frame = _FRAME.pack (len (payload), zlib.crc32 (payload)) + payload
+        position = self.file.tell ()
+        try:
+            self.file.write (frame)
+            self.file.flush ()
+            if self.fsync:
+                os.fsync (self.file.fileno ())
+                self.syncs += 1
+        except OSError:
+            self.file.truncate (position)
+            self.file.seek (position)
+            raise
+        self.frames += 1
+        self.bytes_written += len (frame)
+        if self.file.tell () >= self.segment_bytes:
+            self.roll ()
+
+    def read (self, number: int):
+        """
+        Читает кадры сегмента до конца или до оборванного кадра
+
+        Yields:
+            bytes: Содержимое кадра
+        """
+        with open (self.path (number), 'rb') as segment:
+            data = segment.read ()
+        offset = 0
+        while offset + _FRAME.size <= len (data):
+            length, checksum = _FRAME.unpack_from (data, offset)
+            start = offset + _FRAME.size
+            payload = data[start:start + length]
+            if len (payload) < length or zlib.crc32 (payload) != checksum:
+                return
+            yield payload
+            offset = start + length
+
+    def remove (self, numbers):
+        """Удаляет сегменты (после того как они свернуты в снимок)"""
+        for number in numbers:
+            try:
+                os.remove (self.path (number))
+            except FileNotFoundError:
+                pass
+
+    def get_stats (self):
+        """Возвращает счетчики журнала"""
+        return {
+            'active_segment': self.active,
+            'frames': self.frames,
+            'bytes': self.bytes_written,
+            'syncs': self.syncs,
+        }
@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+"""
+Модуль блокировок по ключу.
+Обновления одного чата выполняются строго по очереди, разные чаты -
+параллельно. Блокировка создается при первом обращении к ключу и
+удаляется, как только ее никто не держит и не ждет, поэтому память
+зависит от числа чатов с обновлениями в обработке, а не от числа всех чатов.
+"""
+import asyncio
+import functools
+import time
+from contextlib import asynccontextmanager
+
+
+class _Entry:
+    """Блокировка ключа и количество корутин, которые ее держат или ждут"""
+
+    __slots__ = ('lock', 'users')
+
+    def __init__ (self):
+        self.lock = asyncio.Lock ()
+        self.users = 0
+
+
+class KeyedLockManager:
+    """Менеджер блокировок по ключу с метриками ожидания"""
+
+    def __init__ (self):
+        self.entries = {}
+
+        # Метрики
+        self.acquisitions = 0
+        self.contended = 0  # сколько раз блокировка уже была занята
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.created = 0
+        self.reclaimed = 0
+        self.peak_active = 0
+
+    @asynccontextmanager
+    async def lock (self, key):
+        """
+        Удерживает блокировку ключа на время блока async with
+
+        Args:
+            key: Ключ (например, идентификатор чата)
+        """
+        entry = self.entries.get (key)
+        if entry is None:
+            entry = self.entries[key] = _Entry ()
+            self.created += 1
+            self.peak_active = max (self.peak_active, len (self.entries))
+        entry.users += 1
+
+        try:
+            if entry.lock.locked ():
+                self.contended += 1
+                started = time.perf_counter ()
+                await entry.lock.acquire ()
+                wait = time.perf_counter () - started
+                self.total_wait += wait
+                self.max_wait = max (self.max_wait, wait)
+            else:
+                await entry.lock.acquire ()
+            self.acquisitions += 1
+
+            try:
+                yield
+            finally:
+                entry.lock.release ()
+        finally:
+            # Последний пользователь удаляет блокировку
+            entry.users -= 1
+            if entry.users == 0 and self.entries.get (key) is entry:
+                del self.entries[key]
+                self.reclaimed += 1
+
+    def serialize (self, callback, key=None):
+        """
+        Оборачивает обработчик так, чтобы обновления с одним ключом выполнялись по очереди
+
+        Args:
+            callback: Асинхронный обработчик (update, context)
+            key: Функция update -> ключ. По умолчанию идентификатор чата
+
+        Returns:
+            callable: Обернутый обработчик
+        """
+        key = key or _chat_key
+
+        @functools.wraps (callback)
+        async def wrapper (update, context):
+            async with self.lock (key (update)):
+                return await callback (update, context)
+
+        return wrapper
+
+    def get_stats (self):
+        """Возвращает метрики блокировок"""
+        return {
+            'active': len (self.entries),
+            'peak_active': self.peak_active,
+            'acquisitions': self.acquisitions,
+            'contended': self.contended,
+            'avg_wait_ms': self.total_wait * 1000 / self.contended if self.contended else 0.0,
+            'max_wait_ms': self.max_wait * 1000,
+            'created': self.created,
+            'reclaimed': self.reclaimed,
+        }
+
+
+def _chat_key (update):
+    """Ключ по умолчанию: идентификатор чата (или пользователя, если чата нет)"""
+    if update.effective_chat is not None:
+        return update.effective_chat.id
+    if update.effective_user is not None:
+        return update.effective_user.id
+    return None
@@ -0,0 +1,177 @@
+#!/usr/bin/env python
+"""
+Модуль плавной остановки бота.
+По SIGTERM или SIGINT бот перестает получать новые обновления, дает
+начатым ходам (с их задержками и отправкой сообщений) закончиться
+до крайнего срока и только потом останавливает Application, который
+сохраняет данные сессий и вызывает post_shutdown (запись событий и
+статистики). Ходы, не успевшие закончиться, прерываются и учитываются
+как брошенные. Повторный сигнал прерывает ожидание сразу.
+
+Обработчик выполняется в отдельной задаче, и прерывается только она:
+задача обновления в Application должна завершиться штатно, иначе
+update_queue.task_done не будет вызван и Application.stop зависнет.
+"""
+import asyncio
+import functools
+import logging
+import signal
+import time
+
+logger = logging.getLogger (__name__)
+
+# Сигналы остановки
+STOP_SIGNALS = (signal.SIGINT, signal.SIGTERM)
+
+
+class LifecycleManager:
+    """Учет обрабатываемых обновлений и плавная остановка"""
+
+    def __init__ (self, timeout: float = 20.0):
+        """
+        Args:
+            timeout: Сколько секунд ждать завершения начатых ходов после сигнала остановки
+        """
+        self.timeout = timeout
+        self.tasks = set ()  # задачи обработчиков в обработке
+        self.abandoned_tasks = set ()
+        self.background = set ()  # фоновые задачи, которые отменяются после остановки
+        self.draining = False
+        self.drain_task = None
+        self.forced = None
+
+        # Счетчики
+        self.started = 0
+        self.completed = 0
+        self.in_flight_at_stop = 0
+        self.drained = 0
+        self.abandoned = 0
+        self.drain_time = 0.0
+
+    def track (self, callback):
+        """
+        Оборачивает обработчик так, чтобы остановка дожидалась его завершения
+
+        Args:
+            callback: Асинхронный обработчик (update, context)
+
+        Returns:
+            callable: Обернутый обработчик
+        """
+
+        @functools.wraps (callback)
+        async def wrapper (update, context):
+            task = asyncio.ensure_future (callback (update, context))
+            self.tasks.add (task)
+            self.started += 1
+            try:
+                result = await task
+            except asyncio.CancelledError:
+                if task not in self.abandoned_tasks:
+                    raise
+                # Ход прерван при остановке: обновление считается обработанным
+                self.abandoned_tasks.discard (task)
+                return None
+            finally:
+                self.tasks.discard (task)
+            self.completed += 1
+            if self.draining:
+                self.drained += 1
+            return result
+
+        return wrapper
+
+    def add_background (self, task):
+        """Регистрирует фоновую задачу, которую нужно отменить при остановке"""
+        self.background.add (task)
+        task.add_done_callback (self.background.discard)
+        return task
+
+    def install (self, application, signals=STOP_SIGNALS):
+        """
+        Устанавливает обработчики сигналов остановки в текущем цикле событий
+
+        Args:
+            application: Экземпляр telegram.ext.Application
+            signals: Сигналы остановки
+
+        Returns:
+            bool: False, если цикл событий не поддерживает обработчики сигналов
+        """
+        loop = asyncio.get_running_loop ()
+        try:
+            for sig in signals:
+                loop.add_signal_handler (sig, self.request_stop, application)
+        except NotImplementedError:
+            logger.warning ("Обработчики сигналов не поддерживаются: плавная остановка недоступна")
+            return False
+        return True
+
+    def request_stop (self, application):
+        """Первый сигнал начинает плавную остановку, повторный прерывает ожидание"""
+        if self.drain_task is None:
+            logger.info ("Получен сигнал остановки, завершаем начатые ходы (до %g с)", self.timeout)
+            self.drain_task = asyncio.get_running_loop ().create_task (self.drain (application))
+        else:
+            logger.warning ("Повторный сигнал остановки: прерываем оставшиеся ходы")
+            self.forced.set ()
+
+    async def drain (self, application):
+        """
+        Останавливает прием обновлений, ждет начатые ходы до крайнего срока,
+        прерывает оставшиеся и останавливает Application
+
+        Args:
+            application: Экземпляр telegram.ext.Application
+        """
+        self.draining = True
+        self.forced = asyncio.Event ()
+        started = time.monotonic ()
+        deadline = started + self.timeout
+        self.in_flight_at_stop = len (self.tasks)
+
+        # Новые обновления больше не запрашиваются; уже полученные обрабатываются как обычно
+        if application.updater is not None and application.updater.running:
+            await application.updater.stop ()
+
+        forced = asyncio.ensure_future (self.forced.wait ())
+        try:
+            while self.tasks and not self.forced.is_set ():
+                remaining = deadline - time.monotonic ()
+                if remaining <= 0:
+                    break
+                await asyncio.wait (self.tasks | {forced}, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            forced.cancel ()
+
+        # Не успевшие закончиться ходы прерываем
+        abandoned = list (self.tasks)
+        for task in abandoned:
+            self.abandoned_tasks.add (task)
+            task.cancel ()
+        await asyncio.gather (*abandoned, return_exceptions=True)
+        self.abandoned += len (abandoned)
+
+        for task in list (self.background):
+            task.cancel ()
+        await asyncio.gather (*self.background, return_exceptions=True)
+
+        self.drain_time = time.monotonic () - started
+        logger.info ("Остановка: ходов в обработке %d, завершено %d, прервано %d за %.2f с",
+                     self.in_flight_at_stop, self.drained, self.abandoned, self.drain_time)
+
+        # Application.stop сохранит данные сессий, затем будет вызван post_shutdown
+        application.stop_running ()
+
+    def get_stats (self):
+        """Возвращает счетчики обработки и остановки"""
+        return {
+            'started': self.started,
+            'completed': self.completed,
+            'in_flight': len (self.tasks),
+            'in_flight_at_stop': self.in_flight_at_stop,
+            'drained': self.drained,
+            'abandoned': self.abandoned,
+            'drain_seconds': round (self.drain_time, 3),
+            'forced': self.forced is not None and self.forced.is_set (),
+        }
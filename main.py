@@ -1,19 +1,10 @@
 #!/usr/bin/env python
+import asyncio
 import logging
-from telegram.ext import (
-    Application,
-    CommandHandler,
-    MessageHandler,
-    CallbackQueryHandler,
-    filters,
-    ConversationHandler
-)
+import os
 
 from config import Config
-from game_logic import GameLogic
-from game_states import GameState
-from telegram_ui import TelegramUI
-from bot_handlers import BotHandlers
+from startup import StartupTimer
 
 # Настройка логирования
 logging.basicConfig (
@@ -23,12 +14,21 @@ logging.basicConfig (
 logger = logging.getLogger (__name__)
 
 
+def create_engine ():
+    """Создает игровой движок. Импорт и загрузка контента откладываются до первого вызова"""
+    from content_snapshot import load_content
+    from engine import GameEngine
+    return GameEngine (content=load_content ())
+
+
 def main () -> None:
     """Запуск бота"""
+    timer = StartupTimer ()
     print ("Инициализация бота...")
 
-    # Загрузка токена
-    TOKEN = Config.load_token ()
+    # Загрузка токена (до тяжелых импортов, чтобы без токена сразу завершиться)
+    with timer.phase ("загрузка токена"):
+        TOKEN = Config.load_token ()
     if not TOKEN:
         print ("ОШИБКА: Токен не найден или пустой!")
         exit (1)
@@ -36,40 +36,233 @@ def main () -> None:
         # Показываем только первые и последние 5 символов токена для безопасности
         print (f"Токен загружен: {TOKEN[:5]}...{TOKEN[-5:]}")
 
-    # Инициализация компонентов
-    game = GameLogic ()
-    ui = TelegramUI ()
-    handlers = BotHandlers (game, ui)
+    with timer.phase ("импорт модулей"):
+        from telegram.ext import (
+            Application,
+            CommandHandler,
+            MessageHandler,
+            CallbackQueryHandler,
+            AIORateLimiter,
+            TypeHandler,
+            filters
+        )
+        from telegram import Update
+
+        from telegram_ui import TelegramUI
+        from bot_handlers import BotHandlers
+        from prefetch import MediaPrefetcher
+        from analytics import EndingStats
+        from events import EventStream
+        from keyed_lock import KeyedLockManager
+        from dedup import CallbackDeduplicator
+        from transport import create_requests
+        from lifecycle import LifecycleManager
+        from ambient import AmbientScheduler
+        from admission import AdmissionController
+        from session_store import SessionStore, StoredApplication
+        from history import CompactionPolicy
+
+    # Инициализация компонентов (игровой движок создается при первом обращении)
+    with timer.phase ("инициализация компонентов"):
+        ui = TelegramUI ()
+        # Изображения готовятся при запуске; прогрев заранее получает file_id через служебный чат
+        cache_chat_id = Config.get_int ('MEDIA_CACHE_CHAT_ID')
+        if cache_chat_id is not None:
+            prefetcher = MediaPrefetcher (
+                ui.images,
+                cache_chat_id,
+                concurrency=Config.get_int ('MEDIA_PREFETCH_CONCURRENCY', 2)
+            )
+        else:
+            prefetcher = None
+            logger.warning ("MEDIA_CACHE_CHAT_ID не задан: прогрев изображений выключен, "
+                            "первая отправка каждого изображения загружает его байты")
+        stats = EndingStats (path=os.environ.get ('RANOVELL_STATS_FILE', 'stats.json'))
+        stats.load ()
+        events = EventStream (
+            directory=os.environ.get ('RANOVELL_EVENTS_DIR', 'events'),
+            capacity=Config.get_int ('RANOVELL_EVENTS_CAPACITY', 10000),
+            policy=os.environ.get ('RANOVELL_EVENTS_POLICY', 'drop')
+        )
+        # История ходов для /back прореживается: последние ходы подряд, старше - каждый stride-й
+        history_policy = CompactionPolicy (
+            recent=Config.get_int ('RANOVELL_HISTORY_RECENT', 10),
+            stride=Config.get_int ('RANOVELL_HISTORY_STRIDE', 5),
+            limit=Config.get_int ('RANOVELL_HISTORY_LIMIT', 30)
+        )
+        handlers = BotHandlers (create_engine, ui, prefetcher, stats, events, history_policy,
+                                save_slots=Config.get_int ('RANOVELL_SAVE_SLOTS', 3))
+
+        # Остановка дожидается начатых ходов (RANOVELL_DRAIN_TIMEOUT секунд)
+        lifecycle = LifecycleManager (timeout=Config.get_float ('RANOVELL_DRAIN_TIMEOUT', 20.0))
+
+        # Сессии игроков и обработанные update_id переживают перезапуск: ходы пишутся в журнал,
+        # контрольные точки сворачивают его в базу снимков
+        store = SessionStore (
+            os.environ.get ('RANOVELL_DB', 'sessions.db'),
+            os.environ.get ('RANOVELL_JOURNAL_DIR', 'journal'),
+            export=handlers.export_user_data,
+            restore=handlers.restore_user_data,
+            replay=handlers.replay_turn,
+            key=handlers.journal_key,
+            segment_bytes=Config.get_int ('RANOVELL_JOURNAL_SEGMENT_BYTES', 8 * 1024 * 1024),
+            fsync=bool (Config.get_int ('RANOVELL_JOURNAL_FSYNC', 1)),
+            max_resident=Config.get_int ('RANOVELL_RESIDENT_PLAYERS', 10000)
+        )
+        store.open ()
+
+        # Ограничение входящих обновлений на пользователя (до игровой логики и отправки);
+        # отложенное обновление не считается обработанным, пока не вернется в очередь
+        admission = AdmissionController (
+            rate=Config.get_float ('RANOVELL_FLOOD_RATE', 1.0),
+            burst=Config.get_int ('RANOVELL_FLOOD_BURST', 5),
+            policy=os.environ.get ('RANOVELL_FLOOD_POLICY', 'coalesce'),
+            on_defer=store.defer,
+            on_discard=store.discard
+        )
+
+        # Шепот призраков и реплики доктора для бездействующих игроков
+        ambient = AmbientScheduler (
+            handlers.styles,
+            tick=Config.get_float ('RANOVELL_AMBIENT_TICK', 1.0),
+            per_tick=Config.get_int ('RANOVELL_AMBIENT_PER_TICK', 25)
+        )
+
+        # Обновления одного чата обрабатываются по очереди, разных чатов - параллельно;
+        # действие игрока переставляет его таймер фонового события, а состояние
+        # игрока загружается из хранилища до хода и снимается после него
+        locks = KeyedLockManager ()
+
+        def serialize (callback):
+            return locks.serialize (ambient.watch (store.track (callback), session=handlers.session))
+
+        start = lifecycle.track (serialize (handlers.start))
+        begin_game = lifecycle.track (serialize (handlers.begin_game))
+        help_command = lifecycle.track (serialize (handlers.help_command))
+        quit_command = lifecycle.track (serialize (handlers.quit_command))
+        save_command = lifecycle.track (serialize (handlers.save_command))
+        load_command = lifecycle.track (serialize (handlers.load_command))
+        back_command = lifecycle.track (serialize (handlers.back_command))
+        handle_message = lifecycle.track (serialize (handlers.handle_message))
+        stats_command = lifecycle.track (handlers.stats_command)
+
+        # Нажатия кнопок из старых сообщений и повторные нажатия отбрасываются до ожидания блокировки чата
+        dedup = CallbackDeduplicator (
+            capacity=Config.get_int ('RANOVELL_DEDUP_CAPACITY', 10000),
+            ttl=Config.get_int ('RANOVELL_DEDUP_TTL', 30)
+        )
+        # Нажатия кнопок направляются по таблице действий из данных кнопки
+        router = handlers.build_router ()
+        handle_callback = lifecycle.track (dedup.guard (
+            serialize (router.dispatch),
+            buttons_message=handlers.buttons_message
+        ))
+
+    async def post_init (application: Application) -> None:
+        """Подготовка изображений сцен в пуле потоков до начала обработки обновлений"""
+        with timer.phase ("подготовка изображений"):
+            await ui.images.prepare_async ()
+        for path, sizes in ui.images.get_stats ().items ():
+            logger.info ("Изображение %s: %d -> %d байт (превью %d байт)",
+                         path, sizes['original'], sizes['optimized'], sizes['preview'])
+        logger.info (timer.report ())
+
+        # Хвост журнала после сбоя сворачивается до начала опроса, не занимая цикл событий
+        loop = asyncio.get_running_loop ()
+        await loop.run_in_executor (None, store.recover)
+
+        # Собираем игровой движок в фоне, чтобы первый игрок не ждал
+        loop.run_in_executor (None, lambda: handlers.engine)
+
+        # Запускаем фоновую запись событий
+        events.start ()
+
+        # Фоновые задачи создаются в цикле событий, а не через Application.create_task: приложение
+        # еще не запущено, и PTB не ждал бы их. Остановкой задач управляет lifecycle
+
+        # Периодически сохраняем статистику прохождений
+        lifecycle.add_background (loop.create_task (
+            stats.run_flusher (Config.get_int ('RANOVELL_STATS_FLUSH_INTERVAL', 60))
+        ))
+
+        # Групповое подтверждение журнала вместе с границей обработанных обновлений и контрольные точки
+        lifecycle.add_background (loop.create_task (
+            store.run_flusher (
+                Config.get_float ('RANOVELL_DB_FLUSH_INTERVAL', 0.05),
+                Config.get_float ('RANOVELL_CHECKPOINT_INTERVAL', 300.0)
+            )
+        ))
+
+        # Возврат отложенных лишних обновлений в очередь
+        lifecycle.add_background (loop.create_task (admission.run (application)))
+
+        # Фоновые события игрокам
+        if Config.get_int ('RANOVELL_AMBIENT', 1):
+            lifecycle.add_background (loop.create_task (ambient.run (application.bot)))
+
+        # SIGTERM/SIGINT обрабатывает менеджер остановки, а не Application
+        lifecycle.install (application)
+
+    async def post_shutdown (application: Application) -> None:
+        """Сохранение статистики и событий при остановке"""
+        await events.stop ()
+        logger.info ("Остановка: %s", lifecycle.get_stats ())
+        logger.info ("Фоновые события: %s", ambient.get_stats ())
+        logger.info ("Прием обновлений: %s", admission.get_stats ())
+        await store.close ()
+        logger.info ("Хранилище сессий: %s", store.get_stats ())
+        logger.info ("События: %s", events.get_stats ())
+        logger.info ("Блокировки чатов: %s", locks.get_stats ())
+        logger.info ("Повторные нажатия: %s", dedup.get_stats ())
+        logger.info ("Маршрутизация кнопок: %s", router.get_stats ())
+        logger.info ("Пул отправки: %s", send_request.get_stats ())
+        logger.info ("Пул получения обновлений: %s", polling_request.get_stats ())
+        stats.flush ()
 
     # Создаем приложение
-    application = Application.builder ().token (TOKEN).build ()
-
-    # Создаем обработчик разговора
-    conv_handler = ConversationHandler (
-        entry_points=[CommandHandler ('start', handlers.start)],
-        states={
-            GameState.MAIN_MENU: [
-                CommandHandler ('begin', handlers.begin_game),
-                CommandHandler ('help', handlers.help_command),
-                CommandHandler ('quit', handlers.quit_command),
-                CallbackQueryHandler (handlers.handle_button_selection),
-            ],
-            GameState.IN_GAME: [
-                MessageHandler (filters.TEXT & ~filters.COMMAND, handlers.handle_message),
-                CommandHandler ('help', handlers.help_command),
-                CommandHandler ('quit', handlers.quit_command),
-                CallbackQueryHandler (handlers.handle_button_selection),
-            ],
-        },
-        fallbacks=[CommandHandler ('quit', handlers.quit_command)],
-    )
-
-    # Добавляем обработчик разговора
-    application.add_handler (conv_handler)
+    with timer.phase ("создание приложения"):
+        # Раздельные пулы: long polling не занимает соединения для отправки ответов
+        send_request, polling_request = create_requests ()
+        # Уже обработанные обновления (повторно пришедшие после сбоя) пропускаются
+        builder = Application.builder ().application_class (StoredApplication, kwargs={'store': store}).token (TOKEN)
+        # Адрес Bot API можно переопределить (например, на локальный fake_bot_api.py)
+        base_url = os.environ.get ('TELEGRAM_BASE_URL')
+        if base_url:
+            builder = builder.base_url (base_url)
+        # Общий ограничитель частоты запросов (нужен python-telegram-bot[rate-limiter])
+        try:
+            builder = builder.rate_limiter (AIORateLimiter ())
+        except RuntimeError:
+            logger.info ("aiolimiter не установлен: частота отправки ограничивается только пачками фоновых событий")
+        application = (
+            builder
+            .request (send_request)
+            .get_updates_request (polling_request)
+            .post_init (post_init)
+            .post_shutdown (post_shutdown)
+            .concurrent_updates (Config.get_int ('RANOVELL_CONCURRENT_UPDATES', 256))
+            .build ()
+        )
+
+    # Команды и кнопки не зависят от состояния разговора: сцена хранится в сессии игрока,
+    # а действие кнопки - в ее данных
+    # Лимит на пользователя проверяется раньше всех обработчиков
+    application.add_handler (TypeHandler (Update, admission.check), group=-1)
+
+    application.add_handler (CommandHandler ('start', start))
+    application.add_handler (CommandHandler ('begin', begin_game))
+    application.add_handler (CommandHandler ('help', help_command))
+    application.add_handler (CommandHandler ('quit', quit_command))
+    application.add_handler (CommandHandler ('save', save_command))
+    application.add_handler (CommandHandler ('load', load_command))
+    application.add_handler (CommandHandler ('back', back_command))
+    application.add_handler (CommandHandler ('stats', stats_command))
+    application.add_handler (CallbackQueryHandler (handle_callback))
+    application.add_handler (MessageHandler (filters.TEXT & ~filters.COMMAND, handle_message))
 
     # Запускаем бота
     print ("Бот запущен. Нажмите Ctrl+C для остановки.")
-    application.run_polling ()
+    application.run_polling (stop_signals=None)
 
 
 if __name__ == '__main__':
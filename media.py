@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+"""
+Модуль подготовки изображений сцен для отправки в Telegram.
+Изображения один раз уменьшаются и пережимаются (при наличии Pillow),
+хранятся в памяти в виде байтов и отправляются без файлового ввода-вывода
+в цикле событий. После первой отправки запоминается file_id Telegram.
+"""
+import asyncio
+import io
+import os
+
+# Изображения, привязанные к сценам
+SCENE_IMAGES = {
+    'intro': 'images/intro.jpg',
+    'room_with_portrait': 'images/room_with_portrait.jpg',
+    'corridor': 'images/corridor.jpg',
+    'children_room': 'images/children_room.jpg',
+    'basement': 'images/basement.jpg',
+}
+
+# Telegram сам ужимает фото до 1280 пикселей по большей стороне,
+# поэтому отправлять изображения крупнее нет смысла
+MAX_SIDE = 1280
+QUALITY = 85
+
+# Превью для экономного режима
+PREVIEW_SIDE = 320
+PREVIEW_QUALITY = 60
+
+
+def _read_file (path):
+    """Читает файл целиком"""
+    with open (path, 'rb') as image_file:
+        return image_file.read ()
+
+
+def _compress (image, max_side, quality):
+    """Уменьшает изображение Pillow и кодирует его в JPEG"""
+    image = image.copy ()
+    image.thumbnail ((max_side, max_side))
+    buffer = io.BytesIO ()
+    image.save (buffer, format='JPEG', quality=quality, optimize=True, progressive=True)
+    return buffer.getvalue ()
+
+
+class PreparedImage:
+    """Подготовленное к отправке изображение"""
+
+    def __init__ (self, path, data, preview, original_size):
+        """
+        Args:
+            path: Путь к исходному файлу
+            data: Байты оптимизированного изображения
+            preview: Байты превью для экономного режима
+            original_size: Размер исходного файла в байтах
+        """
+        self.path = path
+        self.data = data
+        self.preview = preview
+        self.original_size = original_size
+        self.size = len (data)
+        self.preview_size = len (preview)
+        # file_id, полученные от Telegram после первой отправки
+        self.file_id = None
+        self.preview_file_id = None
+
+
+def prepare_image (path, max_side=MAX_SIDE, quality=QUALITY,
+                   preview_side=PREVIEW_SIDE, preview_quality=PREVIEW_QUALITY):
+    """
+    Готовит изображение к отправке: уменьшает, пережимает и строит превью
+
+    Args:
+        path: Путь к изображению
+        max_side: Максимальная сторона основного варианта
+        quality: Качество JPEG основного варианта
+        preview_side: Максимальная сторона превью
+        preview_quality: Качество JPEG превью
+
+    Returns:
+        PreparedImage: Подготовленное изображение
+    """
+    raw = _read_file (path)
+
+    try:
+        from PIL import Image
+    except ImportError:
+        # Без Pillow отправляем исходные байты, но все равно из памяти
+        return PreparedImage (path, raw, raw, len (raw))
+
+    with Image.open (io.BytesIO (raw)) as image:
+        image = image.convert ('RGB')
+        data = _compress (image, max_side, quality)
+        preview = _compress (image, preview_side, preview_quality)
+
+    # Если пережатый вариант оказался не меньше исходного, оставляем исходный
+    if len (data) >= len (raw):
+        data = raw
+
+    return PreparedImage (path, data, preview, len (raw))
+
+
+class ImageStore:
+    """Хранилище подготовленных изображений"""
+
+    def __init__ (self, paths=None):
+        """
+        Args:
+            paths: Пути к изображениям. По умолчанию - все изображения сцен
+        """
+        if paths is None:
+            paths = SCENE_IMAGES.values ()
+        self.paths = list (dict.fromkeys (paths))
+        self.images = {}
+
+    def get (self, path):
+        """Возвращает подготовленное изображение или None"""
+        return self.images.get (os.path.normpath (path))
+
+    def prepare (self, path):
+        """Синхронно готовит одно изображение и сохраняет его в хранилище"""
+        prepared = prepare_image (path)
+        self.images[os.path.normpath (path)] = prepared
+        return prepared
+
+    def prepare_all (self):
+        """Синхронно готовит все изображения (пропуская отсутствующие файлы)"""
+        for path in self.paths:
+            try:
+                self.prepare (path)
+            except OSError as e:
+                print (f"Ошибка подготовки изображения {path}: {e}")
+
+    async def prepare_async (self):
+        """Готовит все изображения в пуле потоков, не блокируя цикл событий"""
+        loop = asyncio.get_running_loop ()
+        await loop.run_in_executor (None, self.prepare_all)
+
+    async def load (self, path):
+        """
+        Возвращает подготовленное изображение, готовя его в пуле потоков при необходимости
+
+        Args:
+            path: Путь к изображению
+
+        Returns:
+            PreparedImage: Подготовленное изображение
+        """
+        prepared = self.get (path)
+        if prepared is None:
+            loop = asyncio.get_running_loop ()
+            prepared = await loop.run_in_executor (None, self.prepare, path)
+        return prepared
+
+    def get_stats (self):
+        """Возвращает размеры подготовленных изображений в байтах"""
+        return {
+            path: {
+                'original': image.original_size,
+                'optimized': image.size,
+                'preview': image.preview_size,
+            }
+            for path, image in self.images.items ()
+        }
@@ -0,0 +1,54 @@
+#!/usr/bin/env python
+"""
+Модуль для учета выбранных вариантов действий в виде битовых масок.
+Бит i маски сцены установлен, если вариант с индексом i уже был выбран.
+"""
+from functools import lru_cache
+
+
+def add_option (mask, option_index):
+    """Отмечает вариант как выбранный"""
+    return mask | (1 << option_index)
+
+
+def has_option (mask, option_index):
+    """Проверяет, был ли вариант уже выбран"""
+    return bool ((mask >> option_index) & 1)
+
+
+def is_exhausted (option_count, mask):
+    """
+    Проверяет, выбраны ли все варианты сцены
+
+    Args:
+        option_count: Количество вариантов в сцене
+        mask: Маска выбранных вариантов
+
+    Returns:
+        bool: True, если невыбранных вариантов не осталось
+    """
+    full = (1 << option_count) - 1
+    return mask & full == full
+
+
+@lru_cache (maxsize=1024)
+def visible_options (scene, option_count, mask):
+    """
+    Возвращает исходные индексы вариантов, которые еще не были выбраны.
+    Результат кэшируется по (сцена, количество вариантов, маска)
+
+    Args:
+        scene: Сцена (ключ кэша)
+        option_count: Количество вариантов в сцене
+        mask: Маска выбранных вариантов
+
+    Returns:
+        tuple: Исходные индексы видимых вариантов в порядке показа
+    """
+    remaining = ((1 << option_count) - 1) & ~mask
+    indices = []
+    while remaining:
+        lowest = remaining & -remaining
+        indices.append (lowest.bit_length () - 1)
+        remaining ^= lowest
+    return tuple (indices)
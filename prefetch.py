@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+"""
+Модуль предварительного прогрева изображений сцен.
+Байты всех изображений готовятся при запуске (media.ImageStore.prepare_async),
+поэтому прогрев - это загрузка в служебный чат ради file_id. Когда игрок
+входит в сцену, изображения сцен, достижимых за один-два перехода,
+загружаются в фоне, чтобы первый дошедший до них игрок не ждал загрузки.
+Без служебного чата (MEDIA_CACHE_CHAT_ID) прогревать нечего, и прогрев
+не создается (см. main.py).
+"""
+import asyncio
+import logging
+
+from media import SCENE_IMAGES
+from scene_graph import reachable_scenes
+
+logger = logging.getLogger (__name__)
+
+
+class MediaPrefetcher:
+    """Фоновый прогрев изображений для ближайших сцен"""
+
+    def __init__ (self, images, cache_chat_id: int, depth: int = 2, concurrency: int = 2):
+        """
+        Args:
+            images: Хранилище подготовленных изображений (media.ImageStore)
+            cache_chat_id: Служебный чат, в который изображения загружаются заранее,
+                чтобы получить file_id
+            depth: На сколько переходов вперед прогревать сцены
+            concurrency: Максимальное количество одновременных прогревов
+        """
+        self.images = images
+        self.depth = depth
+        self.cache_chat_id = cache_chat_id
+        self.semaphore = asyncio.Semaphore (concurrency)
+        self.in_flight = set ()
+        self.tasks = set ()
+        self.warmed = 0
+        self.failed = 0
+
+    def on_scene (self, bot, scene):
+        """
+        Запускает прогрев изображений сцен, достижимых из текущей.
+        Возвращает управление сразу, не дожидаясь прогрева
+
+        Args:
+            bot: Объект Bot для загрузки в служебный чат
+            scene: Сцена, в которой сейчас находится игрок
+        """
+        for next_scene in reachable_scenes (scene, self.depth):
+            path = SCENE_IMAGES.get (next_scene)
+            if path is None or path in self.in_flight or self._is_warm (path):
+                continue
+
+            self.in_flight.add (path)
+            task = asyncio.create_task (self._warm (bot, path))
+            self.tasks.add (task)
+            task.add_done_callback (self.tasks.discard)
+
+    def _is_warm (self, path):
+        """Проверяет, прогрето ли изображение"""
+        prepared = self.images.get (path)
+        return prepared is not None and prepared.file_id is not None
+
+    async def _warm (self, bot, path):
+        """Загружает изображение в служебный чат и запоминает его file_id"""
+        try:
+            async with self.semaphore:
+                prepared = await self.images.load (path)
+
+                if prepared.file_id is None:
+                    message = await bot.send_photo (
+                        chat_id=self.cache_chat_id,
+                        photo=prepared.data,
+                        disable_notification=True
+                    )
+                    prepared.file_id = message.photo[-1].file_id
+
+                self.warmed += 1
+        except Exception as e:
+            self.failed += 1
+            logger.warning ("Не удалось прогреть изображение %s: %s", path, e)
+        finally:
+            self.in_flight.discard (path)
+
+    def get_stats (self):
+        """Возвращает счетчики прогрева"""
+        return {
+            'warmed': self.warmed,
+            'failed': self.failed,
+            'in_flight': len (self.in_flight),
+        }
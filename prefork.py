@@ -0,0 +1,198 @@
+#!/usr/bin/env python
+"""
+Pre-fork среда выполнения для нескольких рабочих процессов.
+Главный процесс один раз загружает статический контент, превращает его
+в неизменяемые контейнеры и замораживает сборщик мусора (gc.freeze),
+после чего порождает рабочие процессы через fork. Страницы с контентом
+остаются общими (copy-on-write) до тех пор, пока их не изменят.
+
+Замечание: чтение объекта в CPython меняет его счетчик ссылок, поэтому
+страницы с реально используемыми строками все равно копируются.
+gc.freeze убирает другой источник записи - обход объектов сборщиком мусора.
+
+Замер памяти (Linux):
+    python prefork.py --workers 4
+    python prefork.py --workers 4 --no-freeze
+"""
+import argparse
+import gc
+import json
+import os
+import signal
+import sys
+from types import MappingProxyType
+
+
+def freeze (value):
+    """
+    Рекурсивно превращает контент в неизменяемые контейнеры
+
+    Args:
+        value: Словарь, список, множество или скаляр
+
+    Returns:
+        Неизменяемая копия: MappingProxyType, tuple или frozenset
+    """
+    if isinstance (value, (dict, MappingProxyType)):
+        return MappingProxyType ({key: freeze (item) for key, item in value.items ()})
+    if isinstance (value, (list, tuple)):
+        return tuple (freeze (item) for item in value)
+    if isinstance (value, (set, frozenset)):
+        return frozenset (value)
+    return value
+
+
+def prepare_master (use_gc_freeze=True):
+    """
+    Готовит главный процесс к fork: загружает и замораживает контент
+
+    Args:
+        use_gc_freeze: Перенести все существующие объекты в постоянное поколение GC
+
+    Returns:
+        MappingProxyType: Замороженный контент
+    """
+    from content_snapshot import load_content
+
+    # Импортируем модули заранее, чтобы их код и константы тоже были общими
+    import game_logic  # noqa: F401
+    import hallucination_system  # noqa: F401
+    import characters  # noqa: F401
+    import styles  # noqa: F401
+
+    content = freeze (load_content ())
+
+    gc.collect ()
+    if use_gc_freeze:
+        gc.freeze ()
+
+    return content
+
+
+def run_prefork (worker_main, workers, content):
+    """
+    Порождает рабочие процессы и ждет их завершения.
+    SIGTERM и SIGINT пересылаются рабочим процессам
+
+    Args:
+        worker_main: Функция worker_main (worker_id, content), выполняемая в рабочем процессе
+        workers: Количество рабочих процессов
+        content: Замороженный контент
+
+    Returns:
+        dict: pid -> код завершения
+    """
+    children = {}
+
+    for worker_id in range (workers):
+        pid = os.fork ()
+        if pid == 0:
+            exit_code = 0
+            try:
+                worker_main (worker_id, content)
+            except BaseException as e:
+                print (f"Рабочий процесс {worker_id} завершился с ошибкой: {e}", file=sys.stderr)
+                exit_code = 1
+            finally:
+                os._exit (exit_code)
+        children[pid] = worker_id
+
+    def forward (signum, frame):
+        for child in children:
+            try:
+                os.kill (child, signum)
+            except ProcessLookupError:
+                pass
+
+    previous = {sig: signal.signal (sig, forward) for sig in (signal.SIGTERM, signal.SIGINT)}
+
+    results = {}
+    try:
+        while len (results) < len (children):
+            pid, status = os.wait ()
+            if pid in children:
+                results[pid] = os.WEXITSTATUS (status) if os.WIFEXITED (status) else -os.WTERMSIG (status)
+    finally:
+        for sig, handler in previous.items ():
+            signal.signal (sig, handler)
+
+    return results
+
+
+def memory_usage (pid='self'):
+    """
+    Возвращает RSS и PSS процесса в килобайтах (Linux, /proc)
+
+    Args:
+        pid: Идентификатор процесса или 'self'
+
+    Returns:
+        dict: {'rss': ..., 'pss': ...}; PSS равен None, если ядро его не сообщает
+    """
+    usage = {'rss': None, 'pss': None}
+    try:
+        with open (f"/proc/{pid}/smaps_rollup") as smaps:
+            for line in smaps:
+                field, _, rest = line.partition (':')
+                if field in ('Rss', 'Pss'):
+                    usage[field.lower ()] = int (rest.split ()[0])
+    except OSError:
+        try:
+            with open (f"/proc/{pid}/status") as status:
+                for line in status:
+                    if line.startswith ('VmRSS:'):
+                        usage['rss'] = int (line.split ()[1])
+        except OSError:
+            pass
+    return usage
+
+
+def _benchmark_worker (worker_id, content, sessions, pipe_fd):
+    """Рабочий процесс бенчмарка: создает игровые сессии и сообщает свою память"""
+    from game_logic import GameLogic
+
+    games = [GameLogic (content=content) for _ in range (sessions)]
+    for game in games:
+        for scene in content['scene_options']:
+            game.get_options_for_scene (scene)
+
+    report = dict (memory_usage (), worker=worker_id, sessions=len (games))
+    os.write (pipe_fd, (json.dumps (report) + "\n").encode ())
+
+
+def main ():
+    parser = argparse.ArgumentParser (description="Замер памяти рабочих процессов pre-fork")
+    parser.add_argument ('--workers', type=int, default=4)
+    parser.add_argument ('--sessions', type=int, default=1000, help="Игровых сессий на процесс")
+    parser.add_argument ('--no-freeze', action='store_true', help="Не вызывать gc.freeze ()")
+    args = parser.parse_args ()
+
+    content = prepare_master (use_gc_freeze=not args.no_freeze)
+    master = memory_usage ()
+
+    read_fd, write_fd = os.pipe ()
+    run_prefork (
+        lambda worker_id, frozen: _benchmark_worker (worker_id, frozen, args.sessions, write_fd),
+        args.workers,
+        content
+    )
+    os.close (write_fd)
+
+    with os.fdopen (read_fd) as pipe:
+        reports = [json.loads (line) for line in pipe if line.strip ()]
+
+    print (f"gc.freeze: {'нет' if args.no_freeze else 'да'}")
+    print (f"Главный процесс: RSS {master['rss']} КБ, PSS {master['pss']} КБ")
+    for report in sorted (reports, key=lambda item: item['worker']):
+        print (f"Процесс {report['worker']}: RSS {report['rss']} КБ, PSS {report['pss']} КБ "
+               f"({report['sessions']} сессий)")
+
+    if reports and all (report['pss'] is not None for report in reports):
+        total_rss = sum (report['rss'] for report in reports)
+        total_pss = sum (report['pss'] for report in reports)
+        print (f"Итого по процессам: RSS {total_rss} КБ, PSS {total_pss} КБ, "
+               f"общих страниц ~{total_rss - total_pss} КБ")
+
+
+if __name__ == '__main__':
+    main ()
@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+"""
+Граф переходов между сценами.
+Для каждой сцены перечислены сцены, в которые из нее можно попасть
+за один выбор (включая переход по варианту "Продолжить").
+"""
+
+SCENE_TRANSITIONS = {
+    'intro': ('room_with_portrait',),
+    'room_with_portrait': ('room_with_portrait', 'corridor'),
+    'corridor': ('corridor', 'children_room', 'basement'),
+    'children_room': ('children_room', 'corridor'),
+    'basement': ('basement', 'library', 'corridor'),
+    'library': ('library', 'corridor', 'doctor_office'),
+    'doctor_office': ('doctor_office', 'final_choice', 'library'),
+    'final_choice': ('end_acceptance', 'end_denial', 'end_secret'),
+    'end_acceptance': ('end',),
+    'end_denial': ('end',),
+    'end_secret': ('end',),
+    'end': (),
+}
+
+# Куда игрок переходит по варианту "Продолжить", когда все варианты сцены исчерпаны
+EXHAUSTION_TRANSITIONS = {
+    'room_with_portrait': 'corridor',
+    'corridor': 'basement',
+    'children_room': 'corridor',
+    'basement': 'corridor',
+    'library': 'corridor',
+    'doctor_office': 'library'
+}
+
+
+def next_scene_after_exhaustion (scene):
+    """Сцена, в которую ведет вариант "Продолжить" (по умолчанию коридор)"""
+    return EXHAUSTION_TRANSITIONS.get (scene, 'corridor')
+
+
+def reachable_scenes (scene, depth=2):
+    """
+    Возвращает сцены, достижимые из заданной не более чем за depth переходов
+
+    Args:
+        scene: Исходная сцена
+        depth: Максимальное количество переходов
+
+    Returns:
+        list: Сцены в порядке удаления от исходной (сама сцена не включается)
+    """
+    seen = {scene}
+    result = []
+    frontier = [scene]
+
+    for _ in range (depth):
+        next_frontier = []
+        for current in frontier:
+            for neighbour in SCENE_TRANSITIONS.get (current, ()):
+                if neighbour not in seen:
+                    seen.add (neighbour)
+                    result.append (neighbour)
+                    next_frontier.append (neighbour)
+        frontier = next_frontier
+
+    return result
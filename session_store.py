@@ -0,0 +1,738 @@
+#!/usr/bin/env python
+"""
+Модуль долговременного хранения сессий и обработанных обновлений.
+Updater подтверждает обновления Telegram при следующем getUpdates, а не
+после обработки, поэтому после аварийной остановки часть обновлений
+приходит повторно. Обработанные update_id хранятся компактно: граница
+(все id не выше нее обработаны) и небольшое множество обработанных id
+выше границы, пока ниже них еще идут ходы.
+
+Изменения игроков дописываются в журнал (journal.py): обычный ход - это
+запись из 23 байт (вариант и seed генератора), а состояние целиком
+пишется, только когда оно меняется не ходом (новая игра, /back, /load и
+т.п.). Записи, накопившиеся за интервал, и граница обработанных update_id
+подтверждаются одним кадром журнала с одним fsync, поэтому после
+перезапуска повторное обновление либо уже учтено в журнале и пропускается,
+либо не учтено и обрабатывается.
+
+Фоновая контрольная точка сворачивает закрытые сегменты в снимки SQLite:
+ходы повторяются движком с записанным seed, состояние игроков
+записывается в базу, сегменты удаляются. При остановке сворачивается весь
+журнал, после сбоя при запуске - только хвост после последней контрольной
+точки (в пуле потоков до начала опроса; движок собирается, только если в
+хвосте есть ходы). Сессии загружаются из базы по одной при первом
+обновлении игрока. Игроки, все изменения которых уже в базе и которые
+давно не ходили, после контрольной точки выгружаются из памяти сверх
+лимита max_resident.
+
+Изменения снимаются сразу после хода, пока чат заблокирован, и в тот же
+момент update_id отмечается обработанным: в журнал не попадает ход,
+который не отмечен, и наоборот. Файл базы считается доверенным
+(состояние хранится в pickle).
+
+Запуск бенчмарка восстановления:
+    python session_store.py --benchmark 100000
+"""
+import argparse
+import asyncio
+import functools
+import logging
+import os
+import pickle
+import random
+import shutil
+import sqlite3
+import tempfile
+import time
+from collections import Counter, OrderedDict
+
+from telegram import Update
+from telegram.ext import Application
+
+from journal import (
+    RECORD_INPUT, RECORD_PROGRESS, RECORD_STATE, RECORD_STEP, Journal, decode, encode_input, encode_progress,
+    encode_state, encode_step
+)
+
+logger = logging.getLogger (__name__)
+
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS sessions (user_id INTEGER PRIMARY KEY, state BLOB NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS progress (id INTEGER PRIMARY KEY CHECK (id = 1), "
+    "high_water INTEGER NOT NULL, recent BLOB NOT NULL, folded INTEGER NOT NULL DEFAULT 0)",
+)
+
+
+class ProcessedUpdates:
+    """Обработанные update_id: граница и обработанные id выше нее"""
+
+    def __init__ (self, high_water: int = 0, recent=()):
+        """
+        Args:
+            high_water: Все update_id не выше границы обработаны
+            recent: Обработанные update_id выше границы
+        """
+        self.high_water = high_water
+        self.recent = set (recent)
+        self.in_flight = set ()  # начатые, но не законченные обновления
+
+    def seen (self, update_id) -> bool:
+        """True, если обновление уже обработано"""
+        return update_id <= self.high_water or update_id in self.recent
+
+    def begin (self, update_id):
+        """Отмечает начало обработки"""
+        self.in_flight.add (update_id)
+
+    def complete (self, update_id):
+        """Отмечает обновление обработанным и сдвигает границу"""
+        self.in_flight.discard (update_id)
+        if update_id > self.high_water:
+            self.recent.add (update_id)
+        self.compact ()
+
+    def compact (self):
+        """
+        Сдвигает границу до первого незаконченного обновления. Updater передает
+        обновления по возрастанию id, поэтому все, что ниже самого раннего
+        незаконченного, уже обработано или не приходило вовсе
+        """
+        if self.in_flight:
+            floor = min (self.in_flight) - 1
+        elif self.recent:
+            floor = max (self.recent)
+        else:
+            return
+        if floor > self.high_water:
+            self.high_water = floor
+            self.recent = {update_id for update_id in self.recent if update_id > floor}
+
+
+class SessionStore:
+    """Журнал изменений игроков, снимки в SQLite и обработанные обновления"""
+
+    def __init__ (self, path: str, directory: str, export, restore, replay, key,
+                  segment_bytes: int = 8 * 1024 * 1024, fsync: bool = True, cache_size: int = 10000,
+                  max_resident: int = 10000):
+        """
+        Args:
+            path: Путь к файлу базы снимков
+            directory: Каталог сегментов журнала
+            export: Функция user_data -> состояние игрока из встроенных типов
+            restore: Функция (состояние, user_data), заполняющая user_data
+            replay: Функция (user_data, turn_id, вариант, текст, seed) -> bool, повторяющая ход
+            key: Функция user_data -> ключ того, что меняется не ходами (см. BotHandlers.journal_key)
+            segment_bytes: Размер сегмента журнала
+            fsync: Подтверждать кадры журнала fsync
+            cache_size: Сколько игроков держать в памяти при сворачивании сегментов
+            max_resident: Сколько игроков держать в памяти между ходами (остальные
+                выгружаются после контрольной точки, см. evict)
+        """
+        self.path = path
+        self.export = export
+        self.restore = restore
+        self.replay = replay
+        self.key = key
+        self.cache_size = cache_size
+        self.max_resident = max_resident
+        self.journal = Journal (directory, segment_bytes=segment_bytes, fsync=fsync)
+        self.reader = None  # соединение для загрузки сессий в цикле событий
+        self.writer = None  # соединение для контрольных точек в пуле потоков
+        self.folded = 0  # последний свернутый в базу сегмент
+        self.updates = ProcessedUpdates ()
+        self.committed = (0, frozenset ())  # граница в последнем подтвержденном кадре
+        self.pending = []  # записи, еще не подтвержденные в журнале
+        # Загруженные игроки от давно ходивших к недавним:
+        # пользователь -> (ключ, turn_id, номер последнего снятия с записями)
+        self.known = OrderedDict ()
+        self.active = Counter ()  # пользователи, чьи обработчики выполняются
+        self.on_evict = None  # функция (пользователь), удаляющая его user_data (см. StoredApplication)
+        self.captures = 0  # номер последнего снятия, добавившего записи
+        self.committed_capture = 0  # снятия до этого номера подтверждены в журнале
+        self.folded_capture = 0  # снятия до этого номера свернуты в базу
+        self.deferred = set ()  # update_id, отложенные до повторной обработки
+        self.checkpointing = None
+
+        # Счетчики
+        self.duplicates = 0
+        self.loaded = 0
+        self.steps = 0
+        self.states = 0
+        self.commits = 0
+        self.max_commit_time = 0.0
+        self.checkpoints = 0
+        self.checkpoint_time = 0.0
+        self.replayed = 0
+        self.mismatches = 0
+        self.recovered_segments = 0
+        self.recovery_time = 0.0
+        self.evicted = 0
+
+    def open (self):
+        """Открывает базу (восстановление и запись журнала начинает recover)"""
+        self.writer = self._connect (check_same_thread=False)
+        with self.writer:
+            for statement in SCHEMA:
+                self.writer.execute (statement)
+            # База, созданная до журнала, без номера свернутого сегмента
+            columns = [row[1] for row in self.writer.execute ("PRAGMA table_info (progress)")]
+            if 'folded' not in columns:
+                self.writer.execute ("ALTER TABLE progress ADD COLUMN folded INTEGER NOT NULL DEFAULT 0")
+        self.reader = self._connect ()
+
+    def recover (self):
+        """
+        Сворачивает хвост журнала после последней контрольной точки, читает границу
+        обработанных обновлений и начинает запись в новый сегмент. Вызывается до
+        обработки обновлений; свертка не трогает цикл событий, поэтому ее можно
+        выполнить в пуле потоков
+        """
+        row = self.writer.execute ("SELECT folded FROM progress WHERE id = 1").fetchone ()
+        self.folded = row[0] if row is not None else 0
+        tail = [number for number in self.journal.segments () if number > self.folded]
+        started = time.perf_counter ()
+        if tail:
+            self.fold (tail)
+        self.recovered_segments = len (tail)
+        self.recovery_time = time.perf_counter () - started
+
+        row = self.writer.execute ("SELECT high_water, recent FROM progress WHERE id = 1").fetchone ()
+        if row is not None:
+            self.updates = ProcessedUpdates (row[0], pickle.loads (row[1]))
+        self.committed = (self.updates.high_water, frozenset (self.updates.recent))
+        self.journal.open (after=self.folded)
+        logger.info ("Хранилище сессий %s: свернуто сегментов журнала %d за %.2f с, "
+                     "обработаны обновления до %d (и еще %d)", self.path, len (tail), self.recovery_time,
+                     self.updates.high_water, len (self.updates.recent))
+
+    def _connect (self, **kwargs):
+        """Соединение с базой снимков"""
+        connection = sqlite3.connect (self.path, **kwargs)
+        connection.execute ("PRAGMA journal_mode=WAL")
+        connection.execute ("PRAGMA synchronous=NORMAL")
+        return connection
+
+    async def close (self):
+        """
+        Подтверждает оставшиеся записи, сворачивает весь журнал в базу и закрывает журнал и базу:
+        после штатной остановки при запуске повторять нечего
+        """
+        if self.writer is None:
+            return
+        if self.checkpointing is not None:
+            await asyncio.gather (self.checkpointing, return_exceptions=True)
+        self.flush ()
+        if self.journal.file is not None:
+            try:
+                await asyncio.get_running_loop ().run_in_executor (None, self.checkpoint, self.seal ())
+            except (OSError, sqlite3.Error) as e:
+                logger.error ("Контрольная точка при остановке не удалась: %s", e)
+        self.journal.close ()
+        self.reader.close ()
+        self.writer.close ()
+        self.reader = self.writer = None
+
+    def begin (self, update_id) -> bool:
+        """
+        Начинает обработку обновления
+
+        Returns:
+            bool: False, если обновление уже обработано (его нужно пропустить)
+        """
+        if update_id in self.deferred:
+            # Отложенное обновление вернулось в очередь (см. admission.py)
+            self.deferred.discard (update_id)
+            return True
+        if self.updates.seen (update_id):
+            self.duplicates += 1
+            return False
+        self.updates.begin (update_id)
+        return True
+
+    def finish (self, update_id):
+        """Заканчивает обработку обновления (отложенное остается незаконченным)"""
+        if update_id not in self.deferred:
+            self.updates.complete (update_id)
+
+    def defer (self, update):
+        """Обновление отложено и будет обработано позже"""
+        self.deferred.add (update.update_id)
+
+    def discard (self, update):
+        """Отложенное обновление заменено более новым и обрабатываться не будет"""
+        self.deferred.discard (update.update_id)
+        self.updates.complete (update.update_id)
+
+    def load (self, user_id, user_data):
+        """Заполняет user_data сохраненным состоянием игрока, если оно есть, и включает запись ходов"""
+        row = self.reader.execute ("SELECT state FROM sessions WHERE user_id = ?", (user_id,)).fetchone ()
+        if row is not None:
+            self.restore (pickle.loads (row[0]), user_data)
+            self.loaded += 1
+        self._remember (user_id, user_data)
+
+    def _remember (self, user_id, user_data, capture=None):
+        """
+        Запоминает ключ и ход игрока, с которыми сравнивается следующее изменение
+
+        Args:
+            user_id: Пользователь
+            user_data: Данные игрока
+            capture: Номер снятия, добавившего записи (по умолчанию прежний)
+        """
+        session = user_data.get ('session')
+        if session is not None and session.journal is None:
+            session.journal = []
+        if capture is None:
+            capture = self.known[user_id][2] if user_id in self.known else 0
+        self.known[user_id] = (self.key (user_data), session.turn_id if session is not None else None, capture)
+        self.known.move_to_end (user_id)
+
+    def capture (self, user_id, update_id, user_data):
+        """Добавляет изменения игрока в очередь журнала и отмечает обновление обработанным"""
+        session = user_data.get ('session')
+        turns = session.journal if session is not None else None
+        key, turn_id, _ = self.known.get (user_id, (None, None, 0))
+        current = self.key (user_data)
+        written = len (self.pending)
+
+        if turns is not None and key == current and turn_id + len (turns) == session.turn_id:
+            # Изменились только ходы движка
+            for turn, option_id, text, rng_seed in turns:
+                if text is None:
+                    self.pending.append (encode_step (user_id, turn, option_id, rng_seed))
+                else:
+                    self.pending.append (encode_input (user_id, turn, rng_seed, text))
+            self.steps += len (turns)
+            turns.clear ()
+        elif key != current or (session is not None and turn_id != session.turn_id):
+            # Новая игра, возврат, загрузка и т.п.
+            state = pickle.dumps (self.export (user_data), pickle.HIGHEST_PROTOCOL)
+            self.pending.append (encode_state (user_id, state))
+            self.states += 1
+            if session is not None:
+                session.journal = []
+        capture = None
+        if len (self.pending) > written:
+            self.captures += 1
+            capture = self.captures
+        self._remember (user_id, user_data, capture)
+        self.updates.complete (update_id)
+
+    def track (self, callback):
+        """
+        Оборачивает обработчик: до первого хода игрока загружает его состояние, после хода
+        снимает изменения. Обработчик должен выполняться под блокировкой чата (см. keyed_lock.py)
+
+        Args:
+            callback: Асинхронный обработчик (update, context)
+
+        Returns:
+            callable: Обернутый обработчик
+        """
+
+        @functools.wraps (callback)
+        async def wrapper (update, context):
+            user = update.effective_user
+            if user is None:
+                return await callback (update, context)
+
+            if user.id not in self.known:
+                self.load (user.id, context.user_data)
+            self.active[user.id] += 1
+            try:
+                return await callback (update, context)
+            finally:
+                self.active[user.id] -= 1
+                if not self.active[user.id]:
+                    del self.active[user.id]
+                self.capture (user.id, update.update_id, context.user_data)
+
+        return wrapper
+
+    def _take (self):
+        """
+        Записи для следующего кадра (None, если изменений нет), граница обработанных
+        обновлений и номер последнего снятия в кадре
+        """
+        committed = (self.updates.high_water, frozenset (self.updates.recent), self.captures)
+        if not self.pending and committed[:2] == self.committed:
+            return None, committed
+        records, self.pending = self.pending, []
+        records.append (encode_progress (*committed[:2]))
+        return records, committed
+
+    def _commit (self, records, committed):
+        """Дописывает кадр в журнал (в пуле потоков или при закрытии)"""
+        started = time.perf_counter ()
+        self.journal.append (records)
+        self.max_commit_time = max (self.max_commit_time, time.perf_counter () - started)
+        self.commits += 1
+        self.committed = committed[:2]
+        self.committed_capture = committed[2]
+
+    def flush (self):
+        """
+        Подтверждает накопленные записи одним кадром журнала
+
+        Returns:
+            int: Количество подтвержденных записей
+        """
+        records, committed = self._take ()
+        if records is None:
+            return 0
+        self._commit (records, committed)
+        return len (records)
+
+    async def run_flusher (self, interval: float = 0.05, checkpoint_interval: float = 300.0):
+        """
+        Фоновая задача группового подтверждения записей и контрольных точек
+
+        Args:
+            interval: Период подтверждения в секундах (записи за период - один fsync)
+            checkpoint_interval: Период контрольных точек в секундах
+        """
+        loop = asyncio.get_running_loop ()
+        last_checkpoint = loop.time ()
+        while True:
+            await asyncio.sleep (interval)
+            records, committed = self._take ()
+            if records is not None:
+                write = loop.run_in_executor (None, self._commit, records, committed)
+                try:
+                    await asyncio.shield (write)
+                except asyncio.CancelledError:
+                    # Кадр дописывается до конца даже при остановке
+                    await asyncio.gather (write, return_exceptions=True)
+                    raise
+                except OSError as e:
+                    logger.error ("Не удалось записать журнал: %s", e)
+                    self.pending[:0] = records[:-1]  # повторим со следующим кадром
+                    continue
+
+            if loop.time () - last_checkpoint >= checkpoint_interval and self.checkpointing is None:
+                # Сегмент закрывается между кадрами, сворачивание идет параллельно следующим кадрам
+                last_checkpoint = loop.time ()
+                self.checkpointing = loop.run_in_executor (None, self.checkpoint, self.seal ())
+                self.checkpointing.add_done_callback (
+                    functools.partial (self._checkpoint_done, self.committed_capture)
+                )
+
+    def _checkpoint_done (self, sealed_capture, future):
+        """
+        Завершение фоновой контрольной точки: выгрузка игроков, чьи изменения уже в базе
+
+        Args:
+            sealed_capture: Номер последнего снятия в закрытых сегментах
+            future: Задача контрольной точки
+        """
+        self.checkpointing = None
+        if future.cancelled ():
+            return
+        if future.exception () is not None:
+            logger.error ("Контрольная точка не удалась: %s", future.exception ())
+            return
+        self.folded_capture = sealed_capture
+        self.evict ()
+
+    def evict (self):
+        """
+        Выгружает из памяти давно ходивших игроков сверх max_resident. Выгружается только
+        тот, чьи изменения уже свернуты в базу и чей обработчик не выполняется: при
+        следующем обновлении он загрузится из базы в том же состоянии
+
+        Returns:
+            int: Количество выгруженных игроков
+        """
+        excess = len (self.known) - self.max_resident
+        if excess <= 0:
+            return 0
+        evicted = [
+            user_id for user_id, (_, _, capture) in self.known.items ()
+            if capture <= self.folded_capture and user_id not in self.active
+        ][:excess]
+        for user_id in evicted:
+            del self.known[user_id]
+            if self.on_evict is not None:
+                self.on_evict (user_id)
+        self.evicted += len (evicted)
+        return len (evicted)
+
+    def seal (self):
+        """
+        Закрывает текущий сегмент, если в нем есть кадры
+
+        Returns:
+            list: Закрытые и еще не свернутые сегменты
+        """
+        if self.journal.file is not None and self.journal.file.tell () > 0:
+            self.journal.roll ()
+        return [number for number in self.journal.segments () if self.folded < number < self.journal.active]
+
+    def checkpoint (self, sealed):
+        """
+        Сворачивает закрытые сегменты в базу (в пуле потоков: закрытые сегменты не меняются)
+
+        Args:
+            sealed: Номера сегментов (см. seal)
+        """
+        started = time.perf_counter ()
+        if sealed:
+            self.fold (sealed)
+        self.checkpoints += 1
+        self.checkpoint_time = time.perf_counter () - started
+        logger.info ("Контрольная точка: свернуто сегментов журнала %d за %.2f с", len (sealed),
+                     self.checkpoint_time)
+
+    def fold (self, numbers):
+        """
+        Повторяет записи сегментов поверх снимков базы одной транзакцией и удаляет сегменты.
+        Номер последнего свернутого сегмента пишется в той же транзакции: если сбой
+        случится до удаления файлов, при запуске сегменты не будут свернуты повторно
+
+        Args:
+            numbers: Номера сегментов по возрастанию
+
+        Raises:
+            ValueError: В сегменте запись неизвестного типа
+        """
+        cache = OrderedDict ()  # пользователь -> сериализованное состояние или user_data
+        progress = None
+        connection = self.writer
+
+        def user_data_of (user_id):
+            value = cache.pop (user_id, None)
+            if value is None:
+                row = connection.execute ("SELECT state FROM sessions WHERE user_id = ?", (user_id,)).fetchone ()
+                value = row[0] if row is not None else None
+            user_data = {}
+            if isinstance (value, dict):
+                user_data = value
+            elif value is not None:
+                self.restore (pickle.loads (value), user_data)
+            return user_data
+
+        def store (user_id, value):
+            cache[user_id] = value
+            cache.move_to_end (user_id)
+            if len (cache) > self.cache_size:
+                self._write_user (connection, *cache.popitem (last=False))
+
+        def replay (user_id, turn_id, option_id, text, rng_seed):
+            user_data = user_data_of (user_id)
+            if self.replay (user_data, turn_id, option_id, text, rng_seed):
+                self.replayed += 1
+            else:
+                self.mismatches += 1
+            if user_data:
+                store (user_id, user_data)
+
+        with connection:
+            for number in numbers:
+                for payload in self.journal.read (number):
+                    for record in decode (payload):
+                        kind = record[0]
+                        if kind == RECORD_PROGRESS:
+                            progress = record[1:]
+                        elif kind == RECORD_STATE:
+                            store (record[1], record[2])
+                        elif kind == RECORD_STEP:
+                            _, user_id, turn_id, option_id, rng_seed = record
+                            replay (user_id, turn_id, option_id, None, rng_seed)
+                        elif kind == RECORD_INPUT:
+                            _, user_id, turn_id, rng_seed, text = record
+                            replay (user_id, turn_id, None, text, rng_seed)
+                        else:
+                            raise ValueError (f"Неизвестный тип записи {kind} в сегменте {number}")
+            for user_id, value in cache.items ():
+                self._write_user (connection, user_id, value)
+
+            if progress is not None:
+                connection.execute (
+                    "INSERT OR REPLACE INTO progress (id, high_water, recent, folded) VALUES (1, ?, ?, ?)",
+                    (progress[0], pickle.dumps (progress[1], pickle.HIGHEST_PROTOCOL), numbers[-1])
+                )
+            else:
+                connection.execute (
+                    "INSERT OR IGNORE INTO progress (id, high_water, recent, folded) VALUES (1, 0, ?, 0)",
+                    (pickle.dumps (set (), pickle.HIGHEST_PROTOCOL),)
+                )
+                connection.execute ("UPDATE progress SET folded = ? WHERE id = 1", (numbers[-1],))
+        self.folded = numbers[-1]
+        self.journal.remove (numbers)
+
+    def _write_user (self, connection, user_id, value):
+        """Записывает снимок игрока (сериализованный или user_data) в базу"""
+        if isinstance (value, dict):
+            value = pickle.dumps (self.export (value), pickle.HIGHEST_PROTOCOL)
+        connection.execute ("INSERT OR REPLACE INTO sessions (user_id, state) VALUES (?, ?)", (user_id, value))
+
+    def get_stats (self):
+        """Возвращает счетчики хранилища"""
+        return {
+            'high_water': self.updates.high_water,
+            'recent': len (self.updates.recent),
+            'in_flight': len (self.updates.in_flight),
+            'deferred': len (self.deferred),
+            'duplicates': self.duplicates,
+            'loaded': self.loaded,
+            'steps': self.steps,
+            'states': self.states,
+            'pending': len (self.pending),
+            'commits': self.commits,
+            'max_commit_ms': round (self.max_commit_time * 1000, 2),
+            'checkpoints': self.checkpoints,
+            'checkpoint_seconds': round (self.checkpoint_time, 3),
+            'replayed': self.replayed,
+            'mismatches': self.mismatches,
+            'recovered_segments': self.recovered_segments,
+            'recovery_seconds': round (self.recovery_time, 3),
+            'resident': len (self.known),
+            'evicted': self.evicted,
+            **self.journal.get_stats (),
+        }
+
+
+class StoredApplication (Application):
+    """Application, который пропускает уже обработанные обновления"""
+
+    def __init__ (self, store: SessionStore, **kwargs):
+        """
+        Args:
+            store: Хранилище сессий и обработанных обновлений
+            **kwargs: Параметры Application (передает ApplicationBuilder)
+        """
+        super ().__init__ (**kwargs)
+        self.store = store
+        store.on_evict = self.drop_user_data
+
+    async def process_update (self, update: object) -> None:
+        if not isinstance (update, Update):
+            return await super ().process_update (update)
+
+        if not self.store.begin (update.update_id):
+            return
+        try:
+            await super ().process_update (update)
+        finally:
+            self.store.finish (update.update_id)
+
+
+def _create_store (directory, handlers):
+    """Хранилище во временном каталоге для бенчмарка"""
+    return SessionStore (
+        os.path.join (directory, 'sessions.db'), os.path.join (directory, 'journal'),
+        export=handlers.export_user_data, restore=handlers.restore_user_data,
+        replay=handlers.replay_turn, key=handlers.journal_key
+    )
+
+
+def _crash (store):
+    """Останавливает хранилище как при сбое: подтвержденные кадры остаются в журнале несвернутыми"""
+    store.flush ()
+    store.journal.close ()
+    store.reader.close ()
+    store.writer.close ()
+
+
+def _play (engine, store, user_id, user_data, turns, rng):
+    """Делает turns ходов игрока и снимает изменения, как обработчики бота"""
+    from engine import CONTINUE_OPTION
+
+    session = user_data['session']
+    for _ in range (turns):
+        if session.finished:
+            break
+        option_id = CONTINUE_OPTION if session.exhausted else rng.randrange (len (session.options))
+        engine.step (session, option_id)
+        user_data['scene'] = 'main_menu' if session.finished else session.scene
+    store.capture (user_id, user_id, user_data)
+
+
+def benchmark (sessions, turns=5, tail=0.01, commit_every=1000, seed=1):
+    """
+    Замеряет журнал и восстановление для sessions игроков
+
+    Args:
+        sessions: Количество игроков
+        turns: Ходов на игрока до контрольной точки
+        tail: Доля игроков, сделавших ход после контрольной точки
+        commit_every: Игроков в одном кадре журнала
+        seed: Seed выбора вариантов
+    """
+    from bot_handlers import BotHandlers
+    from engine import GameEngine
+
+    engine = GameEngine ()
+    handlers = BotHandlers (engine, ui=None)
+    rng = random.Random (seed)
+    directory = tempfile.mkdtemp (prefix='ranovell-journal-')
+    try:
+        store = _create_store (directory, handlers)
+        store.open ()
+        store.recover ()
+        started = time.perf_counter ()
+        for user_id in range (1, sessions + 1):
+            user_data = {}
+            store._remember (user_id, user_data)
+            user_data['session'] = engine.new_session (user_id)
+            user_data['scene'] = 'intro'
+            store.capture (user_id, user_id, user_data)  # новая игра - состояние целиком
+            _play (engine, store, user_id, user_data, turns, rng)
+            store.known.pop (user_id)  # в бенчмарке игроки не остаются в памяти
+            if user_id % commit_every == 0:
+                store.flush ()
+        store.flush ()
+        write_time = time.perf_counter () - started
+        journal_bytes = store.journal.bytes_written
+        steps, states, commits = store.steps, store.states, store.commits
+        _crash (store)
+
+        # Восстановление всего журнала (контрольных точек не было)
+        store = _create_store (directory, handlers)
+        store.open ()
+        store.recover ()
+        full_time, full_replayed = store.recovery_time, store.replayed
+        database_bytes = sum (os.path.getsize (path) for path in (store.path, store.path + '-wal')
+                              if os.path.exists (path))
+
+        # Хвост: часть игроков продолжает игру после контрольной точки
+        players = rng.sample (range (1, sessions + 1), max (1, int (sessions * tail)))
+        started = time.perf_counter ()
+        for user_id in players:
+            user_data = {}
+            store.load (user_id, user_data)
+            if not user_data['session'].finished:
+                _play (engine, store, user_id, user_data, 1, rng)
+        load_time = (time.perf_counter () - started) / len (players)
+        _crash (store)
+
+        store = _create_store (directory, handlers)
+        store.open ()
+        store.recover ()
+        tail_time, tail_replayed, mismatches = store.recovery_time, store.replayed, store.mismatches
+        asyncio.run (store.close ())
+    finally:
+        shutil.rmtree (directory, ignore_errors=True)
+
+    print (f"Игроков: {sessions}, ходов: {steps}, состояний целиком: {states}, кадров: {commits}")
+    print (f"Журнал: {journal_bytes / 1e6:.1f} МБ, {write_time:.1f} с вместе с игрой, "
+           f"ход - 23 байта, состояние - {(journal_bytes - steps * 23) / states:.0f} байт")
+    print (f"База снимков: {database_bytes / 1e6:.1f} МБ")
+    print (f"Восстановление всего журнала: {full_time:.1f} с ({full_replayed} ходов повторено)")
+    print (f"Восстановление хвоста после контрольной точки: {tail_time:.2f} с "
+           f"({len (players)} игроков, {tail_replayed} ходов повторено, расхождений {mismatches})")
+    print (f"Загрузка сессии игрока из базы с ходом: {load_time * 1e3:.2f} мс")
+
+
+def main ():
+    parser = argparse.ArgumentParser (description="Бенчмарк журнала и восстановления сессий")
+    parser.add_argument ('--benchmark', type=int, default=100000, metavar='SESSIONS')
+    parser.add_argument ('--turns', type=int, default=5)
+    parser.add_argument ('--tail', type=float, default=0.01, help="Доля игроков в хвосте журнала")
+    args = parser.parse_args ()
+    benchmark (args.benchmark, args.turns, args.tail)
+
+
+if __name__ == '__main__':
+    main ()
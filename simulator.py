@@ -0,0 +1,241 @@
+#!/usr/bin/env python
+"""
+Монте-Карло симулятор прохождений для настройки сложности.
+Синтетические игроки проходят игру через безынтерфейсный движок
+(engine.py) пачками сессий. Партии распределяются по пулу процессов,
+у каждой порции свой генератор с детерминированным seed. Seed порций
+выводятся из базового seed его же генератором, поэтому прогоны с
+соседними базовыми seed не разделяют партий.
+
+Запуск:
+    python simulator.py --games 1000000 --policy brave --workers 8 --seed 1
+"""
+import argparse
+import math
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from analytics import ENDINGS
+from engine import CONTINUE_OPTION, GameEngine
+from option_masks import has_option
+
+# Оценки настроения варианта для стратегий
+BRAVE_SCORES = {'brave': 3, 'curious': 2, 'neutral': 1, 'aggressive': 0, 'scared': -1}
+FEARFUL_SCORES = {'scared': 3, 'neutral': 2, 'curious': 1, 'brave': 0, 'aggressive': -1}
+
+# Сколько ходов учитывается в кривой страха
+CURVE_LENGTH = 60
+
+OUTCOMES = ENDINGS + ('timeout',)
+
+
+def random_policy (game, scene, options, available, rng):
+    """Случайный выбор среди доступных вариантов"""
+    return rng.choice (available)
+
+
+def _scored_policy (scores):
+    """Жадная стратегия: вариант с лучшей оценкой настроения, при равенстве - случайный"""
+
+    def policy (game, scene, options, available, rng):
+        best = max (scores[game._analyze_sentiment (options[i])] for i in available)
+        return rng.choice ([i for i in available if scores[game._analyze_sentiment (options[i])] == best])
+
+    return policy
+
+
+POLICIES = {
+    'random': random_policy,
+    'brave': _scored_policy (BRAVE_SCORES),
+    'fearful': _scored_policy (FEARFUL_SCORES),
+}
+
+
+def choose_option (engine, policy, session, rng):
+    """
+    Выбирает вариант хода за синтетического игрока
+
+    Args:
+        engine: Игровой движок
+        policy: Функция выбора варианта
+        session: Сессия
+        rng: Генератор случайных чисел игрока
+
+    Returns:
+        int: Индекс варианта или CONTINUE_OPTION
+    """
+    # Все варианты исчерпаны - игрок нажимает "Продолжить"
+    if session.exhausted:
+        return CONTINUE_OPTION
+
+    # Варианты, закрытые требованиями к предметам, выбираются только если других нет
+    mask = session.disabled
+    locked = engine.locked_options (session)
+    available = [i for i in range (len (session.options)) if not has_option (mask, i)]
+    unlocked = [i for i in available if not has_option (locked, i)]
+    return policy (session.game, session.scene, session.options, unlocked or available, rng)
+
+
+def run_chunk (policy_name, games, seed, max_turns=200, batch_size=1000):
+    """
+    Проигрывает порцию партий в одном процессе. Партии идут пачками:
+    каждый вызов step_many продвигает на ход все сессии пачки
+
+    Returns:
+        dict: Суммы для агрегирования (исходы, ходы, кривая страха)
+    """
+    rng = random.Random (seed)
+    policy = POLICIES[policy_name]
+    engine = GameEngine ()
+
+    def choose (session):
+        return choose_option (engine, policy, session, rng)
+
+    outcomes = dict.fromkeys (OUTCOMES, 0)
+    turns_sum = 0
+    turns_sq = 0
+    fear_sum = [0] * CURVE_LENGTH
+    fear_sq = [0] * CURVE_LENGTH
+    fear_count = [0] * CURVE_LENGTH
+
+    for start in range (0, games, batch_size):
+        sessions = [engine.new_session (rng.getrandbits (64)) for _ in range (min (batch_size, games - start))]
+        curves = [[] for _ in sessions]
+
+        for _ in range (max_turns):
+            for curve, result in zip (curves, engine.step_many (sessions, choose)):
+                if result is not None:
+                    curve.append (result.fear_after)
+            if all (session.finished for session in sessions):
+                break
+
+        for session, curve in zip (sessions, curves):
+            ending = (session.ending or 'neutral') if session.finished else 'timeout'
+            turns = len (curve)
+            outcomes[ending] += 1
+            turns_sum += turns
+            turns_sq += turns * turns
+            for turn, fear in enumerate (curve[:CURVE_LENGTH]):
+                fear_sum[turn] += fear
+                fear_sq[turn] += fear * fear
+                fear_count[turn] += 1
+
+    return {
+        'games': games,
+        'outcomes': outcomes,
+        'turns_sum': turns_sum,
+        'turns_sq': turns_sq,
+        'fear_sum': fear_sum,
+        'fear_sq': fear_sq,
+        'fear_count': fear_count,
+    }
+
+
+def merge (results):
+    """Складывает результаты порций"""
+    total = {
+        'games': 0,
+        'outcomes': dict.fromkeys (OUTCOMES, 0),
+        'turns_sum': 0,
+        'turns_sq': 0,
+        'fear_sum': [0] * CURVE_LENGTH,
+        'fear_sq': [0] * CURVE_LENGTH,
+        'fear_count': [0] * CURVE_LENGTH,
+    }
+    for result in results:
+        total['games'] += result['games']
+        total['turns_sum'] += result['turns_sum']
+        total['turns_sq'] += result['turns_sq']
+        for outcome, count in result['outcomes'].items ():
+            total['outcomes'][outcome] += count
+        for key in ('fear_sum', 'fear_sq', 'fear_count'):
+            total[key] = [a + b for a, b in zip (total[key], result[key])]
+    return total
+
+
+def mean_interval (total, squares, count, z=1.96):
+    """Среднее и полуширина доверительного интервала (нормальное приближение)"""
+    if count == 0:
+        return 0.0, 0.0
+    mean = total / count
+    variance = max (squares / count - mean * mean, 0.0)
+    return mean, z * math.sqrt (variance / count)
+
+
+def proportion_interval (successes, count, z=1.96):
+    """Доля и границы доверительного интервала Уилсона"""
+    if count == 0:
+        return 0.0, 0.0, 0.0
+    p = successes / count
+    denominator = 1 + z * z / count
+    centre = (p + z * z / (2 * count)) / denominator
+    half = z * math.sqrt (p * (1 - p) / count + z * z / (4 * count * count)) / denominator
+    return p, max (centre - half, 0.0), min (centre + half, 1.0)
+
+
+def simulate (policy_name, games, workers=1, seed=0, chunk_size=10000, max_turns=200):
+    """
+    Запускает симуляцию в пуле процессов
+
+    Args:
+        policy_name: Имя стратегии из POLICIES
+        games: Количество партий
+        workers: Количество процессов
+        seed: Базовый seed; seed порций - 64-битные числа из random.Random (seed)
+        chunk_size: Партий в одной порции
+        max_turns: Ограничение длины партии
+
+    Returns:
+        dict: Объединенные суммы (см. run_chunk)
+    """
+    seeds = random.Random (seed)
+    chunks = [(policy_name, min (chunk_size, games - start), seeds.getrandbits (64), max_turns)
+              for start in range (0, games, chunk_size)]
+
+    if workers <= 1:
+        return merge (run_chunk (*chunk) for chunk in chunks)
+
+    with ProcessPoolExecutor (max_workers=workers) as pool:
+        return merge (pool.map (run_chunk, *zip (*chunks)))
+
+
+def print_report (total, elapsed):
+    """Печатает распределение концовок, длину пути и кривую страха"""
+    games = total['games']
+    print (f"Партий: {games} за {elapsed:.1f} с ({games / max (elapsed, 1e-9):.0f} партий/с)")
+
+    print ("\nКонцовки (95% ДИ):")
+    for outcome, count in total['outcomes'].items ():
+        share, low, high = proportion_interval (count, games)
+        print (f"  {outcome}: {share:.2%} [{low:.2%}, {high:.2%}]")
+
+    mean, half = mean_interval (total['turns_sum'], total['turns_sq'], games)
+    print (f"\nСредняя длина пути: {mean:.2f} ± {half:.2f} ходов")
+
+    print ("\nСредний страх по ходам (95% ДИ):")
+    for turn in range (0, CURVE_LENGTH, 5):
+        count = total['fear_count'][turn]
+        if count == 0:
+            break
+        mean, half = mean_interval (total['fear_sum'][turn], total['fear_sq'][turn], count)
+        print (f"  ход {turn + 1}: {mean:.1f} ± {half:.1f} (партий: {count})")
+
+
+def main ():
+    parser = argparse.ArgumentParser (description="Монте-Карло симуляция прохождений")
+    parser.add_argument ('--games', type=int, default=100000)
+    parser.add_argument ('--policy', choices=sorted (POLICIES), default='random')
+    parser.add_argument ('--workers', type=int, default=1)
+    parser.add_argument ('--seed', type=int, default=0)
+    parser.add_argument ('--chunk-size', type=int, default=10000)
+    parser.add_argument ('--max-turns', type=int, default=200)
+    args = parser.parse_args ()
+
+    started = time.perf_counter ()
+    total = simulate (args.policy, args.games, args.workers, args.seed, args.chunk_size, args.max_turns)
+    print_report (total, time.perf_counter () - started)
+
+
+if __name__ == '__main__':
+    main ()
@@ -0,0 +1,45 @@
+#!/usr/bin/env python
+"""
+Модуль для замера времени запуска бота по этапам.
+"""
+import time
+from contextlib import contextmanager
+
+
+class StartupTimer:
+    """Замеряет длительность этапов запуска"""
+
+    def __init__ (self):
+        self.started = time.perf_counter ()
+        self.phases = []
+
+    @contextmanager
+    def phase (self, name):
+        """
+        Контекстный менеджер для замера одного этапа
+
+        Args:
+            name: Название этапа
+        """
+        phase_start = time.perf_counter ()
+        try:
+            yield
+        finally:
+            self.phases.append ((name, time.perf_counter () - phase_start))
+
+    def total (self):
+        """Время с момента создания таймера в секундах"""
+        return time.perf_counter () - self.started
+
+    def report (self):
+        """
+        Формирует отчет о времени запуска
+
+        Returns:
+            str: Многострочный отчет с длительностью каждого этапа в миллисекундах
+        """
+        lines = ["Время запуска:"]
+        for name, duration in self.phases:
+            lines.append (f"  {name}: {duration * 1000:.1f} мс")
+        lines.append (f"  всего: {self.total () * 1000:.1f} мс")
+        return "\n".join (lines)
@@ -1,8 +1,9 @@
 #!/usr/bin/env python
 """
-Модуль для стилизации сообщений и визуальных элементов в Telegram.
+Модуль для стилизации сообщений и визуальных элементов в Telegram и терминале.
 Здесь определены стили сообщений, эмодзи и форматирование текста.
 """
+from fear import BAND_BY_LEVEL, clamp
 
 
 class MessageStyles:
@@ -51,10 +52,23 @@ class MessageStyles:
         'reality': '🌗',
     }
 
-    def __init__ (self):
-        """Инициализация объекта стилей"""
+    def __init__ (self, emoji=None):
+        """
+        Инициализация объекта стилей
+
+        Args:
+            emoji: Таблица эмодзи (по умолчанию EMOJI)
+        """
         # Создаем атрибут emoji для обращения через self.emoji
-        self.emoji = self.EMOJI
+        self.emoji = emoji if emoji is not None else self.EMOJI
+
+        # Текст индикатора страха для каждой полосы (см. fear.BAND_NAMES)
+        self.fear_texts = (
+            f"{self.emoji['smile']} Уровень страха: низкий",
+            f"{self.emoji['warning']} Уровень страха: средний",
+            f"{self.emoji['horror']} Уровень страха: высокий",
+            f"{self.emoji['scream']} Уровень страха: критический!",
+        )
 
     def bold (self, text):
         """Жирный текст"""
@@ -219,14 +233,7 @@ class MessageStyles:
         Returns:
             str: Отформатированное представление уровня страха
         """
-        if level < 20:
-            return f"{self.emoji['smile']} Уровень страха: низкий"
-        elif level < 50:
-            return f"{self.emoji['warning']} Уровень страха: средний"
-        elif level < 80:
-            return f"{self.emoji['horror']} Уровень страха: высокий"
-        else:
-            return f"{self.emoji['scream']} Уровень страха: критический!"
+        return self.fear_texts[BAND_BY_LEVEL[clamp (level)]]
 
     def format_hallucination (self, text):
         """
@@ -238,6 +245,110 @@ class MessageStyles:
         Returns:
             str: Отформатированный текст
         """
-        # Используем HTML-форматирование для создания блока с галлюцинацией
         # Добавляем эмодзи в начало и конец, используем курсив и зачеркивание
-        return f"<i>{self.emoji['hallucination']} <s>{text}</s> {self.emoji['hallucination']}</i>"
\ No newline at end of file
+        return self.italic (f"{self.emoji['hallucination']} {self.strikethrough (text)} {self.emoji['hallucination']}")
+
+    def format_response (self, response):
+        """
+        Оформляет ответ игры: диалоги, галлюцинации, записи и концовки
+
+        Args:
+            response: Исходный текст ответа
+
+        Returns:
+            str: Стилизованный текст
+        """
+        # Разделяем ответ на части (нарративный текст и диалоги)
+        parts = response.split ("\n\n")
+        formatted_parts = []
+
+        for part in parts:
+            if "Внутренний голос:" in part:
+                # Форматируем внутренний голос
+                voice_parts = part.split ("Внутренний голос:", 1)
+                message_text = voice_parts[1].strip ()
+                formatted_parts.append (self.format_scene_message ("Внутренний голос", message_text))
+            elif "Доктор Валентин:" in part:
+                # Форматируем сообщение от доктора
+                message_text = part.replace ("Доктор Валентин:", "").strip ()
+                formatted_parts.append (self.format_scene_message ("Доктор Валентин", message_text))
+
+            elif "галлюцинац" in part.lower () or "мерещ" in part.lower () or "чудит" in part.lower ():
+                # Форматируем галлюцинации особым образом
+                formatted_parts.append (self.format_hallucination (part))
+
+            elif "Алексей:" in part:
+                # Форматируем сообщение от Алексея
+                message_text = part.replace ("Алексей:", "").strip ()
+                formatted_parts.append (self.format_scene_message ("Алексей", message_text))
+            elif "ЗАПИСЬ ПАЦИЕНТА" in part or "ПРОТОКОЛ ЛЕЧЕНИЯ" in part:
+                # Форматируем медицинские записи как код
+                formatted_parts.append (self.code (part))
+            elif "ХОРОШАЯ КОНЦОВКА" in part:
+                # Форматируем текст хорошей концовки
+                formatted_parts.append (self.format_ending ("good", part))
+            elif "ПЛОХАЯ КОНЦОВКА" in part:
+                # Форматируем текст плохой концовки
+                formatted_parts.append (self.format_ending ("bad", part))
+            elif "СЕКРЕТНАЯ КОНЦОВКА" in part:
+                # Форматируем текст секретной концовки
+                formatted_parts.append (self.format_ending ("secret", part))
+            elif "НЕЙТРАЛЬНАЯ КОНЦОВКА" in part:
+                # Форматируем текст нейтральной концовки
+                formatted_parts.append (self.format_ending ("neutral", part))
+            elif part.startswith ("'") and part.endswith ("'") and len (part) > 10:
+                # Форматируем цитаты и записи как выделенный текст
+                formatted_parts.append (self.format_horror_effect (part.strip ("'")))
+            else:
+                # Остальной текст - это нарратив
+                formatted_parts.append (self.format_narration (part))
+
+        # Объединяем форматированные части
+        return "\n\n".join (formatted_parts)
+
+
+class AnsiStyles (MessageStyles):
+    """Те же стили для терминала: разметка ANSI вместо HTML"""
+
+    def __init__ (self, emoji=None, color=True):
+        """
+        Args:
+            emoji: Таблица эмодзи (по умолчанию EMOJI)
+            color: Использовать escape-последовательности ANSI (False - простой текст)
+        """
+        super ().__init__ (emoji)
+        self.color = color
+
+    def _wrap (self, text, start, end):
+        """Оборачивает текст в пару escape-последовательностей"""
+        if not self.color:
+            return text
+        return f"\033[{start}m{text}\033[{end}m"
+
+    def bold (self, text):
+        """Жирный текст"""
+        return self._wrap (text, 1, 22)
+
+    def italic (self, text):
+        """Курсивный текст"""
+        return self._wrap (text, 3, 23)
+
+    def code (self, text):
+        """Моноширинный текст (выделяется цветом)"""
+        return self._wrap (text, 36, 39)
+
+    def underline (self, text):
+        """Подчеркнутый текст"""
+        return self._wrap (text, 4, 24)
+
+    def strikethrough (self, text):
+        """Зачеркнутый текст"""
+        return self._wrap (text, 9, 29)
+
+    def link (self, text, url):
+        """Текст с адресом ссылки в скобках"""
+        return f"{self.underline (text)} ({url})"
+
+    def format_hallucination (self, text):
+        """Галлюцинация выделяется пурпурным цветом"""
+        return self._wrap (super ().format_hallucination (text), 35, 39)
@@ -1,19 +1,44 @@
 #!/usr/bin/env python
+import logging
+from collections import OrderedDict
+
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Update, ReplyKeyboardMarkup, KeyboardButton
 from telegram.ext import CallbackContext
 
+from styles import MessageStyles
+from option_masks import is_exhausted, visible_options
+from media import ImageStore
+from callbacks import ACTION_CONTINUE, ACTION_LEGACY, ACTION_OPTION, decode, encode
+
+logger = logging.getLogger (__name__)
+
 
 class TelegramUI:
     """Класс для управления пользовательским интерфейсом Telegram"""
 
-    def __init__ (self):
-        """Инициализация пользовательского интерфейса"""
-        # Словарь для хранения кэшированных клавиатур
-        self.cached_keyboards = {}
+    def __init__ (self, keyboard_cache_size: int = 64, images: ImageStore = None):
+        """
+        Инициализация пользовательского интерфейса
+
+        Args:
+            keyboard_cache_size: Максимальное количество кэшированных клавиатур
+            images: Хранилище подготовленных изображений
+        """
+        # Подготовленные изображения сцен
+        self.images = images if images is not None else ImageStore ()
+
+        # Кэш клавиатур: (вид, карта индексов или действия, кнопок в ряду) -> InlineKeyboardMarkup
+        self.cached_keyboards = OrderedDict ()
+        self.keyboard_cache_size = keyboard_cache_size
+        self.keyboard_cache_hits = 0
+        self.keyboard_cache_misses = 0
 
     async def send_message_with_options (self, update: Update, text: str, options: list,
                                          options_per_row: int = 3,
-                                         disabled_options: list = None):
+                                         disabled_options: int = 0,
+                                         locked_options: int = 0,
+                                         scene: str = None,
+                                         actions: tuple = None):
         """
         Отправляет сообщение с вариантами ответа и цифровыми кнопками.
         Выбранные варианты полностью удаляются.
@@ -23,77 +48,153 @@ class TelegramUI:
             text: Текст сообщения
             options: Список вариантов ответа
             options_per_row: Количество кнопок в одном ряду
-            disabled_options: Список индексов опций, которые нужно удалить
-        """
-        # Если список disabled_options не передан, создаем пустой
-        if disabled_options is None:
-            disabled_options = []
-
-        print (f"DEBUG: Все опции: {options}")
-        print (f"DEBUG: Отключенные опции: {disabled_options}")
+            disabled_options: Битовая маска опций, которые нужно удалить
+            locked_options: Битовая маска опций, недоступных без нужных предметов.
+                Такие опции остаются в списке, но помечаются замком
+            scene: Сцена, к которой относятся варианты (ключ кэша карты индексов)
+            actions: Действия кнопок меню (callbacks.ACTION_*), по одному на вариант.
+                Если заданы, маски не используются
 
-        # Проверяем - не все ли опции отключены
-        all_disabled = len (disabled_options) >= len (options)
+        Returns:
+            Message: Отправленное сообщение (по его id отбрасываются нажатия старых кнопок,
+                см. callbacks.py) или None, если отправить некуда
+        """
+        logger.debug ("Все опции: %s", options)
+        logger.debug ("Отключенные опции: %s", bin (disabled_options))
 
+        # Меню: каждой кнопке соответствует свое действие
+        if actions is not None:
+            filtered_options = list (options)
+            option_map = tuple (range (len (options)))
         # Если все опции отключены, добавляем вариант "Продолжить"
-        if all_disabled:
-            print ("DEBUG: Все опции отключены, добавляем вариант 'Продолжить'")
+        elif is_exhausted (len (options), disabled_options):
+            logger.debug ("Все опции отключены, добавляем вариант 'Продолжить'")
             filtered_options = ["Продолжить"]
-            option_map = {0: -1}  # Используем специальный индекс -1 для "Продолжить"
+            option_map = (-1,)  # Используем специальный индекс -1 для "Продолжить"
         else:
-            # Фильтруем опции, удаляя выбранные
-            filtered_options = [
-                option for i, option in enumerate (options)
-                if i not in disabled_options
-            ]
-
-            # Создаем карту соответствия оригинальных индексов и новых
-            option_map = {
-                new_idx: orig_idx
-                for new_idx, orig_idx in enumerate ([
-                    i for i in range (len (options))
-                    if i not in disabled_options
-                ])
-            }
-
-        print (f"DEBUG: Отфильтрованные опции: {filtered_options}")
-        print (f"DEBUG: Карта индексов: {option_map}")
+            # Карта соответствия новых индексов исходным: option_map[новый] = исходный
+            option_map = visible_options (scene, len (options), disabled_options)
+            filtered_options = [options[i] for i in option_map]
+
+        logger.debug ("Отфильтрованные опции: %s", filtered_options)
+        logger.debug ("Карта индексов: %s", option_map)
 
         # Создаем текст с вариантами ответов
+        lock = MessageStyles.EMOJI['lock']
         options_text = "\n\nВыберите ответ:\n"
         for i, option in enumerate (filtered_options, 1):
+            if option_map[i - 1] >= 0 and (locked_options >> option_map[i - 1]) & 1:
+                option = f"{lock} {option}"
             options_text += f"{i}. {option}\n"
 
         # Полный текст сообщения с вариантами
         full_text = f"{text}{options_text}"
 
+        # Клавиатура полностью определяется картой индексов (или действиями меню), поэтому берем ее из кэша
+        if actions is not None:
+            reply_markup = self.get_menu_keyboard (tuple (actions), options_per_row)
+        else:
+            reply_markup = self.get_options_keyboard (option_map, options_per_row)
+
+        # Определяем, откуда отправлять сообщение
+        if update.message:
+            return await update.message.reply_text (full_text, reply_markup=reply_markup)
+        elif update.callback_query:
+            return await update.callback_query.message.reply_text (full_text, reply_markup=reply_markup)
+        else:
+            print ("Ошибка: Не удалось определить источник сообщения")
+            return None
+
+    def get_options_keyboard (self, option_map: tuple, options_per_row: int = 3) -> InlineKeyboardMarkup:
+        """
+        Возвращает клавиатуру с цифровыми кнопками для карты индексов
+
+        Args:
+            option_map: Кортеж исходных индексов опций в порядке показа (-1 - "Продолжить")
+            options_per_row: Количество кнопок в одном ряду
+
+        Returns:
+            InlineKeyboardMarkup: Объект клавиатуры
+        """
+        return self._cached_keyboard (
+            ('options', option_map, options_per_row),
+            lambda: [encode (ACTION_CONTINUE) if index == -1 else encode (ACTION_OPTION, index)
+                     for index in option_map],
+            options_per_row
+        )
+
+    def get_menu_keyboard (self, actions: tuple, options_per_row: int = 3) -> InlineKeyboardMarkup:
+        """
+        Возвращает клавиатуру меню с цифровыми кнопками
+
+        Args:
+            actions: Кортеж действий кнопок (callbacks.ACTION_*) в порядке показа
+            options_per_row: Количество кнопок в одном ряду
+
+        Returns:
+            InlineKeyboardMarkup: Объект клавиатуры
+        """
+        return self._cached_keyboard (
+            ('menu', actions, options_per_row),
+            lambda: [encode (action) for action in actions],
+            options_per_row
+        )
+
+    def _cached_keyboard (self, key, build_callback_data, options_per_row) -> InlineKeyboardMarkup:
+        """
+        Возвращает клавиатуру из кэша или создает ее.
+        Объекты InlineKeyboardMarkup неизменяемы, поэтому одна и та же
+        клавиатура переиспользуется между сообщениями и игроками
+
+        Args:
+            key: Ключ кэша
+            build_callback_data: Функция, возвращающая данные кнопок по порядку
+            options_per_row: Количество кнопок в одном ряду
+
+        Returns:
+            InlineKeyboardMarkup: Объект клавиатуры
+        """
+        reply_markup = self.cached_keyboards.get (key)
+        if reply_markup is not None:
+            self.keyboard_cache_hits += 1
+            self.cached_keyboards.move_to_end (key)
+            return reply_markup
+
+        self.keyboard_cache_misses += 1
+
         # Создаем кнопки с цифрами и соответствующими callback_data
+        callback_data = build_callback_data ()
         keyboard = []
         row = []
 
-        for i in range (len (filtered_options)):
-            # Используем отображение, чтобы сохранить исходный индекс опции
-            original_index = option_map[i]
-
+        for i, data in enumerate (callback_data):
             row.append (InlineKeyboardButton (
                 str (i + 1),  # Нумерация для пользователя начинается с 1
-                callback_data=f"option_{original_index}"  # Оригинальный индекс для обработки
+                callback_data=data
             ))
 
             # Если заполнили ряд или это последняя кнопка
-            if (i + 1) % options_per_row == 0 or i == len (filtered_options) - 1:
+            if (i + 1) % options_per_row == 0 or i == len (callback_data) - 1:
                 keyboard.append (row)
                 row = []
 
         reply_markup = InlineKeyboardMarkup (keyboard)
 
-        # Определяем, откуда отправлять сообщение
-        if update.message:
-            await update.message.reply_text (full_text, reply_markup=reply_markup)
-        elif update.callback_query:
-            await update.callback_query.message.reply_text (full_text, reply_markup=reply_markup)
-        else:
-            print ("Ошибка: Не удалось определить источник сообщения")
+        # Вытесняем самую давно использованную клавиатуру при переполнении
+        self.cached_keyboards[key] = reply_markup
+        if len (self.cached_keyboards) > self.keyboard_cache_size:
+            self.cached_keyboards.popitem (last=False)
+
+        return reply_markup
+
+    def get_keyboard_cache_stats (self) -> dict:
+        """Возвращает статистику кэша клавиатур"""
+        return {
+            'size': len (self.cached_keyboards),
+            'max_size': self.keyboard_cache_size,
+            'hits': self.keyboard_cache_hits,
+            'misses': self.keyboard_cache_misses,
+        }
 
     def get_quick_reply_keyboard (self, options: list, one_time: bool = False):
         """
@@ -113,41 +214,51 @@ class TelegramUI:
             resize_keyboard=True
         )
 
-    # В методе get_option_index в классе TelegramUI
     def get_option_index (self, callback_data: str) -> int:
         """
-        Извлекает индекс выбранного варианта из callback_data
-        """
-        print (f"DEBUG: Получены callback данные: '{callback_data}'")
-        if callback_data.startswith ("option_"):
-            try:
-                index = int (callback_data.replace ("option_", ""))
-                print (f"DEBUG: Извлечен индекс: {index}")
-                return index
-            except ValueError:
-                print (f"DEBUG: Ошибка при преобразовании индекса")
-                return -1
-        print (f"DEBUG: Неизвестный формат callback данных")
+        Извлекает исходный индекс варианта из callback_data (см. callbacks.decode)
+
+        Returns:
+            int: Индекс варианта или -1 для "Продолжить" и нераспознанных данных
+        """
+        action, arg = decode (callback_data)
+        if action in (ACTION_OPTION, ACTION_LEGACY):
+            return arg
         return -1
 
-    async def send_image (self, update: Update, context: CallbackContext, image_path: str, caption: str = None):
+    async def send_image (self, update: Update, context: CallbackContext, image_path: str, caption: str = None,
+                          low_bandwidth: bool = False):
         """
-        Отправляет изображение
+        Отправляет изображение из подготовленного в памяти буфера
 
         Args:
             update: Объект Update из Telegram
             context: Контекст обработчика
             image_path: Путь к изображению
             caption: Подпись к изображению
+            low_bandwidth: Отправить облегченное превью вместо полного изображения
         """
         try:
             chat_id = update.effective_chat.id
-            with open (image_path, 'rb') as image:
-                await context.bot.send_photo (
-                    chat_id=chat_id,
-                    photo=image,
-                    caption=caption
-                )
+            prepared = await self.images.load (image_path)
+
+            # Повторные отправки используют file_id, без повторной загрузки байтов
+            if low_bandwidth:
+                photo = prepared.preview_file_id or prepared.preview
+            else:
+                photo = prepared.file_id or prepared.data
+
+            message = await context.bot.send_photo (
+                chat_id=chat_id,
+                photo=photo,
+                caption=caption
+            )
+
+            if message and message.photo:
+                if low_bandwidth:
+                    prepared.preview_file_id = message.photo[-1].file_id
+                else:
+                    prepared.file_id = message.photo[-1].file_id
         except Exception as e:
             print (f"Ошибка отправки изображения: {e}")
             # В случае ошибки отправляем только текст
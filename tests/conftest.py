@@ -0,0 +1,5 @@
+"""Модули проекта лежат в корне репозитория: добавляем его в путь импорта"""
+import os
+import sys
+
+sys.path.insert (0, os.path.dirname (os.path.dirname (os.path.abspath (__file__))))
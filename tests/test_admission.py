@@ -0,0 +1,116 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from telegram.ext import ApplicationHandlerStop
+
+from admission import AdmissionController
+
+
+class _Query:
+    def __init__ (self):
+        self.answered = 0
+
+    async def answer (self):
+        self.answered += 1
+
+
+def _update (user_id, press=False):
+    return SimpleNamespace (
+        effective_user=SimpleNamespace (id=user_id), effective_chat=SimpleNamespace (id=user_id),
+        callback_query=_Query () if press else None
+    )
+
+
+async def _check (controller, update):
+    """True, если обновление пропущено к обработчикам"""
+    try:
+        await controller.check (update, None)
+    except ApplicationHandlerStop:
+        return False
+    return True
+
+
+def test_token_bucket_refill ():
+    controller = AdmissionController (rate=2.0, burst=3)
+    assert [controller.admit (1, now=0.0) for _ in range (3)] == [0.0, 0.0, 0.0]
+    assert controller.admit (1, now=0.0) == pytest.approx (0.5)
+    # За секунду пополнились два токена
+    assert controller.admit (1, now=1.0) == 0.0
+    assert controller.admit (1, now=1.0) == 0.0
+    assert controller.admit (1, now=1.0) > 0
+    # Корзины пользователей независимы
+    assert controller.admit (2, now=1.0) == 0.0
+    # Токенов не больше burst, сколько бы ни прошло времени
+    assert [controller.admit (1, now=100.0) for _ in range (4)][-1] > 0
+
+
+def test_unknown_policy ():
+    with pytest.raises (ValueError):
+        AdmissionController (policy='queue')
+
+
+def test_drop_answers_rejected_press ():
+    controller = AdmissionController (rate=0.001, burst=1, policy='drop')
+
+    async def run ():
+        assert await _check (controller, _update (1, press=True))
+        rejected = _update (1, press=True)
+        assert not await _check (controller, rejected)
+        return rejected
+
+    rejected = asyncio.run (run ())
+    assert rejected.callback_query.answered == 1
+    assert controller.get_stats ()['admitted'] == 1
+    assert controller.get_stats ()['rejected'] == 1
+    assert controller.get_stats ()['pending'] == 0
+
+
+def test_coalesce_replaces_pending_update ():
+    deferred, discarded = [], []
+    controller = AdmissionController (rate=0.001, burst=1, on_defer=deferred.append, on_discard=discarded.append)
+    first, second, message = _update (1, press=True), _update (1, press=True), _update (1)
+
+    async def run ():
+        assert await _check (controller, _update (1))
+        assert not await _check (controller, first)
+        assert not await _check (controller, message)
+        assert not await _check (controller, second)
+
+    asyncio.run (run ())
+    assert deferred == [first, message, second]
+    assert discarded == [first]
+    assert first.callback_query.answered == 1
+    assert second.callback_query.answered == 0
+    # Сообщение не вытесняет нажатие: отложены последнее нажатие и последнее сообщение
+    assert controller.pending.get ((1, 'callback')) is second
+    assert controller.pending.get ((1, 'message')) is message
+    assert controller.coalesced == 1
+
+
+def test_run_replays_deferred_update ():
+    controller = AdmissionController (rate=50.0, burst=1, tick=0.01)
+    application = SimpleNamespace (update_queue=asyncio.Queue ())
+    deferred = _update (1, press=True)
+
+    async def run ():
+        assert await _check (controller, _update (1))
+        assert not await _check (controller, deferred)
+        task = asyncio.get_running_loop ().create_task (controller.run (application))
+        try:
+            return await asyncio.wait_for (application.update_queue.get (), timeout=2.0)
+        finally:
+            task.cancel ()
+
+    assert asyncio.run (run ()) is deferred
+    assert controller.replayed == 1
+    assert len (controller.pending) == 0
+
+
+def test_sweep_keeps_buckets_with_pending_updates ():
+    controller = AdmissionController (rate=1.0, burst=2)
+    controller.admit (1, now=0.0)
+    controller.admit (2, now=0.0)
+    controller.pending.schedule ((2, 'message'), 1.0, None)
+    controller.sweep (now=10.0)
+    assert set (controller.buckets) == {2}
@@ -0,0 +1,99 @@
+import asyncio
+import random
+from types import SimpleNamespace
+
+import pytest
+
+from ambient import AMBIENT_DELAYS, AmbientScheduler
+from engine import GameEngine
+from fear import BAND_CRITICAL, BAND_LOW
+from styles import MessageStyles
+
+
+class _Bot:
+    def __init__ (self, fail=()):
+        self.sent = []
+        self.fail = set (fail)
+
+    async def send_message (self, chat_id, text, parse_mode=None):
+        if chat_id in self.fail:
+            raise ConnectionError ("нет связи")
+        self.sent.append (chat_id)
+
+
+class _Random (random.Random):
+    """Запоминает диапазоны задержек"""
+
+    def __init__ (self):
+        super ().__init__ (1)
+        self.ranges = []
+
+    def uniform (self, low, high):
+        self.ranges.append ((low, high))
+        return super ().uniform (low, high)
+
+
+@pytest.fixture (scope='module')
+def engine ():
+    return GameEngine ()
+
+
+def test_delay_depends_on_fear_band (engine):
+    rng = _Random ()
+    scheduler = AmbientScheduler (MessageStyles (), rng=rng)
+    session = engine.new_session (1)
+    scheduler.schedule (1, session)
+    session.game.player.fear.set (95)
+    scheduler.schedule (1, session)
+    assert rng.ranges == [AMBIENT_DELAYS[BAND_LOW], AMBIENT_DELAYS[BAND_CRITICAL]]
+    assert len (scheduler.wheel) == 1
+
+
+def test_watch_reschedules_after_turn (engine):
+    scheduler = AmbientScheduler (MessageStyles ())
+    session = engine.new_session (1)
+    seen = []
+
+    async def callback (update, context):
+        seen.append (1 in scheduler.wheel)
+        return context.result
+
+    wrapped = scheduler.watch (callback, session=lambda context: context.session)
+    update = SimpleNamespace (effective_chat=SimpleNamespace (id=1))
+    scheduler.schedule (1, session)
+
+    assert asyncio.run (wrapped (update, SimpleNamespace (session=session, result='ok'))) == 'ok'
+    # Во время хода таймера нет, после хода он поставлен снова
+    assert seen == [False]
+    assert 1 in scheduler.wheel
+
+    session.finished = True
+    asyncio.run (wrapped (update, SimpleNamespace (session=session, result=None)))
+    assert 1 not in scheduler.wheel
+
+
+def test_deliver_skips_stale_and_limits_batch (engine):
+    scheduler = AmbientScheduler (MessageStyles (), per_tick=2, rng=random.Random (1))
+    sessions = {chat_id: engine.new_session (chat_id) for chat_id in range (1, 6)}
+    sessions[2].finished = True
+    scheduler.backlog.extend (sessions.items ())
+    # Игрок 3 сделал ход, пока событие ждало в очереди
+    scheduler.schedule (3, sessions[3])
+    bot = _Bot (fail={5})
+
+    asyncio.run (scheduler.deliver (bot))
+    assert bot.sent == [1, 4]
+    assert scheduler.stale == 2
+    assert len (scheduler.backlog) == 1
+
+    asyncio.run (scheduler.deliver (bot))
+    stats = scheduler.get_stats ()
+    assert (stats['delivered'], stats['failed'], stats['backlog']) == (2, 1, 0)
+
+
+def test_compose_formats_event (engine):
+    scheduler = AmbientScheduler (MessageStyles (), rng=random.Random (3))
+    session = engine.new_session (1)
+    for level in (0, 30, 60, 95):
+        session.game.player.fear.set (level)
+        assert scheduler.compose (session)
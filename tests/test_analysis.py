@@ -0,0 +1,46 @@
+import pytest
+
+np = pytest.importorskip ('numpy')
+
+from analysis import SCENE_CODES, EventColumns, ending_funnel, photo_roll_impact
+
+
+def _event (chat, game, ts, scene, next_scene, photos=0, option=0):
+    return {'chat': chat, 'game': game, 'ts': ts, 'scene': scene, 'option': option, 'next_scene': next_scene,
+            'fear_before': 0, 'fear_after': 0, 'photos': photos}
+
+
+# Чат 1: в первой игре фото найдено, концовка не секретная; во второй - секретная концовка без фото
+TWO_GAMES = [
+    _event (1, 0, 1.0, 'room_with_portrait', 'room_with_portrait', photos=1),
+    _event (1, 0, 2.0, 'room_with_portrait', 'end_denial', photos=1),
+    _event (1, 5, 3.0, 'intro', 'room_with_portrait'),
+    _event (1, 5, 4.0, 'room_with_portrait', 'end_secret'),
+]
+
+
+def test_games_in_one_chat_are_separate_playthroughs ():
+    events = EventColumns.from_records (TWO_GAMES)
+    playthrough, count = events.playthroughs ()
+    assert count == 2
+    assert playthrough.tolist () == [0, 0, 1, 1]
+
+    funnel = ending_funnel (events)
+    assert funnel[SCENE_CODES['room_with_portrait']] == 2
+    assert funnel[SCENE_CODES['end_secret']] == 1
+
+
+def test_photo_is_credited_to_its_own_playthrough ():
+    with_photo, without_photo, found = photo_roll_impact (EventColumns.from_records (TWO_GAMES))
+    assert found == 1
+    assert with_photo == 0.0
+    assert without_photo == 1.0
+
+
+def test_records_without_game_and_text_turns ():
+    records = [dict (event, option=None) for event in TWO_GAMES]
+    for record in records:
+        del record['game']
+    events = EventColumns.from_records (records)
+    assert events.playthroughs ()[1] == 1
+    assert events.option.tolist () == [-1] * 4
@@ -0,0 +1,61 @@
+import asyncio
+import logging
+import os
+
+from analytics import EndingStats
+
+
+def test_leaderboard_keeps_fastest_secret_endings (tmp_path):
+    stats = EndingStats (str (tmp_path / 'stats.json'), top_size=2)
+    for turns, name in ((30, "А"), (12, "Б"), (20, "В"), (25, "Г")):
+        stats.record ('end_secret', turns, photos=1, peak_fear=50, player_name=name)
+    stats.record ('unknown', 10, photos=0, peak_fear=120)
+
+    assert stats.leaderboard () == [("Б", 12), ("В", 20)]
+    assert stats.endings['neutral'] == 1
+    assert stats.games == 5
+    assert stats.average_turns () == 97 / 5
+    assert stats.peak_fear[-1] == 1
+
+
+def test_flush_and_load (tmp_path):
+    path = str (tmp_path / 'stats.json')
+    stats = EndingStats (path)
+    assert not stats.flush ()
+    stats.record ('end_secret', 15, photos=2, peak_fear=70, player_name="Алексей")
+    assert stats.flush ()
+    assert not os.path.exists (path + '.tmp')
+
+    loaded = EndingStats (path)
+    loaded.load ()
+    assert loaded.to_dict () == stats.to_dict ()
+    assert loaded.leaderboard () == [("Алексей", 15)]
+
+
+async def _run_flusher (stats, seconds):
+    task = asyncio.get_running_loop ().create_task (stats.run_flusher (0.01))
+    await asyncio.sleep (seconds)
+    task.cancel ()
+    await asyncio.gather (task, return_exceptions=True)
+
+
+def test_run_flusher_writes_changes (tmp_path):
+    path = str (tmp_path / 'stats.json')
+    stats = EndingStats (path)
+    stats.record ('end_denial', 8, photos=0, peak_fear=30)
+    asyncio.run (_run_flusher (stats, 0.1))
+
+    assert not stats.dirty
+    loaded = EndingStats (path)
+    loaded.load ()
+    assert loaded.endings['end_denial'] == 1
+
+
+def test_run_flusher_logs_failures_and_retries (tmp_path, caplog):
+    stats = EndingStats (str (tmp_path / 'missing' / 'stats.json'))
+    stats.record ('end_denial', 8, photos=0, peak_fear=30)
+    with caplog.at_level (logging.ERROR, logger='analytics'):
+        asyncio.run (_run_flusher (stats, 0.1))
+
+    assert stats.dirty
+    assert "Не удалось сохранить статистику" in caplog.text
@@ -0,0 +1,178 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import bot_handlers
+from bot_handlers import BotHandlers
+from callbacks import ACTION_CONTINUE, ACTION_OPTION, encode
+from dedup import CallbackDeduplicator
+from engine import CONTINUE_OPTION, GameEngine
+
+
+class _Chat:
+    """Чат, выдающий сообщениям растущие id, как Telegram"""
+
+    def __init__ (self):
+        self.id = 1
+        self.messages = []
+
+    def send (self, text, reply_markup=None):
+        message = _Message (self, len (self.messages) + 1, text, reply_markup)
+        self.messages.append (message)
+        return message
+
+
+class _Message:
+    def __init__ (self, chat, message_id, text=None, reply_markup=None):
+        self.chat = chat
+        self.chat_id = chat.id
+        self.message_id = message_id
+        self.text = text
+        self.reply_markup = reply_markup
+
+    async def reply_text (self, text, reply_markup=None, **kwargs):
+        return self.chat.send (text, reply_markup)
+
+
+class _Query:
+    def __init__ (self, message, data):
+        self.message = message
+        self.data = data
+        self.answers = 0
+
+    async def answer (self):
+        self.answers += 1
+
+
+class _UI:
+    """Интерфейс без Telegram: сообщения с кнопками попадают в чат"""
+
+    async def send_message_with_options (self, update, text, options, **kwargs):
+        source = update.message or update.callback_query.message
+        return await source.reply_text (text, reply_markup=(tuple (options), kwargs))
+
+    async def send_typing_action (self, update, context):
+        pass
+
+    async def send_image (self, update, context, image_path):
+        pass
+
+
+class _Events:
+    def __init__ (self):
+        self.published = []
+
+    async def publish (self, event):
+        self.published.append (event)
+        return True
+
+
+async def _no_sleep (delay):
+    pass
+
+
+@pytest.fixture
+def bot (monkeypatch):
+    monkeypatch.setattr (bot_handlers.asyncio, 'sleep', _no_sleep)
+    events = _Events ()
+    handlers = BotHandlers (GameEngine (), _UI (), events=events)
+    router = handlers.build_router ()
+    dedup = CallbackDeduplicator ()
+    chat = _Chat ()
+    context = SimpleNamespace (user_data={}, bot=None, args=[])
+    user = SimpleNamespace (id=1, first_name="Алексей")
+
+    def command (handler, text="/command"):
+        update = SimpleNamespace (message=chat.send (text), callback_query=None,
+                                  effective_user=user, effective_chat=chat)
+        return asyncio.run (handler (update, context))
+
+    def press (message, data):
+        update = SimpleNamespace (message=None, callback_query=_Query (message, data),
+                                  effective_user=user, effective_chat=chat)
+        guarded = dedup.guard (router.dispatch, handlers.buttons_message)
+        return asyncio.run (guarded (update, context))
+
+    return SimpleNamespace (handlers=handlers, chat=chat, context=context, command=command, press=press,
+                            events=events)
+
+
+def _buttons (chat):
+    """Последнее сообщение с кнопками"""
+    return [message for message in chat.messages if message.reply_markup is not None][-1]
+
+
+def test_turns_continue_after_quit_and_start (bot):
+    bot.command (bot.handlers.begin_game)
+    first = bot.context.user_data['session']
+    bot.press (_buttons (bot.chat), encode (ACTION_OPTION, 0))
+    last_turn = first.turn_id
+    assert last_turn > 0
+
+    bot.command (bot.handlers.quit_command)
+    assert 'session' not in bot.context.user_data
+    bot.command (bot.handlers.begin_game)
+    assert bot.context.user_data['session'].turn_id == last_turn + 1
+
+    bot.command (bot.handlers.start)
+    bot.command (bot.handlers.begin_game)
+    assert bot.context.user_data['session'].turn_id == last_turn + 2
+
+
+def test_old_game_button_is_stale_after_quit_and_begin (bot):
+    bot.command (bot.handlers.begin_game)
+    old_buttons = _buttons (bot.chat)
+    old_turn = bot.context.user_data['session'].turn_id
+
+    bot.command (bot.handlers.quit_command)
+    bot.command (bot.handlers.begin_game)
+    session = bot.context.user_data['session']
+    assert session.turn_id > old_turn
+    sent = len (bot.chat.messages)
+
+    # Кнопка старой игры не применяется к новой
+    assert bot.press (old_buttons, encode (ACTION_OPTION, 0)) is None
+    assert session.turn_id == old_turn + 1
+    assert len (bot.chat.messages) == sent
+
+    # Кнопка новой игры работает
+    bot.press (_buttons (bot.chat), encode (ACTION_OPTION, 0))
+    assert session.turn_id == old_turn + 2
+
+
+def test_last_turn_survives_export (bot):
+    bot.command (bot.handlers.begin_game)
+    bot.command (bot.handlers.quit_command)
+    state = bot.handlers.export_user_data (bot.context.user_data)
+
+    user_data = {}
+    bot.handlers.restore_user_data (state, user_data)
+    assert user_data['last_turn'] == bot.context.user_data['last_turn']
+
+
+def test_every_turn_is_published (bot):
+    bot.command (bot.handlers.begin_game)
+    session = bot.context.user_data['session']
+
+    bot.press (_buttons (bot.chat), encode (ACTION_OPTION, 0))
+    bot.command (bot.handlers.handle_message, "Позвать кого-нибудь")
+    assert not session.finished
+    # Все варианты сцены выбраны: остается "Продолжить"
+    session.selected[session.scene] = (1 << len (session.options)) - 1
+    bot.press (_buttons (bot.chat), encode (ACTION_CONTINUE))
+
+    options = [event['option'] for event in bot.events.published]
+    assert options == [0, None, CONTINUE_OPTION]
+    assert {event['game'] for event in bot.events.published} == {session.first_turn}
+    assert session.turn_id == 3
+
+
+def test_new_game_is_a_new_playthrough (bot):
+    bot.command (bot.handlers.begin_game)
+    bot.press (_buttons (bot.chat), encode (ACTION_OPTION, 0))
+    bot.command (bot.handlers.begin_game)
+    bot.press (_buttons (bot.chat), encode (ACTION_OPTION, 0))
+
+    games = [event['game'] for event in bot.events.published]
+    assert games[0] != games[1]
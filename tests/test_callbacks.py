@@ -0,0 +1,82 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from callbacks import (
+    ACTION_CONTINUE, ACTION_COUNT, ACTION_LEGACY, ACTION_OPTION, ACTION_QUIT, ACTION_UNKNOWN, MAX_CALLBACK_DATA,
+    CallbackRouter, decode, encode
+)
+
+
+@pytest.mark.parametrize ('action', range (ACTION_COUNT))
+@pytest.mark.parametrize ('arg', (0, 1, 7, 8, 255, 10 ** 12))
+def test_round_trip (action, arg):
+    data = encode (action, arg)
+    assert data.startswith ('r1:')
+    assert decode (data) == (action, arg)
+
+
+def test_encode_is_compact_and_bounded ():
+    assert encode (ACTION_OPTION, 1) == 'r1:9'
+    assert encode (ACTION_CONTINUE) == 'r1:2'
+    with pytest.raises (ValueError):
+        encode (ACTION_OPTION, 16 ** MAX_CALLBACK_DATA)
+
+
+@pytest.mark.parametrize ('data, expected', [
+    ('option_3', (ACTION_LEGACY, 3)),
+    ('option_-1', (ACTION_LEGACY, -1)),
+    ('option_x', (ACTION_UNKNOWN, 0)),
+    ('r1:zz', (ACTION_UNKNOWN, 0)),
+    ('r1:', (ACTION_UNKNOWN, 0)),
+    ('r2:9', (ACTION_UNKNOWN, 0)),
+    ('', (ACTION_UNKNOWN, 0)),
+])
+def test_decode_legacy_and_garbage (data, expected):
+    assert decode (data) == expected
+
+
+class _Query:
+    def __init__ (self, data, message_id=10):
+        self.data = data
+        self.message = SimpleNamespace (message_id=message_id)
+        self.answered = 0
+
+    async def answer (self):
+        self.answered += 1
+
+
+def test_router_dispatch ():
+    calls = []
+
+    async def option (update, context, arg):
+        calls.append (('option', arg))
+        return arg
+
+    async def quit (update, context):
+        calls.append (('quit',))
+
+    router = CallbackRouter (buttons_message=lambda context: context)
+    router.route (ACTION_OPTION, option)
+    router.route (ACTION_QUIT, quit, takes_arg=False)
+
+    async def press (data, message_id=10, buttons_message=10):
+        query = _Query (data, message_id)
+        result = await router.dispatch (SimpleNamespace (callback_query=query), buttons_message)
+        assert query.answered == 1
+        return result
+
+    async def run ():
+        assert await press (encode (ACTION_OPTION, 2)) == 2
+        await press (encode (ACTION_QUIT))
+        assert await press (encode (ACTION_CONTINUE)) is None
+        assert await press ('garbage') is None
+        # Кнопка из сообщения старше последнего с кнопками
+        assert await press (encode (ACTION_OPTION, 1), message_id=9) is None
+        # Id сообщения с кнопками неизвестен: нажатие принимается
+        assert await press (encode (ACTION_OPTION, 1), message_id=9, buttons_message=None) == 1
+
+    asyncio.run (run ())
+    assert calls == [('option', 2), ('quit',), ('option', 1)]
+    assert router.get_stats () == {'dispatched': 3, 'unknown': 2, 'stale': 1}
@@ -0,0 +1,92 @@
+import pytest
+
+import content_snapshot
+from content_snapshot import (
+    HEADER, MAGIC, SNAPSHOT_VERSION, build_snapshot, collect_content, load_content, load_snapshot, source_hash,
+    source_stamps
+)
+
+
+def _rewrite_header (path, content_hash=None, stamps=None, version=SNAPSHOT_VERSION):
+    """Подменяет заголовок снимка, оставляя контент"""
+    with open (path, 'rb') as snapshot:
+        payload = snapshot.read ()[HEADER.size:]
+    header = HEADER.pack (MAGIC, version, content_hash or source_hash (), *(stamps or source_stamps ()))
+    with open (path, 'wb') as snapshot:
+        snapshot.write (header + payload)
+
+
+def _moved (stamps):
+    """Отметки модулей, как если бы их время изменения сдвинулось"""
+    return tuple (value + 1 if n % 2 == 0 else value for n, value in enumerate (stamps))
+
+
+@pytest.mark.parametrize ('use_mmap', (False, True))
+def test_build_and_load (tmp_path, use_mmap):
+    path = str (tmp_path / 'content.snapshot')
+    content = build_snapshot (path)
+    assert content == collect_content ()
+    assert load_snapshot (path, use_mmap=use_mmap) == content
+
+
+def test_touched_sources_with_same_hash_are_fresh (tmp_path):
+    path = str (tmp_path / 'content.snapshot')
+    build_snapshot (path)
+    _rewrite_header (path, stamps=_moved (source_stamps ()))
+    assert load_snapshot (path) is not None
+
+
+def test_stamps_match_skips_hash (tmp_path):
+    # Совпадение отметок считается достаточным: хэш не проверяется
+    path = str (tmp_path / 'content.snapshot')
+    build_snapshot (path)
+    _rewrite_header (path, content_hash=b'\0' * 32)
+    assert load_snapshot (path) is not None
+    assert load_snapshot (path, check_sources=False) is not None
+
+
+def test_changed_sources_make_snapshot_stale (tmp_path):
+    path = str (tmp_path / 'content.snapshot')
+    build_snapshot (path)
+    _rewrite_header (path, content_hash=b'\0' * 32, stamps=_moved (source_stamps ()))
+    assert load_snapshot (path) is None
+    assert load_snapshot (path, check_sources=False) is not None
+
+
+@pytest.mark.parametrize ('corrupt', ('missing', 'short', 'version', 'payload'))
+def test_broken_snapshot (tmp_path, corrupt):
+    path = str (tmp_path / 'content.snapshot')
+    build_snapshot (path)
+    if corrupt == 'missing':
+        path += '.absent'
+    elif corrupt == 'short':
+        with open (path, 'r+b') as snapshot:
+            snapshot.truncate (HEADER.size - 1)
+    elif corrupt == 'version':
+        _rewrite_header (path, version=SNAPSHOT_VERSION + 1)
+    else:
+        with open (path, 'r+b') as snapshot:
+            snapshot.truncate (HEADER.size + 10)
+    assert load_snapshot (path) is None
+
+
+def test_load_content_rebuilds_stale_snapshot (tmp_path, monkeypatch):
+    monkeypatch.setattr (content_snapshot, '_loaded', None)
+    path = str (tmp_path / 'content.snapshot')
+    build_snapshot (path)
+    _rewrite_header (path, content_hash=b'\0' * 32, stamps=_moved (source_stamps ()))
+
+    content = load_content (path)
+    assert content == collect_content ()
+    with open (path, 'rb') as snapshot:
+        magic, version, content_hash, *stamps = HEADER.unpack_from (snapshot.read ())
+    assert (content_hash, tuple (stamps)) == (source_hash (), source_stamps ())
+    # Повторный вызов возвращает уже загруженный контент
+    assert load_content (str (tmp_path / 'other.snapshot')) is content
+
+
+def test_load_content_without_writable_path (tmp_path, monkeypatch):
+    monkeypatch.setattr (content_snapshot, '_loaded', None)
+    content = load_content (str (tmp_path / 'missing' / 'content.snapshot'))
+    assert content == collect_content ()
+    assert not (tmp_path / 'missing').exists ()
@@ -0,0 +1,96 @@
+import asyncio
+from types import SimpleNamespace
+
+from callbacks import ACTION_OPTION, decode, encode, is_stale
+from dedup import CallbackDeduplicator
+
+
+def test_repeat_within_ttl_is_duplicate ():
+    dedup = CallbackDeduplicator (ttl=30.0)
+    assert not dedup.seen ('a', now=0.0)
+    assert dedup.seen ('a', now=10.0)
+    assert not dedup.seen ('b', now=10.0)
+    assert dedup.get_stats ()['duplicates'] == 1
+
+
+def test_key_expires_after_ttl ():
+    dedup = CallbackDeduplicator (ttl=30.0)
+    dedup.seen ('a', now=0.0)
+    assert not dedup.seen ('a', now=30.0)
+    assert dedup.get_stats ()['expired'] == 1
+
+
+def test_capacity_evicts_oldest ():
+    dedup = CallbackDeduplicator (capacity=2)
+    for key in ('a', 'b', 'c'):
+        dedup.seen (key, now=0.0)
+    assert dedup.get_stats ()['evicted'] == 1
+    assert not dedup.seen ('a', now=1.0)
+    assert dedup.seen ('c', now=1.0)
+
+
+def test_stale_press_is_from_older_message ():
+    assert is_stale (_Query ('r1:9', message_id=10), 11)
+    assert not is_stale (_Query ('r1:9', message_id=11), 11)
+    # Сообщение новее запомненного еще отправляется: его кнопки не устарели
+    assert not is_stale (_Query ('r1:9', message_id=12), 11)
+    assert not is_stale (_Query ('r1:9', message_id=10), None)
+
+
+def test_old_turn_field_is_ignored ():
+    assert decode ('r1:9:4') == decode (encode (ACTION_OPTION, 1)) == (ACTION_OPTION, 1)
+
+
+class _Query:
+    def __init__ (self, data, message_id=10):
+        self.data = data
+        self.message = SimpleNamespace (chat_id=1, message_id=message_id)
+        self.answers = 0
+
+    async def answer (self):
+        self.answers += 1
+
+
+def _press (guarded, query, buttons_message):
+    update = SimpleNamespace (callback_query=query)
+    context = SimpleNamespace (buttons_message=buttons_message)
+    return asyncio.run (guarded (update, context))
+
+
+def _guarded (dedup):
+    handled = []
+
+    async def callback (update, context):
+        handled.append (update.callback_query.data)
+        return True
+
+    return dedup.guard (callback, lambda context: context.buttons_message), handled
+
+
+def test_guard_drops_repeated_press ():
+    dedup = CallbackDeduplicator ()
+    guarded, handled = _guarded (dedup)
+    data = encode (ACTION_OPTION, 1)
+
+    first, repeat = _Query (data), _Query (data)
+    assert _press (guarded, first, 10)
+    assert _press (guarded, repeat, 10) is None
+    assert handled == [data]
+    # Отброшенное нажатие подтверждается, иначе часики на кнопке не пропадут
+    assert repeat.answers == 1
+
+    # Та же кнопка в следующем сообщении - другое нажатие
+    assert _press (guarded, _Query (data, message_id=11), 11)
+
+
+def test_guard_drops_press_from_older_message ():
+    dedup = CallbackDeduplicator ()
+    guarded, handled = _guarded (dedup)
+    stale = _Query (encode (ACTION_OPTION, 1), message_id=10)
+
+    assert _press (guarded, stale, 12) is None
+    assert stale.answers == 1
+    assert handled == []
+    assert dedup.get_stats ()['stale'] == 1
+    # Устаревшее нажатие не занимает ключ дубликатов
+    assert not dedup.entries
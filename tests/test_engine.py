@@ -0,0 +1,86 @@
+import random
+
+import pytest
+
+from engine import CONTINUE_OPTION, GameEngine
+
+# Переход "Продолжить" может зациклиться: прохождение в тестах ограничено
+MAX_TURNS = 200
+
+
+@pytest.fixture (scope='module')
+def engine ():
+    return GameEngine ()
+
+
+def _play (engine, session, choices_seed, turns=MAX_TURNS):
+    """Играет случайными вариантами, возвращает тексты ходов"""
+    rng = random.Random (choices_seed)
+    texts = []
+    while not session.finished and session.turn_id < turns:
+        option_id = CONTINUE_OPTION if session.exhausted else rng.randrange (len (session.options))
+        result = engine.step (session, option_id)
+        texts.append ((result.scene, result.next_scene, result.text))
+    return texts
+
+
+def _state (engine, session):
+    """Состояние сессии без переинициализации генератора"""
+    return engine.export_session (session, rng_seed=0)
+
+
+@pytest.mark.parametrize ('seed', [1, 7, 42])
+def test_same_seed_and_choices_give_same_playthrough (engine, seed):
+    first = engine.new_session (seed)
+    second = engine.new_session (seed)
+
+    assert _play (engine, first, seed) == _play (engine, second, seed)
+    assert _state (engine, first) == _state (engine, second)
+    assert first.game.rng.random () == second.game.rng.random ()
+
+
+def test_different_seeds_diverge (engine):
+    playthroughs = {tuple (_play (engine, engine.new_session (seed), 3)) for seed in range (10)}
+    assert len (playthroughs) > 1
+
+
+def test_journal_replay_matches_live_session (engine):
+    session = engine.new_session (5)
+    start = engine.export_session (session)
+    session.journal = []
+    _play (engine, session, 11, turns=30)
+    assert session.journal
+
+    replayed = engine.restore_session (start)
+    for turn_id, option_id, text, rng_seed in session.journal:
+        assert replayed.turn_id == turn_id
+        replayed.game.rng.seed (rng_seed)
+        if text is None:
+            engine.step (replayed, option_id)
+        else:
+            engine.step_input (replayed, text)
+
+    assert _state (engine, replayed) == _state (engine, session)
+    assert replayed.game.rng.random () == session.game.rng.random ()
+
+
+def test_export_restore_continues_identically (engine):
+    session = engine.new_session (9)
+    _play (engine, session, 2, turns=5)
+    state = engine.export_session (session)
+    restored = engine.restore_session (state)
+
+    assert _play (engine, session, 4, turns=25) == _play (engine, restored, 4, turns=25)
+
+
+def test_step_rejects_finished_session_and_bad_option (engine):
+    session = engine.new_session (1)
+    with pytest.raises (ValueError):
+        engine.step (session, len (session.options))
+    if not session.exhausted:
+        with pytest.raises (ValueError):
+            engine.step (session, CONTINUE_OPTION)
+
+    session.finished = True
+    with pytest.raises (ValueError):
+        engine.step (session, 0)
@@ -0,0 +1,59 @@
+import pytest
+
+from fear import (
+    BAND_BY_LEVEL, BAND_CRITICAL, BAND_HIGH, BAND_LOW, BAND_MEDIUM, FALSE_OPTION_CHANCE, FEAR_MAX, FEAR_UPDATES,
+    HALLUCINATION_CHANCE, LOCATION_DELTAS, SENTIMENT_DELTAS, FearMeter, clamp
+)
+
+
+@pytest.mark.parametrize ('level, band', [
+    (0, BAND_LOW), (19, BAND_LOW), (20, BAND_MEDIUM), (49, BAND_MEDIUM),
+    (50, BAND_HIGH), (79, BAND_HIGH), (80, BAND_CRITICAL), (100, BAND_CRITICAL),
+])
+def test_band_boundaries (level, band):
+    assert BAND_BY_LEVEL[level] == band
+
+
+def test_chance_tables ():
+    assert len (HALLUCINATION_CHANCE) == len (FALSE_OPTION_CHANCE) == FEAR_MAX + 1
+    assert HALLUCINATION_CHANCE[50] == 0 and HALLUCINATION_CHANCE[100] == pytest.approx (0.5)
+    assert FALSE_OPTION_CHANCE[70] == 0 and FALSE_OPTION_CHANCE[85] == pytest.approx (0.15)
+
+
+def test_updates_match_stepwise_clamping ():
+    # Изменения по настроению и по локации ограничиваются по очереди, как раньше в GameLogic
+    for (sentiment, location), table in FEAR_UPDATES.items ():
+        for level in range (FEAR_MAX + 1):
+            expected = clamp (clamp (level + SENTIMENT_DELTAS.get (sentiment, 0)) + LOCATION_DELTAS.get (location, 0))
+            assert table[level] == expected
+    # Храбрый выбор у нуля не накапливает "долг": подвал поднимает страх с нуля
+    assert FEAR_UPDATES['brave', 'basement'][0] == 15
+
+
+def test_apply_with_unknown_sentiment_and_location ():
+    meter = FearMeter (40)
+    meter.apply ('scared', 'attic')
+    assert meter.level == 50
+    meter.apply ('sarcastic', 'basement')
+    assert meter.level == 65
+    meter.apply ('sarcastic', None)
+    assert meter.level == 65
+
+
+def test_listeners_fire_only_on_band_change ():
+    meter = FearMeter (150)
+    assert (meter.level, meter.band_name) == (100, 'critical')
+    events = []
+    meter.subscribe (lambda old, new, level: events.append ((old, new, level)))
+
+    meter.set (0)
+    meter.increase (10)
+    meter.increase (15)
+    meter.apply ('aggressive', 'doctor_office')
+    meter.decrease (200)
+
+    assert events == [
+        (BAND_CRITICAL, BAND_LOW, 0), (BAND_LOW, BAND_MEDIUM, 25), (BAND_MEDIUM, BAND_HIGH, 60),
+        (BAND_HIGH, BAND_LOW, 0),
+    ]
+    assert meter.band_changes == 4
@@ -0,0 +1,119 @@
+import random
+
+import pytest
+
+from engine import CONTINUE_OPTION, GameEngine
+from history import CompactionPolicy, SessionHistory, capture
+
+
+@pytest.fixture (scope='module')
+def engine ():
+    return GameEngine ()
+
+
+def _choice (session, rng):
+    return CONTINUE_OPTION if session.exhausted else rng.randrange (len (session.options))
+
+
+def _advance (engine, session, history, turns, rng):
+    """Делает до turns ходов, снимая снимок перед каждым"""
+    for _ in range (turns):
+        if session.finished:
+            break
+        history.record (session)
+        engine.step (session, _choice (session, rng))
+
+
+def _state (engine, session):
+    """Состояние сессии без turn_id (он растет и при возврате) и без переинициализации генератора"""
+    state = engine.export_session (session, rng_seed=0)
+    del state['turn_id']
+    return state
+
+
+def test_rewind_restores_state_and_replays_same_turn (engine):
+    session = engine.new_session (1)
+    history = SessionHistory ()
+    _advance (engine, session, history, 4, random.Random (1))
+    assert not session.finished
+
+    history.record (session)
+    before = _state (engine, session)
+    option_id = _choice (session, random.Random (2))
+    first = engine.step (session, option_id)
+    turn_id = session.turn_id
+
+    assert history.rewind (session)
+    assert _state (engine, session) == before
+    assert session.turn_id > turn_id
+
+    # Следующий ход после возврата идет с тем же снимком и дает тот же результат
+    history.record (session)
+    again = engine.step (session, option_id)
+    assert (again.next_scene, again.text) == (first.next_scene, first.text)
+
+
+def test_rewind_without_history (engine):
+    session = engine.new_session (1)
+    assert not SessionHistory ().rewind (session)
+
+
+def test_save_and_load (engine):
+    session = engine.new_session (2)
+    history = SessionHistory (slots=2)
+    rng = random.Random (3)
+    _advance (engine, session, history, 2, rng)
+    assert not session.finished
+
+    history.save (1, session)
+    saved = _state (engine, session)
+    option_id = _choice (session, random.Random (4))
+    history.record (session)
+    first = engine.step (session, option_id)
+    _advance (engine, session, history, 3, rng)
+
+    assert history.load (1, session)
+    assert _state (engine, session) == saved
+    assert history.snapshots == []
+    assert history.saves == 1
+
+    history.record (session)
+    again = engine.step (session, option_id)
+    assert (again.next_scene, again.text) == (first.next_scene, first.text)
+
+
+def test_load_into_new_game (engine):
+    session = engine.new_session (3)
+    history = SessionHistory ()
+    _advance (engine, session, history, 3, random.Random (5))
+    history.save (2, session)
+    saved = _state (engine, session)
+
+    other = engine.new_session (12345)
+    assert history.load (2, other)
+    assert _state (engine, other) == saved
+
+
+def test_slots (engine):
+    session = engine.new_session (1)
+    history = SessionHistory (slots=3)
+    assert not history.load (1, session)
+    for slot in (0, 4):
+        with pytest.raises (ValueError):
+            history.save (slot, session)
+
+
+def test_unchanged_parts_are_shared (engine):
+    session = engine.new_session (1)
+    first = capture (session)
+    second = capture (session, first)
+    assert second.inventory is first.inventory
+    assert second.story_flags is first.story_flags
+    assert second.options is first.options
+
+
+def test_compaction_policy ():
+    policy = CompactionPolicy (recent=3, stride=2, limit=5)
+    snapshots = [type ('S', (), {'turn_id': turn_id}) () for turn_id in range (10)]
+    kept = [snapshot.turn_id for snapshot in policy.compact (snapshots)]
+    assert kept == [4, 6, 7, 8, 9]
@@ -0,0 +1,102 @@
+import os
+
+import pytest
+
+from journal import (
+    RECORD_INPUT, RECORD_PROGRESS, RECORD_STATE, RECORD_STEP, Journal, decode, encode_input, encode_progress,
+    encode_state, encode_step,
+)
+
+
+def test_records_round_trip ():
+    payload = b''.join ((
+        encode_step (12, 3, -1, 2 ** 64 - 1),
+        encode_input (-5, 4, 99, "Позвать кого-нибудь"),
+        encode_state (12, b'\x00state'),
+        encode_progress (1000, {1003, 1001}),
+    ))
+
+    assert list (decode (payload)) == [
+        (RECORD_STEP, 12, 3, -1, 2 ** 64 - 1),
+        (RECORD_INPUT, -5, 4, 99, "Позвать кого-нибудь"),
+        (RECORD_STATE, 12, b'\x00state'),
+        (RECORD_PROGRESS, 1000, {1001, 1003}),
+    ]
+
+
+def test_step_record_is_compact ():
+    assert len (encode_step (1, 1, 0, 0)) == 23
+
+
+def test_unknown_record_type ():
+    with pytest.raises (ValueError):
+        list (decode (b'\xff'))
+
+
+@pytest.fixture
+def journal (tmp_path):
+    journal = Journal (str (tmp_path), fsync=False)
+    journal.open ()
+    yield journal
+    journal.close ()
+
+
+def test_frames_read_back (journal):
+    journal.append ([encode_step (1, 0, 0, 1)])
+    journal.append ([encode_step (1, 1, 2, 2), encode_step (2, 0, 1, 3)])
+
+    frames = [list (decode (payload)) for payload in journal.read (journal.active)]
+    assert frames == [
+        [(RECORD_STEP, 1, 0, 0, 1)],
+        [(RECORD_STEP, 1, 1, 2, 2), (RECORD_STEP, 2, 0, 1, 3)],
+    ]
+
+
+@pytest.mark.parametrize ('cut', [1, 8, 20])
+def test_truncated_frame_is_dropped (journal, cut):
+    journal.append ([encode_step (1, 0, 0, 1)])
+    journal.append ([encode_step (1, 1, 2, 2)])
+    path = journal.path (journal.active)
+    os.truncate (path, os.path.getsize (path) - cut)
+
+    frames = [list (decode (payload)) for payload in journal.read (journal.active)]
+    assert frames == [[(RECORD_STEP, 1, 0, 0, 1)]]
+
+
+def test_corrupt_frame_stops_reading (journal):
+    for turn_id in range (3):
+        journal.append ([encode_step (1, turn_id, 0, turn_id)])
+    path = journal.path (journal.active)
+    frame = os.path.getsize (path) // 3
+    with open (path, 'r+b') as segment:
+        segment.seek (frame + frame - 1)
+        segment.write (b'\xaa')
+
+    assert len (list (journal.read (journal.active))) == 1
+
+
+def test_open_starts_new_segment_after_existing (tmp_path):
+    journal = Journal (str (tmp_path), fsync=False)
+    journal.open ()
+    journal.append ([encode_step (1, 0, 0, 1)])
+    first = journal.active
+    journal.close ()
+
+    journal.open ()
+    assert journal.active == first + 1
+    journal.close ()
+    # Пустой сегмент удаляется при закрытии, записанный остается
+    assert journal.segments () == [first]
+
+
+def test_roll_by_size (tmp_path):
+    journal = Journal (str (tmp_path), segment_bytes=64, fsync=False)
+    journal.open ()
+    for turn_id in range (6):
+        journal.append ([encode_step (1, turn_id, 0, turn_id)])
+    journal.close ()
+
+    segments = journal.segments ()
+    assert len (segments) > 1
+    turns = [record[2] for number in segments for payload in journal.read (number) for record in decode (payload)]
+    assert turns == list (range (6))
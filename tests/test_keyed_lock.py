@@ -0,0 +1,96 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from keyed_lock import KeyedLockManager
+
+
+def _update (chat_id):
+    return SimpleNamespace (effective_chat=SimpleNamespace (id=chat_id), effective_user=None)
+
+
+def test_same_chat_runs_in_order_other_chats_in_parallel ():
+    locks = KeyedLockManager ()
+    log = []
+
+    async def callback (update, context):
+        log.append (('start', update.effective_chat.id, context))
+        await asyncio.sleep (0.01)
+        log.append (('end', update.effective_chat.id, context))
+
+    wrapped = locks.serialize (callback)
+
+    async def run ():
+        await asyncio.gather (wrapped (_update (1), 'a'), wrapped (_update (2), 'b'), wrapped (_update (1), 'c'))
+
+    asyncio.run (run ())
+    # Чат 2 не ждет чат 1, а второй ход чата 1 начинается после окончания первого
+    assert log[:2] == [('start', 1, 'a'), ('start', 2, 'b')]
+    assert log.index (('start', 1, 'c')) > log.index (('end', 1, 'a'))
+
+    stats = locks.get_stats ()
+    assert (stats['acquisitions'], stats['contended'], stats['peak_active']) == (3, 1, 2)
+    assert stats['max_wait_ms'] > 0
+
+
+def test_locks_are_reclaimed ():
+    locks = KeyedLockManager ()
+
+    async def failing (update, context):
+        raise RuntimeError ("ошибка хода")
+
+    async def run ():
+        for chat_id in range (100):
+            async with locks.lock (chat_id):
+                pass
+        with pytest.raises (RuntimeError):
+            await locks.serialize (failing) (_update (1), None)
+
+    asyncio.run (run ())
+    stats = locks.get_stats ()
+    assert stats['active'] == 0
+    assert stats['created'] == stats['reclaimed'] == 101
+    assert stats['peak_active'] == 1
+
+
+def test_cancelled_waiter_releases_entry ():
+    locks = KeyedLockManager ()
+
+    async def run ():
+        release = asyncio.Event ()
+
+        async def holder ():
+            async with locks.lock (1):
+                await release.wait ()
+
+        async def waiter ():
+            async with locks.lock (1):
+                pass
+
+        loop = asyncio.get_running_loop ()
+        first = loop.create_task (holder ())
+        await asyncio.sleep (0)
+        second = loop.create_task (waiter ())
+        await asyncio.sleep (0)
+        assert locks.entries[1].users == 2
+        second.cancel ()
+        await asyncio.gather (second, return_exceptions=True)
+        assert locks.entries[1].users == 1
+        release.set ()
+        await first
+
+    asyncio.run (run ())
+    assert locks.entries == {}
+
+
+def test_key_falls_back_to_user ():
+    locks = KeyedLockManager ()
+    keys = []
+
+    async def callback (update, context):
+        keys.append (list (locks.entries))
+
+    update = SimpleNamespace (effective_chat=None, effective_user=SimpleNamespace (id=7))
+    asyncio.run (locks.serialize (callback) (update, None))
+    assert keys == [[7]]
@@ -0,0 +1,89 @@
+import asyncio
+
+from lifecycle import LifecycleManager
+
+
+class _Updater:
+    def __init__ (self):
+        self.running = True
+
+    async def stop (self):
+        self.running = False
+
+
+class _Application:
+    def __init__ (self):
+        self.updater = _Updater ()
+        self.stopped = False
+
+    def stop_running (self):
+        self.stopped = True
+
+
+def _turn (delay):
+    async def callback (update, context):
+        await asyncio.sleep (delay)
+        return update
+
+    return callback
+
+
+async def _stop (lifecycle, delays, second_signal_after=None):
+    """Запускает ходы, подает сигнал остановки и возвращает результаты ходов"""
+    application = _Application ()
+    loop = asyncio.get_running_loop ()
+    turns = [loop.create_task (lifecycle.track (_turn (delay)) (n, None)) for n, delay in enumerate (delays)]
+    background = lifecycle.add_background (loop.create_task (asyncio.sleep (60)))
+    await asyncio.sleep (0)
+
+    lifecycle.request_stop (application)
+    if second_signal_after is not None:
+        await asyncio.sleep (second_signal_after)
+        lifecycle.request_stop (application)
+    await lifecycle.drain_task
+
+    assert application.stopped
+    assert not application.updater.running
+    assert background.cancelled ()
+    return await asyncio.gather (*turns)
+
+
+def test_drain_waits_for_started_turns ():
+    lifecycle = LifecycleManager (timeout=5.0)
+    assert asyncio.run (_stop (lifecycle, [0.01, 0.05])) == [0, 1]
+    stats = lifecycle.get_stats ()
+    assert (stats['in_flight_at_stop'], stats['drained'], stats['abandoned']) == (2, 2, 0)
+    assert stats['drain_seconds'] < 1.0
+    assert not stats['forced']
+
+
+def test_drain_abandons_turns_after_deadline ():
+    lifecycle = LifecycleManager (timeout=0.1)
+    # Прерванный ход завершается штатно с результатом None
+    assert asyncio.run (_stop (lifecycle, [0.01, 30.0])) == [0, None]
+    stats = lifecycle.get_stats ()
+    assert (stats['drained'], stats['abandoned'], stats['in_flight']) == (1, 1, 0)
+    assert 0.1 <= stats['drain_seconds'] < 1.0
+    assert not lifecycle.abandoned_tasks
+
+
+def test_second_signal_forces_stop ():
+    lifecycle = LifecycleManager (timeout=30.0)
+    assert asyncio.run (_stop (lifecycle, [30.0], second_signal_after=0.05)) == [None]
+    stats = lifecycle.get_stats ()
+    assert stats['forced']
+    assert stats['abandoned'] == 1
+    assert stats['drain_seconds'] < 1.0
+
+
+def test_cancelled_turn_outside_drain_propagates ():
+    lifecycle = LifecycleManager ()
+
+    async def run ():
+        turn = asyncio.get_running_loop ().create_task (lifecycle.track (_turn (30.0)) (1, None))
+        await asyncio.sleep (0)
+        turn.cancel ()
+        return await asyncio.gather (turn, return_exceptions=True)
+
+    assert isinstance (asyncio.run (run ())[0], asyncio.CancelledError)
+    assert lifecycle.get_stats ()['in_flight'] == 0
@@ -0,0 +1,53 @@
+import pytest
+
+from engine import GameEngine
+from item_requirements import ITEM_BITS, RequirementsIndex, items_mask
+
+SCENE = 'room_with_portrait'
+FALSE_OPTION = "Сорвать портрет со стены"
+
+
+def test_locked_mask_by_original_index ():
+    index = RequirementsIndex ()
+    assert index.locked_mask (SCENE, 0) == 0b110
+    assert index.locked_mask (SCENE, ITEM_BITS["ключ"]) == 0
+    assert index.locked_mask ('corridor', 0) == 0
+
+
+def test_locked_mask_with_false_option ():
+    index = RequirementsIndex ()
+    # Ложный вариант вставлен первым: исходные варианты сдвинулись на одну позицию
+    assert index.locked_mask (SCENE, 0, (-1, 0, 1, 2)) == 0b1100
+    assert index.locked_mask (SCENE, 0, (0, -1, 1, 2)) == 0b1100
+    assert index.locked_mask (SCENE, 0, (0, 1, -1, 2)) == 0b1010
+    assert index.locked_mask (SCENE, items_mask (["ключ"]), (-1, 0, 1, 2)) == 0
+
+
+def test_is_locked ():
+    index = RequirementsIndex ({('library', 0): ("ключ от библиотеки", "журнал эксперимента")})
+    assert index.is_locked ('library', 0, ITEM_BITS["ключ от библиотеки"])
+    assert not index.is_locked ('library', 0, items_mask (["ключ от библиотеки", "журнал эксперимента"]))
+    assert not index.is_locked ('library', -1, 0)
+
+
+@pytest.fixture
+def session ():
+    engine = GameEngine ()
+    session = engine.new_session (1)
+    session.scene = SCENE
+    base = list (engine.content['scene_options'][SCENE])
+    session.options = [FALSE_OPTION] + base
+    return engine, session
+
+
+def test_engine_translates_shown_positions (session):
+    engine, session = session
+    assert session.option_ids == (-1, 0, 1, 2)
+    assert engine.locked_options (session) == 0b1100
+
+
+def test_locked_option_stays_available_after_false_option (session):
+    engine, session = session
+    # Показанная позиция 3 - исходный вариант 2 ("Попытаться открыть дверь"), он закрыт без ключа
+    engine.step (session, 3)
+    assert session.selected.get (SCENE, 0) == 0
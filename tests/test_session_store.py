@@ -0,0 +1,135 @@
+import asyncio
+import os
+import random
+
+import pytest
+
+from bot_handlers import BotHandlers
+from engine import GameEngine
+import session_store
+from session_store import ProcessedUpdates, _crash, _create_store, _play
+
+
+@pytest.fixture (scope='module')
+def handlers ():
+    return BotHandlers (GameEngine (), ui=None)
+
+
+@pytest.fixture
+def open_store (tmp_path, handlers):
+    """Открывает хранилище во временном каталоге (в корне репозитория ничего не создается)"""
+
+    def open_store ():
+        store = _create_store (str (tmp_path), handlers)
+        store.open ()
+        store.recover ()
+        return store
+
+    return open_store
+
+
+def _start (handlers, store, user_id, update_id):
+    user_data = {}
+    store.load (user_id, user_data)
+    user_data['session'] = handlers.engine.new_session (user_id)
+    user_data['scene'] = 'intro'
+    store.begin (update_id)
+    store.capture (user_id, update_id, user_data)
+    return user_data
+
+
+def _state (handlers, user_data):
+    state = handlers.export_user_data (user_data)
+    del state['session']['rng_seed']
+    return state
+
+
+def test_files_stay_in_store_directory (tmp_path, open_store):
+    store = open_store ()
+    asyncio.run (store.close ())
+    assert os.path.dirname (store.path) == str (tmp_path)
+    assert set (os.listdir (tmp_path)) <= {'sessions.db', 'sessions.db-wal', 'sessions.db-shm', 'journal'}
+
+
+def test_crash_recovery_replays_journal_tail (handlers, open_store):
+    store = open_store ()
+    rng = random.Random (1)
+    live = {}
+    for user_id in range (1, 21):
+        live[user_id] = _start (handlers, store, user_id, user_id)
+        _play (handlers.engine, store, user_id, live[user_id], rng.randrange (1, 6), rng)
+        if user_id == 10:
+            store.flush ()
+            store.checkpoint (store.seal ())
+    expected = {user_id: _state (handlers, user_data) for user_id, user_data in live.items ()}
+    _crash (store)
+
+    store = open_store ()
+    assert store.recovered_segments > 0
+    assert store.mismatches == 0
+    for user_id, state in expected.items ():
+        user_data = {}
+        store.load (user_id, user_data)
+        assert _state (handlers, user_data) == state
+    asyncio.run (store.close ())
+
+
+def test_processed_updates_survive_restart (handlers, open_store):
+    store = open_store ()
+    _start (handlers, store, 1, 100)
+    _start (handlers, store, 2, 102)
+    store.flush ()
+    _crash (store)
+
+    store = open_store ()
+    assert not store.begin (100)
+    assert not store.begin (102)
+    assert store.begin (103)
+    assert store.get_stats ()['duplicates'] == 2
+    asyncio.run (store.close ())
+
+
+def test_processed_updates_high_water ():
+    updates = ProcessedUpdates ()
+    for update_id in (1, 2, 3):
+        updates.begin (update_id)
+    updates.complete (1)
+    updates.complete (3)
+    # 2 еще обрабатывается: граница стоит на 1, 3 запомнено отдельно
+    assert (updates.high_water, updates.recent) == (1, {3})
+    assert not updates.seen (2) and updates.seen (3)
+    updates.complete (2)
+    assert (updates.high_water, updates.recent) == (3, set ())
+
+
+def test_eviction_after_checkpoint (handlers, open_store):
+    store = open_store ()
+    store.max_resident = 1
+    evicted = []
+    store.on_evict = evicted.append
+    for user_id in (1, 2, 3):
+        _start (handlers, store, user_id, user_id)
+    store.flush ()
+    store.checkpoint (store.seal ())
+    store.folded_capture = store.committed_capture
+    assert store.evict () == 2
+    assert evicted == [1, 2]
+
+    user_data = {}
+    store.load (1, user_data)
+    assert user_data['scene'] == 'intro'
+    assert user_data['session'].seed == 1
+    asyncio.run (store.close ())
+
+
+def test_fold_rejects_unknown_record (handlers, open_store, monkeypatch):
+    store = open_store ()
+    _start (handlers, store, 1, 1)
+    store.flush ()
+    sealed = store.seal ()
+    monkeypatch.setattr (session_store, 'decode', lambda payload: iter ([(99, 1)]))
+    with pytest.raises (ValueError):
+        store.fold (sealed)
+    assert set (sealed) <= set (store.journal.segments ())
+    monkeypatch.undo ()
+    asyncio.run (store.close ())
@@ -0,0 +1,64 @@
+import asyncio
+import random
+from types import SimpleNamespace
+
+from callbacks import ACTION_CONTINUE, ACTION_OPTION, ACTION_QUIT, ACTION_RESTART, decode
+from engine import CONTINUE_OPTION, GameEngine
+from telegram_ui import TelegramUI
+
+MAX_TURNS = 200
+
+
+class _Message:
+    def __init__ (self):
+        self.sent = []
+
+    async def reply_text (self, text, reply_markup=None, **kwargs):
+        self.sent.append (reply_markup)
+        return SimpleNamespace (message_id=len (self.sent))
+
+
+def _draw_game (ui, engine, seed, message):
+    """Рисует клавиатуры всех ходов прохождения так же, как BotHandlers"""
+    update = SimpleNamespace (message=message, callback_query=None)
+    rng = random.Random (seed)
+    session = engine.new_session (seed)
+    while not session.finished and session.turn_id < MAX_TURNS:
+        asyncio.run (ui.send_message_with_options (
+            update, "Что будете делать?", session.options, scene=session.scene,
+            disabled_options=session.disabled, locked_options=engine.locked_options (session)
+        ))
+        option_id = CONTINUE_OPTION if session.exhausted else rng.randrange (len (session.options))
+        engine.step (session, option_id)
+    asyncio.run (ui.send_message_with_options (update, "Игра окончена.", ["Начать заново", "Выйти"],
+                                               actions=(ACTION_RESTART, ACTION_QUIT)))
+
+
+def test_keyboards_are_reused_across_turns_and_games ():
+    ui = TelegramUI ()
+    engine = GameEngine ()
+    message = _Message ()
+    for seed in range (50):
+        _draw_game (ui, engine, seed, message)
+
+    stats = ui.get_keyboard_cache_stats ()
+    assert stats['hits'] + stats['misses'] == len (message.sent)
+    # Различных клавиатур несколько десятков: кэш не вытесняет их и почти всегда попадает
+    assert stats['misses'] == stats['size'] < stats['max_size']
+    assert stats['hits'] > 0.9 * len (message.sent)
+
+
+def test_same_options_share_one_markup ():
+    ui = TelegramUI ()
+    first = ui.get_options_keyboard ((0, 2, -1))
+    assert ui.get_options_keyboard ((0, 2, -1)) is first
+    data = [decode (button.callback_data) for row in first.inline_keyboard for button in row]
+    assert data == [(ACTION_OPTION, 0), (ACTION_OPTION, 2), (ACTION_CONTINUE, 0)]
+
+
+def test_send_returns_message ():
+    ui = TelegramUI ()
+    message = _Message ()
+    update = SimpleNamespace (message=message, callback_query=None)
+    sent = asyncio.run (ui.send_message_with_options (update, "Текст", ["а", "б"]))
+    assert sent.message_id == 1
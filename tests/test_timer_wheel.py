@@ -0,0 +1,53 @@
+from timer_wheel import TimerWheel
+
+
+def test_fires_at_due_tick ():
+    wheel = TimerWheel (tick=1.0, size=8, now=0.0)
+    wheel.schedule ('a', 2.5, 'A', now=0.0)
+    assert wheel.advance (2.0) == []
+    assert wheel.advance (3.0) == [('a', 'A')]
+    assert 'a' not in wheel
+    assert wheel.advance (10.0) == []
+
+
+def test_timers_survive_wraps ():
+    wheel = TimerWheel (tick=1.0, size=4, now=0.0)
+    # 'far' попадает в ту же ячейку, что и 'near', но на третьем обороте
+    wheel.schedule ('near', 1.0, now=0.0)
+    wheel.schedule ('far', 9.0, now=0.0)
+    fired = []
+    for now in range (1, 12):
+        fired.extend ((now, key) for key, _ in wheel.advance (float (now)))
+    assert fired == [(2, 'near'), (10, 'far')]
+
+
+def test_long_gap_fires_everything_due ():
+    wheel = TimerWheel (tick=1.0, size=4, now=0.0)
+    for key in range (10):
+        wheel.schedule (key, float (key), now=0.0)
+    wheel.schedule ('later', 50.0, now=0.0)
+    assert sorted (key for key, _ in wheel.advance (20.0)) == list (range (10))
+    assert len (wheel) == 1
+    assert wheel.advance (51.0) == [('later', None)]
+
+
+def test_cancel_and_reschedule ():
+    wheel = TimerWheel (tick=1.0, size=4, now=0.0)
+    wheel.schedule ('a', 1.0, 'old', now=0.0)
+    wheel.schedule ('b', 1.0, now=0.0)
+    assert wheel.cancel ('b')
+    assert not wheel.cancel ('b')
+    # Перестановка через оборот: старый таймер не срабатывает
+    wheel.schedule ('a', 6.0, 'new', now=0.0)
+    assert wheel.get ('a') == 'new'
+    assert wheel.advance (5.0) == []
+    assert wheel.advance (7.0) == [('a', 'new')]
+    assert wheel.get_stats () == {'pending': 0, 'scheduled': 3, 'cancelled': 1, 'fired': 1}
+
+
+def test_schedule_in_the_past_fires_next_tick ():
+    wheel = TimerWheel (tick=1.0, size=4, now=0.0)
+    wheel.advance (5.0)
+    wheel.schedule ('a', -3.0, now=5.0)
+    assert wheel.advance (5.5) == []
+    assert wheel.advance (6.0) == [('a', None)]
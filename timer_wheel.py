@@ -0,0 +1,213 @@
+#!/usr/bin/env python
+"""
+Хешированное колесо таймеров.
+Таймер попадает в ячейку (срок в тиках) % размер колеса; в ячейке таймеры
+хранятся в словаре по ключу, поэтому добавление и отмена - O(1) независимо
+от числа таймеров. Поворот колеса на тик просматривает одну ячейку, а
+таймеры, срок которых наступит на следующих оборотах, в ней остаются.
+У ключа (например, чата) не больше одного таймера: новый заменяет старый.
+
+Запуск бенчмарка:
+    python timer_wheel.py --benchmark 1000000
+"""
+import argparse
+import asyncio
+import random
+import time
+import tracemalloc
+
+
+class TimerWheel:
+    """Колесо таймеров с разрешением в один тик"""
+
+    def __init__ (self, tick: float = 1.0, size: int = 4096, now: float = None):
+        """
+        Args:
+            tick: Длительность тика в секундах
+            size: Количество ячеек колеса
+            now: Начальное время (по умолчанию time.monotonic ())
+        """
+        self.tick = tick
+        self.size = size
+        self.slots = [{} for _ in range (size)]  # ключ -> (тик срабатывания, данные)
+        self.slot_of = {}  # ключ -> номер ячейки
+        self.origin = time.monotonic () if now is None else now
+        self.current = 0  # последний обработанный тик
+
+        # Счетчики
+        self.scheduled = 0
+        self.cancelled = 0
+        self.fired = 0
+
+    def __len__ (self):
+        return len (self.slot_of)
+
+    def __contains__ (self, key):
+        return key in self.slot_of
+
+    def schedule (self, key, delay: float, payload=None, now: float = None):
+        """
+        Ставит таймер ключа, заменяя предыдущий
+
+        Args:
+            key: Ключ таймера
+            delay: Задержка в секундах
+            payload: Данные, возвращаемые при срабатывании
+            now: Текущее время (по умолчанию time.monotonic ())
+        """
+        now = time.monotonic () if now is None else now
+        # Срабатывание не раньше следующего тика
+        due = max (int ((now - self.origin + delay) / self.tick) + 1, self.current + 1)
+        slot = due % self.size
+
+        old_slot = self.slot_of.get (key)
+        if old_slot is not None:
+            del self.slots[old_slot][key]
+        self.slots[slot][key] = (due, payload)
+        self.slot_of[key] = slot
+        self.scheduled += 1
+
+    def get (self, key, default=None):
+        """Данные таймера ключа или default, если таймера нет"""
+        slot = self.slot_of.get (key)
+        if slot is None:
+            return default
+        return self.slots[slot][key][1]
+
+    def cancel (self, key) -> bool:
+        """
+        Отменяет таймер ключа
+
+        Returns:
+            bool: True, если таймер был
+        """
+        slot = self.slot_of.pop (key, None)
+        if slot is None:
+            return False
+        del self.slots[slot][key]
+        self.cancelled += 1
+        return True
+
+    def advance (self, now: float = None):
+        """
+        Поворачивает колесо до текущего времени
+
+        Args:
+            now: Текущее время (по умолчанию time.monotonic ())
+
+        Returns:
+            list: Сработавшие таймеры [(ключ, данные), ...]
+        """
+        now = time.monotonic () if now is None else now
+        target = int ((now - self.origin) / self.tick)
+        if target <= self.current:
+            return []
+
+        fired = []
+        # За один полный оборот просматривается каждая ячейка, поэтому больше size тиков не нужно
+        first = max (self.current + 1, target - self.size + 1)
+        for tick in range (first, target + 1):
+            slot = self.slots[tick % self.size]
+            if not slot:
+                continue
+            due_keys = [key for key, (due, _) in slot.items () if due <= target]
+            for key in due_keys:
+                fired.append ((key, slot.pop (key)[1]))
+                del self.slot_of[key]
+        self.current = target
+        self.fired += len (fired)
+        return fired
+
+    def get_stats (self):
+        """Возвращает счетчики колеса"""
+        return {
+            'pending': len (self.slot_of),
+            'scheduled': self.scheduled,
+            'cancelled': self.cancelled,
+            'fired': self.fired,
+        }
+
+
+def benchmark (count, seed=1):
+    """Замеряет добавление, замену, отмену и поворот колеса для count таймеров"""
+    rng = random.Random (seed)
+    delays = [rng.uniform (30, 900) for _ in range (count)]
+
+    # Память замеряется отдельно: под tracemalloc добавление в несколько раз медленнее
+    tracemalloc.start ()
+    wheel = TimerWheel (tick=1.0, now=0.0)
+    for key, delay in enumerate (delays):
+        wheel.schedule (key, delay, now=0.0)
+    memory, _ = tracemalloc.get_traced_memory ()
+    tracemalloc.stop ()
+
+    wheel = TimerWheel (tick=1.0, now=0.0)
+    started = time.perf_counter ()
+    for key, delay in enumerate (delays):
+        wheel.schedule (key, delay, now=0.0)
+    schedule_time = time.perf_counter () - started
+
+    # Половина игроков сделала ход: таймер переставляется
+    started = time.perf_counter ()
+    for key in range (0, count, 2):
+        wheel.schedule (key, delays[key], now=10.0)
+    reschedule_time = time.perf_counter () - started
+
+    started = time.perf_counter ()
+    for key in range (1, count, 4):
+        wheel.cancel (key)
+    cancel_time = time.perf_counter () - started
+
+    started = time.perf_counter ()
+    ticks = fired = 0
+    now = 0.0
+    while wheel:
+        now += 1.0
+        fired += len (wheel.advance (now))
+        ticks += 1
+    advance_time = time.perf_counter () - started
+
+    print (f"Таймеров: {count}, память колеса: {memory / count:.0f} байт на таймер")
+    print (f"Добавление: {schedule_time * 1e9 / count:.0f} нс")
+    print (f"Замена: {reschedule_time * 1e9 / (count // 2):.0f} нс")
+    print (f"Отмена: {cancel_time * 1e9 / len (range (1, count, 4)):.0f} нс")
+    print (f"Поворот: {ticks} тиков, {fired} срабатываний, {advance_time * 1e6 / ticks:.0f} мкс на тик, "
+          f"{advance_time * 1e9 / max (fired, 1):.0f} нс на срабатывание")
+
+
+async def _sleep_tasks (count):
+    """Память и время создания и отмены задач asyncio.sleep (по задаче на чат)"""
+    tracemalloc.start ()
+    started = time.perf_counter ()
+    tasks = [asyncio.create_task (asyncio.sleep (600)) for _ in range (count)]
+    await asyncio.sleep (0)
+    create_time = time.perf_counter () - started
+    memory, _ = tracemalloc.get_traced_memory ()
+    tracemalloc.stop ()
+
+    started = time.perf_counter ()
+    for task in tasks:
+        task.cancel ()
+    await asyncio.gather (*tasks, return_exceptions=True)
+    cancel_time = time.perf_counter () - started
+    return memory, create_time, cancel_time
+
+
+def sleep_benchmark (count):
+    """Для сравнения: по задаче asyncio.sleep на каждого игрока"""
+    memory, create_time, cancel_time = asyncio.run (_sleep_tasks (count))
+    print (f"Задачи asyncio.sleep ({count}): {memory / count:.0f} байт на таймер, "
+           f"создание {create_time * 1e9 / count:.0f} нс (под tracemalloc), "
+           f"отмена {cancel_time * 1e9 / count:.0f} нс")
+
+
+def main ():
+    parser = argparse.ArgumentParser (description="Бенчмарк колеса таймеров")
+    parser.add_argument ('--benchmark', type=int, default=1000000, metavar='N')
+    args = parser.parse_args ()
+    benchmark (args.benchmark)
+    sleep_benchmark (min (args.benchmark, 100000))
+
+
+if __name__ == '__main__':
+    main ()
@@ -0,0 +1,230 @@
+#!/usr/bin/env python
+"""
+Модуль сетевого транспорта для Bot API.
+Получение обновлений (long polling) и отправка сообщений используют
+разные пулы соединений: долгий запрос getUpdates не занимает соединение,
+нужное для ответа игроку. Для пула отправки настраиваются размер,
+keep-alive, тайм-ауты и версия HTTP, а загрузка пула собирается в метрики:
+сколько запросов ждали свободного соединения и сколько не дождались.
+
+Очередь к пулу держится перед httpx: в httpcore каждое освобождение
+соединения перебирает все ожидающие запросы, и при сотнях отправок в
+очереди это съедает процессор. Семафор размером с пул пропускает в
+httpx не больше запросов, чем в нем соединений.
+"""
+import asyncio
+import logging
+import os
+import time
+
+import httpx
+from telegram.error import TimedOut
+from telegram.request import BaseRequest, HTTPXRequest
+
+from config import Config
+
+logger = logging.getLogger (__name__)
+
+
+class TransportSettings:
+    """Параметры пула соединений"""
+
+    def __init__ (self, pool_size: int = 32, keepalive: int = None, keepalive_expiry: float = 30.0,
+                  connect_timeout: float = 5.0, read_timeout: float = 10.0, write_timeout: float = 10.0,
+                  pool_timeout: float = 3.0, http_version: str = '1.1'):
+        """
+        Args:
+            pool_size: Максимальное количество соединений
+            keepalive: Сколько простаивающих соединений держать открытыми (по умолчанию pool_size)
+            keepalive_expiry: Через сколько секунд простоя соединение закрывается
+            connect_timeout: Тайм-аут установки соединения, секунд
+            read_timeout: Тайм-аут чтения ответа, секунд
+            write_timeout: Тайм-аут отправки запроса, секунд
+            pool_timeout: Сколько секунд ждать свободного соединения в пуле
+            http_version: '1.1' или '2'
+        """
+        self.pool_size = pool_size
+        self.keepalive = pool_size if keepalive is None else min (keepalive, pool_size)
+        self.keepalive_expiry = keepalive_expiry
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.write_timeout = write_timeout
+        self.pool_timeout = pool_timeout
+        self.http_version = http_version
+
+    @classmethod
+    def from_env (cls, prefix: str, **defaults):
+        """
+        Читает параметры из переменных окружения {prefix}_POOL_SIZE, {prefix}_KEEPALIVE,
+        {prefix}_KEEPALIVE_EXPIRY, {prefix}_CONNECT_TIMEOUT, {prefix}_READ_TIMEOUT,
+        {prefix}_WRITE_TIMEOUT, {prefix}_POOL_TIMEOUT и {prefix}_HTTP_VERSION
+
+        Args:
+            prefix: Префикс переменных (например, 'RANOVELL_SEND')
+            **defaults: Значения по умолчанию, если переменная не задана
+
+        Returns:
+            TransportSettings: Параметры пула
+        """
+        settings = cls (**defaults)
+        pool_size = Config.get_int (f'{prefix}_POOL_SIZE', settings.pool_size)
+        return cls (
+            pool_size=pool_size,
+            keepalive=Config.get_int (f'{prefix}_KEEPALIVE', defaults.get ('keepalive', pool_size)),
+            keepalive_expiry=Config.get_float (f'{prefix}_KEEPALIVE_EXPIRY', settings.keepalive_expiry),
+            connect_timeout=Config.get_float (f'{prefix}_CONNECT_TIMEOUT', settings.connect_timeout),
+            read_timeout=Config.get_float (f'{prefix}_READ_TIMEOUT', settings.read_timeout),
+            write_timeout=Config.get_float (f'{prefix}_WRITE_TIMEOUT', settings.write_timeout),
+            pool_timeout=Config.get_float (f'{prefix}_POOL_TIMEOUT', settings.pool_timeout),
+            http_version=os.environ.get (f'{prefix}_HTTP_VERSION', settings.http_version),
+        )
+
+    def __repr__ (self):
+        return (f"TransportSettings(pool_size={self.pool_size}, keepalive={self.keepalive}, "
+                f"keepalive_expiry={self.keepalive_expiry}, http_version={self.http_version!r})")
+
+
+def _http_version (requested):
+    """Возвращает поддерживаемую версию HTTP: для HTTP/2 нужен пакет h2 (httpx[http2])"""
+    if requested not in ('2', '2.0'):
+        return '1.1'
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        logger.warning ("HTTP/2 недоступен (pip install 'httpx[http2]'), используется HTTP/1.1")
+        return '1.1'
+    return '2'
+
+
+class PooledRequest (HTTPXRequest):
+    """HTTPXRequest с настраиваемым keep-alive и метриками загрузки пула"""
+
+    def __init__ (self, settings: TransportSettings, name: str = 'send'):
+        """
+        Args:
+            settings: Параметры пула
+            name: Название пула для журнала
+        """
+        self.settings = settings
+        self.name = name
+        self.slots = asyncio.Semaphore (settings.pool_size)
+
+        # Метрики
+        self.requests = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.waited = 0  # запросы, ждавшие свободного соединения
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.pool_timeouts = 0
+        self.errors = 0
+        self.busy_area = 0.0  # интеграл занятых соединений по времени
+        self.waiting_area = 0.0  # интеграл ожидающих запросов по времени
+        self.started = self.last_change = time.monotonic ()
+
+        super ().__init__ (
+            connection_pool_size=settings.pool_size,
+            connect_timeout=settings.connect_timeout,
+            read_timeout=settings.read_timeout,
+            write_timeout=settings.write_timeout,
+            pool_timeout=settings.pool_timeout,
+            http_version=_http_version (settings.http_version),
+        )
+
+    def _build_client (self) -> httpx.AsyncClient:
+        """Клиент с лимитами keep-alive из настроек (HTTPXRequest держит все соединения 5 секунд)"""
+        self._client_kwargs['limits'] = httpx.Limits (
+            max_connections=self.settings.pool_size,
+            max_keepalive_connections=self.settings.keepalive,
+            keepalive_expiry=self.settings.keepalive_expiry,
+        )
+        return super ()._build_client ()
+
+    def _account (self, change):
+        """Накопление загрузки пула за время с последнего изменения числа запросов"""
+        now = time.monotonic ()
+        elapsed = now - self.last_change
+        pool_size = self.settings.pool_size
+        self.busy_area += min (self.in_flight, pool_size) * elapsed
+        self.waiting_area += max (self.in_flight - pool_size, 0) * elapsed
+        self.last_change = now
+        self.in_flight += change
+
+    async def do_request (self, url, method, request_data=None, read_timeout=BaseRequest.DEFAULT_NONE,
+                          write_timeout=BaseRequest.DEFAULT_NONE, connect_timeout=BaseRequest.DEFAULT_NONE,
+                          pool_timeout=BaseRequest.DEFAULT_NONE):
+        """Выполняет запрос, дождавшись свободного соединения не дольше pool_timeout"""
+        self.requests += 1
+        self._account (1)
+        self.peak_in_flight = max (self.peak_in_flight, self.in_flight)
+        try:
+            if self.slots.locked ():
+                await self._wait_slot (self.settings.pool_timeout if pool_timeout is BaseRequest.DEFAULT_NONE
+                                       else pool_timeout)
+            else:
+                await self.slots.acquire ()
+
+            try:
+                return await super ().do_request (url, method, request_data, read_timeout, write_timeout,
+                                                  connect_timeout, pool_timeout)
+            finally:
+                self.slots.release ()
+        except TimedOut as error:
+            if str (error).startswith ("Pool timeout"):
+                self.pool_timeouts += 1
+            else:
+                self.errors += 1
+            raise
+        except Exception:
+            self.errors += 1
+            raise
+        finally:
+            self._account (-1)
+
+    async def _wait_slot (self, timeout):
+        """Ожидание свободного соединения с учетом времени ожидания"""
+        self.waited += 1
+        started = time.perf_counter ()
+        try:
+            await asyncio.wait_for (self.slots.acquire (), timeout)
+        except asyncio.TimeoutError:
+            raise TimedOut ("Pool timeout: все соединения пула заняты, запрос не отправлен") from None
+        finally:
+            wait = time.perf_counter () - started
+            self.total_wait += wait
+            self.max_wait = max (self.max_wait, wait)
+
+    def get_stats (self):
+        """Возвращает метрики пула"""
+        self._account (0)
+        elapsed = max (self.last_change - self.started, 1e-9)
+        return {
+            'pool': self.name,
+            'pool_size': self.settings.pool_size,
+            'http_version': self.http_version,
+            'requests': self.requests,
+            'in_flight': self.in_flight,
+            'peak_in_flight': self.peak_in_flight,
+            'utilization': self.busy_area / (elapsed * self.settings.pool_size),
+            'avg_waiting': self.waiting_area / elapsed,
+            'waited': self.waited,
+            'avg_wait_ms': self.total_wait * 1000 / self.waited if self.waited else 0.0,
+            'max_wait_ms': self.max_wait * 1000,
+            'pool_timeouts': self.pool_timeouts,
+            'errors': self.errors,
+        }
+
+
+def create_requests ():
+    """
+    Создает раздельные пулы для отправки и для получения обновлений по настройкам окружения
+
+    Returns:
+        tuple: (пул отправки, пул получения обновлений)
+    """
+    send = PooledRequest (TransportSettings.from_env ('RANOVELL_SEND'), name='send')
+    # Для long polling достаточно одного-двух соединений; тайм-аут чтения getUpdates
+    # python-telegram-bot увеличивает на время ожидания обновлений сам
+    polling = PooledRequest (TransportSettings.from_env ('RANOVELL_POLL', pool_size=2, pool_timeout=1.0),
+                             name='polling')
+    return send, polling